@@ -1,14 +1,17 @@
 """Serialiser data for Mathutils types"""
 
+from network.bitstream import AlignedBitHandler, register_bit_handler
 from network.type_flag import TypeFlag
 from network.handlers import get_handler, register_description, register_handler
+from network.serialiser import bits_to_bytes
 
 from functools import partial
 from itertools import chain
+from math import sqrt
 from mathutils import Vector, Euler, Quaternion, Matrix
 
 __all__ = ["Euler4", "Euler8", "Vector4", "Vector8", "Quaternion4",
-           "Quaternion8", "Matrix4", "Matrix8"]
+           "Quaternion8", "Matrix4", "Matrix8", "QuantizedVector", "SmallestThreeRotation"]
 
 
 class Euler8:
@@ -91,6 +94,163 @@ class Matrix8(Matrix4):
     item_size = Vector8.size()
 
 
+class QuantizedVector:
+    """Handler for vectors with each component quantized over a bounded range.
+
+    Components are packed together, so only the total is rounded up to whole bytes. Also provides the bit handler
+    interface
+    """
+
+    wrapper = Vector
+    wrapper_length = 3
+
+    def __init__(self, type_flag):
+        self.component = get_handler(TypeFlag(float, **type_flag.data))
+
+        self.component_bits = type_flag.data["bits"]
+        self.component_mask = (1 << self.component_bits) - 1
+        self.bits = self.component_bits * self.wrapper_length
+        self.packed_size = bits_to_bytes(self.bits)
+
+    def pack_int(self, vector):
+        quantize_int = self.component.quantize_int
+        component_bits = self.component_bits
+
+        value = 0
+        for component in vector:
+            value = (value << component_bits) | quantize_int(component)
+
+        return value
+
+    def unpack_int(self, value):
+        dequantize_int = self.component.dequantize_int
+        component_bits = self.component_bits
+        component_mask = self.component_mask
+        wrapper_length = self.wrapper_length
+
+        return [dequantize_int((value >> (component_bits * (wrapper_length - i - 1))) & component_mask)
+                for i in range(wrapper_length)]
+
+    def contains(self, vector):
+        contains = self.component.contains
+        return all(contains(component) for component in vector)
+
+    def quantize(self, vector):
+        return self.wrapper(self.unpack_int(self.pack_int(vector)))
+
+    def pack(self, vector):
+        return self.pack_int(vector).to_bytes(self.packed_size, 'big')
+
+    def unpack_from(self, bytes_string, offset=0):
+        value = int.from_bytes(bytes_string[offset: offset + self.packed_size], 'big')
+        return self.wrapper(self.unpack_int(value)), self.packed_size
+
+    def unpack_merge(self, vector, bytes_string, offset=0):
+        vector[:] = self.unpack_int(int.from_bytes(bytes_string[offset: offset + self.packed_size], 'big'))
+        return self.packed_size
+
+    def size(self, bytes_string=None):
+        return self.packed_size
+
+    def write(self, writer, vector):
+        writer.write(self.pack_int(vector), self.bits)
+
+    def read(self, reader):
+        return self.wrapper(self.unpack_int(reader.read(self.bits)))
+
+
+class SmallestThreeRotation:
+    """Handler for rotations compressed as unit quaternions.
+
+    The index of the largest quaternion component is packed in two bits, followed by the remaining three components
+    quantized over the range they can take. Also provides the bit handler interface.
+
+    Eulers are packed from their own rotation order, and unpacked in the order given by the "order" flag data
+    (default XYZ). Merged Eulers keep their existing order
+    """
+
+    component_range = sqrt(0.5)
+
+    def __init__(self, type_flag):
+        self.wrapper = type_flag.type
+        self.order = type_flag.data.get("order", "XYZ")
+        self.component = get_handler(TypeFlag(float, min=-self.component_range, max=self.component_range,
+                                              bits=type_flag.data["bits"]))
+
+        self.component_bits = type_flag.data["bits"]
+        self.component_mask = (1 << self.component_bits) - 1
+        self.bits = 2 + 3 * self.component_bits
+        self.packed_size = bits_to_bytes(self.bits)
+
+    def pack_int(self, rotation):
+        if isinstance(rotation, Quaternion):
+            quaternion = rotation.normalized()
+
+        else:
+            quaternion = rotation.to_quaternion()
+
+        components = list(quaternion)
+        largest_index = max(range(4), key=lambda i: abs(components[i]))
+
+        # Quaternion and its negation are the same rotation, so the largest component is always positive
+        if components[largest_index] < 0:
+            components = [-c for c in components]
+
+        quantize_int = self.component.quantize_int
+        component_bits = self.component_bits
+
+        value = largest_index
+        for index, component in enumerate(components):
+            if index != largest_index:
+                value = (value << component_bits) | quantize_int(component)
+
+        return value
+
+    def unpack_quaternion(self, value):
+        dequantize_int = self.component.dequantize_int
+        component_bits = self.component_bits
+        component_mask = self.component_mask
+
+        components = [dequantize_int((value >> (component_bits * (2 - i))) & component_mask) for i in range(3)]
+        largest_index = value >> (3 * component_bits)
+
+        largest = sqrt(max(0.0, 1.0 - sum(c * c for c in components)))
+        components.insert(largest_index, largest)
+
+        return Quaternion(components)
+
+    def unpack_int(self, value):
+        quaternion = self.unpack_quaternion(value)
+        if self.wrapper is Quaternion:
+            return quaternion
+
+        return quaternion.to_euler(self.order)
+
+    def quantize(self, rotation):
+        return self.unpack_int(self.pack_int(rotation))
+
+    def pack(self, rotation):
+        return self.pack_int(rotation).to_bytes(self.packed_size, 'big')
+
+    def unpack_from(self, bytes_string, offset=0):
+        value = int.from_bytes(bytes_string[offset: offset + self.packed_size], 'big')
+        return self.unpack_int(value), self.packed_size
+
+    def unpack_merge(self, rotation, bytes_string, offset=0):
+        quaternion = self.unpack_quaternion(int.from_bytes(bytes_string[offset: offset + self.packed_size], 'big'))
+        rotation[:] = quaternion if isinstance(rotation, Quaternion) else quaternion.to_euler(rotation.order)
+        return self.packed_size
+
+    def size(self, bytes_string=None):
+        return self.packed_size
+
+    def write(self, writer, rotation):
+        writer.write(self.pack_int(rotation), self.bits)
+
+    def read(self, reader):
+        return self.unpack_int(reader.read(self.bits))
+
+
 def matrix_description(obj):
     return hash(tuple(chain.from_iterable(obj)))
 
@@ -103,12 +263,32 @@ def precision_switch(low, high, type_flag):
     return high if type_flag.data.get("max_precision") else low
 
 
+def quantized_switch(quantized, low, high, type_flag):
+    if "bits" in type_flag.data:
+        return quantized(type_flag)
+
+    return precision_switch(low, high, type_flag)
+
+
+def quantized_bit_switch(type_flag):
+    if "bits" in type_flag.data:
+        return get_handler(type_flag)
+
+    return AlignedBitHandler(type_flag)
+
+
 # Register packers
-register_handler(Vector, partial(precision_switch, Vector4, Vector8), is_callable=True)
-register_handler(Euler, partial(precision_switch, Euler4, Euler8), is_callable=True)
-register_handler(Quaternion, partial(precision_switch, Quaternion4, Quaternion8), is_callable=True)
+register_handler(Vector, partial(quantized_switch, QuantizedVector, Vector4, Vector8), is_callable=True)
+register_handler(Euler, partial(quantized_switch, SmallestThreeRotation, Euler4, Euler8), is_callable=True)
+register_handler(Quaternion, partial(quantized_switch, SmallestThreeRotation, Quaternion4, Quaternion8),
+                 is_callable=True)
 register_handler(Matrix, partial(precision_switch, Matrix4, Matrix8), is_callable=True)
 
+# Register bit packers
+register_bit_handler(Vector, quantized_bit_switch)
+register_bit_handler(Euler, quantized_bit_switch)
+register_bit_handler(Quaternion, quantized_bit_switch)
+
 # Register custom hash-like descriptions
 register_description(Vector, vector_description)
 register_description(Euler, vector_description)
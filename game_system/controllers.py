@@ -2,7 +2,7 @@ from collections import defaultdict, OrderedDict
 from functools import partial
 from math import pi
 
-from network.decorators import requires_netmode
+from network.decorators import requires_netmode, urgent
 from network.descriptors import Attribute, FromClass
 from network.enums import Netmodes, Roles, IterableCompressionType
 from network.iterators import take_single
@@ -29,7 +29,7 @@ from .structs import RigidBodyState
 
 __all__ = ['Controller', 'PlayerController', 'AIController']
 
-TICK_FLAG = TypeFlag(int, max_value=WorldInfo._MAXIMUM_TICK)
+TICK_FLAG = TypeFlag(int, max_value=WorldInfo._MAXIMUM_TICK, encoding="varint")
 
 
 class Controller(Replicable):
@@ -278,6 +278,7 @@ class PlayerController(Controller, NetworkLocksMixin):
 
         return True
 
+    @urgent
     def client_apply_correction(self, move_id: TICK_FLAG, correction: TypeFlag(RigidBodyState)) -> Netmodes.client:
         """Apply a correction to a stored move and replay successive inputs to update client stat
 
@@ -390,8 +391,8 @@ class PlayerController(Controller, NetworkLocksMixin):
                                                compression=field_compression)
         attributes['mouse_y_list'] = Attribute(type_of=list, element_flag=TypeFlag(float),
                                                compression=field_compression)
-        attributes['id_start'] = Attribute(type_of=int, max_value=MAXIMUM_TICK)
-        attributes['id_end'] = Attribute(type_of=int, max_value=MAXIMUM_TICK)
+        attributes['id_start'] = Attribute(type_of=int, max_value=MAXIMUM_TICK, encoding="varint")
+        attributes['id_end'] = Attribute(type_of=int, max_value=MAXIMUM_TICK, encoding="varint")
         attributes['__slots__'] = tuple(Struct.__slots__)
 
         # Local variables
@@ -514,7 +515,7 @@ class PlayerController(Controller, NetworkLocksMixin):
         attributes['mouse_y'] = Attribute(0.0, max_precision=True)
         attributes['position'] = Attribute(type_of=Vector)
         attributes['rotation'] = Attribute(type_of=Euler)
-        attributes['id'] = Attribute(type_of=int, max_value=MAXIMUM_TICK)
+        attributes['id'] = Attribute(type_of=int, max_value=MAXIMUM_TICK, encoding="varint")
 
         attributes['__slots__'] = tuple(Struct.__slots__)
 
@@ -1,8 +1,10 @@
 from functools import partial
 
 from network.decorators import requires_netmode, simulated
-from network.descriptors import Attribute
+from network.codecs import get_attribute_flags
+from network.descriptors import Attribute, FromClass
 from network.enums import Netmodes, Roles
+from network.handlers import is_within_range, quantize_value
 from network.utilities import mean
 from network.replicable import Replicable
 from network.signals import SignalListener
@@ -91,11 +93,14 @@ class Actor(Entity, Replicable):
 
     component_tags = ("physics", "transform")
 
-    # Physics data
-    network_position = Attribute(type_of=Vector)
-    network_velocity = Attribute(type_of=Vector)
-    network_orientation = Attribute(type_of=Euler, notify=True)
-    network_angular = Attribute(type_of=Vector, notify=True)
+    # Physics data, quantized within the bounds of the class
+    network_position = Attribute(type_of=Vector, min=FromClass("position_min"), max=FromClass("position_max"),
+                                 bits=FromClass("position_bits"))
+    network_velocity = Attribute(type_of=Vector, min=FromClass("velocity_min"), max=FromClass("velocity_max"),
+                                 bits=FromClass("velocity_bits"))
+    network_orientation = Attribute(type_of=Euler, notify=True, bits=FromClass("orientation_bits"))
+    network_angular = Attribute(type_of=Vector, notify=True, min=FromClass("angular_min"),
+                                max=FromClass("angular_max"), bits=FromClass("angular_bits"))
     network_collision_group = Attribute(type_of=int, notify=True)
     network_collision_mask = Attribute(type_of=int, notify=True)
     network_replication_time = Attribute(type_of=float, notify=True)
@@ -106,6 +111,12 @@ class Actor(Entity, Replicable):
     MAX_POSITION_DIFFERENCE_SQUARED = 4
     POSITION_CONVERGE_FACTOR = 0.6
 
+    # Quantization bounds of replicated physics
+    position_min, position_max, position_bits = -1024, 1024, 20
+    velocity_min, velocity_max, velocity_bits = -64, 64, 16
+    angular_min, angular_max, angular_bits = -32, 32, 14
+    orientation_bits = 10
+
     # Default settings
     always_relevant = False
     replicate_physics_to_owner = False
@@ -135,11 +146,37 @@ class Actor(Entity, Replicable):
             yield "network_replication_time"
 
     def copy_state_to_network(self):
-        """Copies Physics State to network attributes"""
-        self.network_position = self.transform.world_position.copy()
-        self.network_orientation = self.transform.world_orientation.copy()
-        self.network_angular = self.physics.world_angular.copy()
-        self.network_velocity = self.physics.world_velocity.copy()
+        """Copies Physics State to network attributes.
+
+        Physics state within the quantization bounds is snapped to the quantized values received by clients
+        """
+        flags = get_attribute_flags(self.__class__)
+        transform = self.transform
+        physics = self.physics
+
+        position = transform.world_position
+        orientation = transform.world_orientation
+        angular = physics.world_angular
+        velocity = physics.world_velocity
+
+        self.network_position = quantize_value(flags["network_position"], position)
+        self.network_orientation = quantize_value(flags["network_orientation"], orientation)
+        self.network_angular = quantize_value(flags["network_angular"], angular)
+        self.network_velocity = quantize_value(flags["network_velocity"], velocity)
+
+        # Values outside the bounds are clamped, so physics is left unchanged
+        if is_within_range(flags["network_position"], position):
+            transform.world_position = self.network_position
+
+        if is_within_range(flags["network_orientation"], orientation):
+            transform.world_orientation = self.network_orientation
+
+        if is_within_range(flags["network_angular"], angular):
+            physics.world_angular = self.network_angular
+
+        if is_within_range(flags["network_velocity"], velocity):
+            physics.world_velocity = self.network_velocity
+
         self.network_collision_group = self.physics.collision_group
         self.network_collision_mask = self.physics.collision_mask
         self.network_replication_time = WorldInfo.elapsed
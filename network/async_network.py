@@ -0,0 +1,181 @@
+from .network import Network, NonBlockingSocketUDP
+from .simple_network import SimpleNetwork
+from .connection import Connection
+
+from asyncio import DatagramProtocol, get_event_loop, new_event_loop
+from collections import deque
+from math import ceil
+
+__all__ = ["NetworkDatagramProtocol", "AsyncNetwork", "AsyncSimpleNetwork"]
+
+
+class NetworkDatagramProtocol(DatagramProtocol):
+    """Datagram protocol which buffers received datagrams for a Network"""
+
+    def __init__(self, received_queue):
+        self.received_queue = received_queue
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, address):
+        self.received_queue.append((data, address))
+
+    def error_received(self, exc):
+        # Ignore ICMP errors (e.g. port unreachable), as recvfrom would
+        pass
+
+
+class AsyncNetwork(Network):
+    """Network management class using an asyncio datagram transport.
+
+    Datagrams are received when the socket is readable and processed on the next call to receive
+    """
+
+    def __init__(self, address, port, loop=None, socket_factory=NonBlockingSocketUDP):
+        super().__init__(address, port, socket_factory=socket_factory)
+
+        # Use the current loop, which is the running loop when created from a coroutine
+        if loop is None:
+            try:
+                loop = get_event_loop()
+
+            except RuntimeError:
+                loop = new_event_loop()
+
+        self.loop = loop
+        self.transport = None
+
+        self._received_queue = deque()
+
+    @property
+    def received_data(self):
+        on_received_bytes = self.metrics.on_received_bytes
+        received_queue = self._received_queue
+
+        while received_queue:
+            data = received_queue.popleft()
+
+            payload, _ = data
+            on_received_bytes(len(payload))
+
+            yield data
+
+    async def open(self):
+        """Create datagram endpoint for network socket"""
+        self.transport, _ = await self.loop.create_datagram_endpoint(
+            lambda: NetworkDatagramProtocol(self._received_queue), sock=self.socket)
+
+    def send_to(self, data, address):
+        self.transport.sendto(data, address)
+
+        data_length = len(data)
+        self.metrics.on_sent_bytes(data_length)
+        return data_length
+
+    def send_multiple(self, datagrams):
+        send_to = self.transport.sendto
+        data_length = 0
+
+        for data, address in datagrams:
+            send_to(data, address)
+            data_length += len(data)
+
+        self.metrics.on_sent_bytes(data_length)
+        return data_length
+
+    def stop(self):
+        """Close network transport"""
+        if self.transport is None:
+            super().stop()
+
+        else:
+            self.transport.close()
+
+
+class AsyncSimpleNetwork(AsyncNetwork, SimpleNetwork):
+    """Simple network update loop scheduled by an asyncio event loop.
+
+    Ticks are scheduled against a fixed timeline, so that late wake-ups do not accumulate drift.
+    Wake-ups may be late by the timer resolution of the selector, but the loop never blocks waiting for a tick
+    """
+
+    def __init__(self, address, port, loop=None, socket_factory=NonBlockingSocketUDP):
+        super().__init__(address, port, loop, socket_factory)
+
+        self._finished = None
+        self._timeout = None
+        self._tick_handle = None
+        self._next_tick_time = 0.0
+        self._started_time = 0.0
+
+    def _schedule_tick(self, update_rate):
+        """Schedule next tick on the fixed timeline
+
+        :param update_rate: interval between ticks
+        """
+        self._next_tick_time += update_rate
+        current_time = self.loop.time()
+
+        # Skip ticks we are too late to run
+        if self._next_tick_time < current_time:
+            missed_ticks = ceil((current_time - self._next_tick_time) / update_rate)
+            self._next_tick_time += missed_ticks * update_rate
+
+        self._tick_handle = self.loop.call_at(self._next_tick_time, self._on_tick, update_rate)
+
+    def _on_tick(self, update_rate):
+        time = self.loop.time
+        any_connections = bool(Connection)
+
+        if self._timeout is None:
+            timed_out = False
+
+        else:
+            timed_out = (time() - self._started_time) > self._timeout
+
+        if not any_connections and timed_out:
+            self._finished.set_result(None)
+            return
+
+        try:
+            self.step()
+
+        except Exception as err:
+            self._finished.set_exception(err)
+            return
+
+        self._schedule_tick(update_rate)
+
+    async def run(self, timeout=None, update_rate=1/60):
+        """Run network update loop until finished
+
+        :param timeout: duration after which the loop may finish, when there are no connections
+        :param update_rate: interval between ticks
+        """
+        await self.open()
+
+        self.init()
+
+        if callable(self.on_initialised):
+            self.on_initialised()
+
+        self._timeout = timeout
+        self._finished = self.loop.create_future()
+        self._started_time = self._next_tick_time = self.loop.time()
+        self._tick_handle = self.loop.call_at(self._next_tick_time, self._on_tick, update_rate)
+
+        try:
+            await self._finished
+
+        finally:
+            self._tick_handle.cancel()
+
+            if callable(self.on_finished):
+                self.on_finished()
+
+            self.stop()
+
+    def start(self, timeout=None, update_rate=1/60):
+        self.loop.run_until_complete(self.run(timeout, update_rate))
@@ -0,0 +1,312 @@
+from socket import AF_INET, error as SOCK_ERROR, gethostbyname, inet_aton, inet_ntoa
+from errno import EAGAIN, EWOULDBLOCK
+from os import strerror
+from struct import Struct, pack, unpack_from
+
+import sys
+
+__all__ = ['DatagramBackend', 'RecvmsgBackend', 'MultipleMessageBackend', 'get_best_backend']
+
+
+class DatagramBackend:
+    """Portable socket backend.
+
+    Receives and sends a single datagram per system call.
+
+    Received payloads are views of a pooled receive buffer, which is reused by the next receive
+    """
+
+    def __init__(self, socket, buffer_size=63553):
+        self.socket = socket
+        self.buffer_size = buffer_size
+
+        self._buffer = bytearray(buffer_size)
+        self._buffer_view = memoryview(self._buffer)
+
+    def receive(self):
+        """Drain all pending datagrams from socket
+
+        :yield: payload view, address
+        """
+        receive_from_into = self.socket.recvfrom_into
+        buffer_view = self._buffer_view
+
+        while True:
+            try:
+                data_length, address = receive_from_into(buffer_view)
+
+            except SOCK_ERROR:
+                return
+
+            yield buffer_view[:data_length], address
+
+    def send(self, datagrams):
+        """Send sequence of datagrams to their peers
+
+        Datagrams which do not fit in a full send buffer are dropped, as if lost
+
+        :param datagrams: sequence of payload, address pairs
+        :returns: total bytes sent
+        """
+        send_to = self.socket.sendto
+        total_sent = 0
+
+        for data, address in datagrams:
+            try:
+                total_sent += send_to(data, address)
+
+            except BlockingIOError:
+                break
+
+        return total_sent
+
+
+class RecvmsgBackend(DatagramBackend):
+    """Socket backend which receives using recvmsg_into"""
+
+    def __init__(self, socket, buffer_size=63553):
+        super().__init__(socket, buffer_size)
+
+        self._buffers = [self._buffer_view]
+
+    def receive(self):
+        receive_into = self.socket.recvmsg_into
+        buffer_view = self._buffer_view
+        buffers = self._buffers
+
+        while True:
+            try:
+                data_length, _, _, address = receive_into(buffers)
+
+            except SOCK_ERROR:
+                return
+
+            yield buffer_view[:data_length], address
+
+
+class MultipleMessageBackend(DatagramBackend):
+    """Linux socket backend.
+
+    Drains and flushes datagrams in batches using recvmmsg and sendmmsg.
+
+    Received payloads are views of pooled receive buffers, which are reused by the next batch
+    """
+
+    MSG_DONTWAIT = 0x40
+    SOCKADDR_SIZE = 16
+
+    def __init__(self, socket, buffer_size=63553, batch_size=64):
+        super().__init__(socket, buffer_size)
+
+        if not _multiple_message_support:
+            raise OSError("recvmmsg and sendmmsg are not supported on this platform")
+
+        if socket.family != AF_INET:
+            raise ValueError("Only AF_INET sockets are supported")
+
+        self.batch_size = batch_size
+
+        self._file_descriptor = socket.fileno()
+        self._packed_addresses = []
+        self._address_pointers = {}
+        self._unpacked_addresses = {}
+
+        # Receive buffers are bound once and reused
+        self._receive_buffers = [bytearray(buffer_size) for _ in range(batch_size)]
+        self._receive_addresses = [bytearray(self.SOCKADDR_SIZE) for _ in range(batch_size)]
+        self._receive_views = [memoryview(buffer) for buffer in self._receive_buffers]
+        self._receive_iovecs, self._receive_messages = self._create_messages(batch_size)
+        self._receive_lengths = Struct("={}xI".format(_MMsgHdr.msg_len.offset))
+
+        for index, (buffer, address) in enumerate(zip(self._receive_buffers, self._receive_addresses)):
+            iovec = self._receive_iovecs[index]
+            iovec.iov_base = addressof((c_char * buffer_size).from_buffer(buffer))
+            iovec.iov_len = buffer_size
+
+            header = self._receive_messages[index].msg_hdr
+            header.msg_name = addressof((c_char * self.SOCKADDR_SIZE).from_buffer(address))
+
+        # Send buffers point to outgoing data for each batch
+        self._send_iovecs, self._send_messages = self._create_messages(batch_size)
+        self._send_iovec_view = memoryview((c_char * sizeof(self._send_iovecs)).from_buffer(self._send_iovecs))
+        self._send_message_view = memoryview((c_char * sizeof(self._send_messages)).from_buffer(self._send_messages))
+
+        self._iovec_struct = Struct("PN")
+        self._pointer_struct = Struct("P")
+
+    def _create_messages(self, count):
+        """Create array of mmsghdr structures, each bound to a single iovec
+
+        :param count: number of messages
+        """
+        iovecs = (_IOVec * count)()
+        messages = (_MMsgHdr * count)()
+
+        for index in range(count):
+            header = messages[index].msg_hdr
+            header.msg_namelen = self.SOCKADDR_SIZE
+            header.msg_iov = pointer(iovecs[index])
+            header.msg_iovlen = 1
+
+        return iovecs, messages
+
+    def _get_address_pointer(self, address):
+        """Return pointer to sockaddr_in structure for address tuple
+
+        :param address: host, port pair
+        """
+        try:
+            return self._address_pointers[address]
+
+        except KeyError:
+            host, port = address
+            packed = pack("=H", AF_INET) + pack("!H", port) + inet_aton(gethostbyname(host)) + bytes(8)
+            packed_address = create_string_buffer(packed, self.SOCKADDR_SIZE)
+
+            # Keep structure alive for lifetime of pointer
+            self._packed_addresses.append(packed_address)
+            pointer_value = self._address_pointers[address] = addressof(packed_address)
+            return pointer_value
+
+    def _unpack_address(self, packed_address):
+        """Unpack sockaddr_in structure into address tuple
+
+        :param packed_address: sockaddr_in bytes
+        """
+        try:
+            return self._unpacked_addresses[packed_address]
+
+        except KeyError:
+            port, = unpack_from("!H", packed_address, 2)
+            address = self._unpacked_addresses[packed_address] = inet_ntoa(packed_address[4:8]), port
+            return address
+
+    def receive(self):
+        messages = self._receive_messages
+        message_lengths = self._receive_lengths
+        buffers = self._receive_views
+        addresses = self._receive_addresses
+        batch_size = self.batch_size
+        file_descriptor = self._file_descriptor
+        unpack_address = self._unpack_address
+        message_size = sizeof(_MMsgHdr)
+        flags = self.MSG_DONTWAIT
+
+        while True:
+            received_count = _recvmmsg(file_descriptor, messages, batch_size, flags, None)
+
+            if received_count < 0:
+                error_number = get_errno()
+
+                # No datagrams are pending
+                if error_number in (EAGAIN, EWOULDBLOCK):
+                    return
+
+                raise SOCK_ERROR(error_number, strerror(error_number))
+
+            if not received_count:
+                return
+
+            for index in range(received_count):
+                data_length, = message_lengths.unpack_from(messages, index * message_size)
+                yield buffers[index][:data_length], unpack_address(bytes(addresses[index]))
+
+            # Queue was drained
+            if received_count < batch_size:
+                return
+
+    def send(self, datagrams):
+        messages = self._send_messages
+        iovec_view = self._send_iovec_view
+        message_view = self._send_message_view
+        message_size = sizeof(_MMsgHdr)
+        iovec_size = sizeof(_IOVec)
+        pack_iovec = self._iovec_struct.pack_into
+        pack_pointer = self._pointer_struct.pack_into
+        get_address_pointer = self._get_address_pointer
+        batch_size = self.batch_size
+        file_descriptor = self._file_descriptor
+
+        total_sent = 0
+
+        for batch_start in range(0, len(datagrams), batch_size):
+            batch = datagrams[batch_start: batch_start + batch_size]
+
+            # Point iovecs into a single contiguous buffer
+            batch_data = b''.join([data for data, _ in batch])
+            batch_pointer = c_char_p(batch_data)
+            data_address = cast(batch_pointer, c_void_p).value
+
+            for index, (data, address) in enumerate(batch):
+                data_length = len(data)
+
+                pack_iovec(iovec_view, index * iovec_size, data_address, data_length)
+                pack_pointer(message_view, index * message_size, get_address_pointer(address))
+
+                data_address += data_length
+
+            batch_length = len(batch)
+            sent_count = 0
+
+            # Retry partially sent batches
+            while sent_count < batch_length:
+                result = _sendmmsg(file_descriptor, byref(messages[sent_count]), batch_length - sent_count, 0)
+
+                if result < 0:
+                    error_number = get_errno()
+
+                    # Send buffer is full, drop the unsent datagrams
+                    if error_number in (EAGAIN, EWOULDBLOCK):
+                        return total_sent + sum([len(data) for data, _ in batch[:sent_count]])
+
+                    raise SOCK_ERROR(error_number, strerror(error_number))
+
+                sent_count += result
+
+            total_sent += len(batch_data)
+
+        return total_sent
+
+
+def get_best_backend():
+    """Return the most efficient backend supported by this platform"""
+    if _multiple_message_support:
+        return MultipleMessageBackend
+
+    return RecvmsgBackend if sys.platform != "win32" else DatagramBackend
+
+
+# Determine support for multiple message system calls
+_multiple_message_support = False
+
+if sys.platform.startswith("linux"):
+    from ctypes import (CDLL, POINTER, Structure, addressof, byref, c_char, c_char_p, c_int, c_size_t, c_uint,
+                        c_void_p, cast, create_string_buffer, get_errno, pointer, sizeof)
+    from ctypes.util import find_library
+
+    class _IOVec(Structure):
+        _fields_ = [("iov_base", c_void_p), ("iov_len", c_size_t)]
+
+    class _MsgHdr(Structure):
+        _fields_ = [("msg_name", c_void_p), ("msg_namelen", c_uint), ("msg_iov", POINTER(_IOVec)),
+                    ("msg_iovlen", c_size_t), ("msg_control", c_void_p), ("msg_controllen", c_size_t),
+                    ("msg_flags", c_int)]
+
+    class _MMsgHdr(Structure):
+        _fields_ = [("msg_hdr", _MsgHdr), ("msg_len", c_uint)]
+
+    try:
+        _libc = CDLL(find_library("c"), use_errno=True)
+        _recvmmsg = _libc.recvmmsg
+        _sendmmsg = _libc.sendmmsg
+
+    except (OSError, AttributeError):
+        pass
+
+    else:
+        _recvmmsg.argtypes = [c_int, POINTER(_MMsgHdr), c_uint, c_int, c_void_p]
+        _recvmmsg.restype = c_int
+        _sendmmsg.argtypes = [c_int, POINTER(_MMsgHdr), c_uint, c_int]
+        _sendmmsg.restype = c_int
+
+        _multiple_message_support = True
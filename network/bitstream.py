@@ -0,0 +1,238 @@
+from .handlers import get_handler
+
+from struct import Struct
+
+__all__ = ['BitWriter', 'BitReader', 'BitIntHandler', 'BitBoolHandler', 'BitFloatHandler', 'AlignedBitHandler',
+           'register_bit_handler', 'get_bit_handler']
+
+
+bit_handlers = {}
+
+
+class BitWriter:
+    """Writes values of arbitrary bit width to a byte stream.
+
+    Bits are written most significant first, and the final byte is padded with zeros
+    """
+
+    __slots__ = ['_value', '_length']
+
+    def __init__(self):
+        self._value = 0
+        self._length = 0
+
+    def __len__(self):
+        return self._length
+
+    def align(self):
+        """Pad written bits to the next byte boundary"""
+        padding = -self._length % 8
+
+        self._value <<= padding
+        self._length += padding
+
+    def write(self, value, bits):
+        """Write unsigned integer value
+
+        :param value: value to write
+        :param bits: width of value in bits
+        """
+        if value >> bits:
+            raise ValueError("Value {} cannot be written in {} bits".format(value, bits))
+
+        self._value = (self._value << bits) | value
+        self._length += bits
+
+    def write_bool(self, value):
+        """Write boolean as a single bit
+
+        :param value: value to write
+        """
+        self._value = (self._value << 1) | (1 if value else 0)
+        self._length += 1
+
+    def write_bytes(self, bytes_string):
+        """Write bytes at the current bit position
+
+        :param bytes_string: bytes to write
+        """
+        bits = 8 * len(bytes_string)
+
+        self._value = (self._value << bits) | int.from_bytes(bytes_string, 'big')
+        self._length += bits
+
+    def to_bytes(self):
+        """Return written bits as bytes"""
+        padding = -self._length % 8
+        return (self._value << padding).to_bytes((self._length + padding) // 8, 'big')
+
+
+class BitReader:
+    """Reads values of arbitrary bit width from a byte stream written by :py:class:`BitWriter`"""
+
+    __slots__ = ['bytes_string', 'position']
+
+    def __init__(self, bytes_string, offset=0):
+        self.bytes_string = bytes_string
+        self.position = offset * 8
+
+    @property
+    def byte_offset(self):
+        """Offset of the first byte which has not been read"""
+        return (self.position + 7) >> 3
+
+    def align(self):
+        """Skip to the next byte boundary"""
+        self.position = (self.position + 7) & ~7
+
+    def read(self, bits):
+        """Read unsigned integer value
+
+        :param bits: width of value in bits
+        """
+        if not bits:
+            return 0
+
+        start = self.position >> 3
+        end = (self.position + bits + 7) >> 3
+
+        if end > len(self.bytes_string):
+            raise ValueError("Cannot read {} bits beyond end of stream".format(bits))
+
+        self.position += bits
+        return (int.from_bytes(self.bytes_string[start: end], 'big') >> (end * 8 - self.position)) & ((1 << bits) - 1)
+
+    def read_bool(self):
+        """Read boolean from a single bit"""
+        return bool(self.read(1))
+
+    def skip_bytes(self, count):
+        """Skip bytes read by another handler
+
+        :param count: number of bytes to skip
+        """
+        self.position += 8 * count
+
+
+class BitIntHandler:
+    """Bit handler for unsigned integers of the exact width required by a TypeFlag"""
+
+    def __init__(self, type_flag):
+        data = type_flag.data
+
+        if "max_value" in data:
+            self.bits = data["max_value"].bit_length()
+
+        else:
+            self.bits = data.get("max_bits", 8)
+
+    def write(self, writer, value):
+        writer.write(value, self.bits)
+
+    def read(self, reader):
+        return reader.read(self.bits)
+
+
+class BitBoolHandler:
+    """Bit handler for booleans as a single bit"""
+
+    bits = 1
+
+    @staticmethod
+    def write(writer, value):
+        writer.write_bool(value)
+
+    @staticmethod
+    def read(reader):
+        return reader.read_bool()
+
+
+class BitFloatHandler:
+    """Bit handler for floats of single or double precision"""
+
+    def __init__(self, type_flag):
+        if type_flag.data.get("max_precision"):
+            self._float_struct, self._int_struct = Struct("!d"), Struct("!Q")
+
+        else:
+            self._float_struct, self._int_struct = Struct("!f"), Struct("!I")
+
+        self.bits = 8 * self._float_struct.size
+
+    def write(self, writer, value):
+        writer.write(self._int_struct.unpack(self._float_struct.pack(value))[0], self.bits)
+
+    def read(self, reader):
+        return self._float_struct.unpack(self._int_struct.pack(reader.read(self.bits)))[0]
+
+
+class AlignedBitHandler:
+    """Bit handler for types without bit-exact handlers.
+
+    Values are packed by their byte handler from the next byte boundary
+    """
+
+    bits = None
+
+    def __init__(self, type_flag):
+        self.handler = get_handler(type_flag)
+
+    def write(self, writer, value):
+        writer.align()
+        writer.write_bytes(self.handler.pack(value))
+
+    def read(self, reader):
+        reader.align()
+        value, value_size = self.handler.unpack_from(reader.bytes_string, reader.position >> 3)
+        reader.skip_bytes(value_size)
+        return value
+
+
+def int_bit_selector(type_flag):
+    """Return bit handler for an int TypeFlag, packing varint encodings byte aligned
+
+    :param type_flag: type flag for int value
+    """
+    if "encoding" in type_flag.data:
+        return AlignedBitHandler(type_flag)
+
+    return BitIntHandler(type_flag)
+
+
+def float_bit_selector(type_flag):
+    """Return bit handler for a float TypeFlag, using the quantized handler if the TypeFlag requests quantization
+
+    :param type_flag: type flag for float value
+    """
+    if "bits" in type_flag.data:
+        return get_handler(type_flag)
+
+    return BitFloatHandler(type_flag)
+
+
+def register_bit_handler(value_type, handler_builder):
+    """Registers bit handler builder for a type, which is called with the TypeFlag that requests it
+
+    :param value_type: type of object
+    :param handler_builder: callable which returns bit handler for a TypeFlag
+    """
+    bit_handlers[value_type] = handler_builder
+
+
+def get_bit_handler(type_flag):
+    """Return bit handler for a TypeFlag, falling back to byte aligned packing with its byte handler
+
+    :param type_flag: TypeFlag subclass
+    """
+    try:
+        handler_builder = bit_handlers[type_flag.type]
+
+    except KeyError:
+        return AlignedBitHandler(type_flag)
+
+    return handler_builder(type_flag)
+
+
+register_bit_handler(int, int_bit_selector)
+register_bit_handler(bool, lambda type_flag: BitBoolHandler)
+register_bit_handler(float, float_bit_selector)
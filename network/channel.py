@@ -1,19 +1,40 @@
+from .codecs import get_delta_codec
 from .conditions import is_reliable
 from .type_flag import TypeFlag
 from .decorators import with_tag
 from .enums import Netmodes
-from .flag_serialiser import FlagSerialiser
 from .handlers import static_description, get_handler
 from .logger import logger
 from .tagged_delegate import DelegateByNetmode
 from .replicable import Replicable
 
+from collections import OrderedDict
+from copy import deepcopy
 from functools import partial
 from time import clock
 
 __all__ = ['Channel', 'ClientChannel', 'ServerChannel']
 
 
+# Update IDs are the low bits of the server update sequence
+UPDATE_ID_MASK = 0xFFFF
+
+# Maximum number of updates which may reference the same acknowledged baseline
+MAX_BASELINE_AGE = 64
+
+# Maximum number of reconstructed states the client retains as possible baselines
+MAX_CLIENT_BASELINES = 2 * MAX_BASELINE_AGE
+
+
+def is_newer_update(update_id, other_id):
+    """Return True if update ID is more recent than another update ID, accounting for wraparound
+
+    :param update_id: update ID
+    :param other_id: update ID to compare against
+    """
+    return 0 < ((update_id - other_id) & UPDATE_ID_MASK) <= (UPDATE_ID_MASK >> 1)
+
+
 class Channel(DelegateByNetmode):
     """Channel for replication information
     Belongs to an instance of Replicable and a connection"""
@@ -31,10 +52,12 @@ class Channel(DelegateByNetmode):
         self.attribute_storage = replicable._attribute_container
         self.rpc_storage = replicable._rpc_container
 
-        # Create a serialiser instance
-        self.serialiser = FlagSerialiser(self.attribute_storage._ordered_mapping)
+        # Serialiser is shared by all channels of the replicable class
+        self.serialiser = get_delta_codec(replicable.__class__)
 
         self.rpc_id_packer = get_handler(TypeFlag(int))
+        self.update_id_packer = get_handler(TypeFlag(int, max_value=UPDATE_ID_MASK))
+        self.baseline_offset_packer = get_handler(TypeFlag(int, max_value=MAX_BASELINE_AGE))
         self.replicable_id_packer = get_handler(TypeFlag(Replicable))
         self.packed_id = self.replicable_id_packer.pack(replicable)
 
@@ -61,11 +84,12 @@ class Channel(DelegateByNetmode):
 
         storage_data.clear()
 
-    def invoke_rpc_call(self, rpc_call):
+    def invoke_rpc_call(self, rpc_call, offset=0):
         """Invokes an RPC call from packaged format
 
-        :param rpc_call: rpc data (see take_rpc_calls)"""
-        rpc_id, rpc_header_size = self.rpc_id_packer.unpack_from(rpc_call)
+        :param rpc_call: rpc data (see take_rpc_calls)
+        :param offset: offset of rpc data"""
+        rpc_id, rpc_header_size = self.rpc_id_packer.unpack_from(rpc_call, offset)
 
         try:
             method = self.rpc_storage.functions[rpc_id]
@@ -74,7 +98,7 @@ class Channel(DelegateByNetmode):
             logger.exception("Error invoking RPC: No RPC function with id {}".format(rpc_id))
 
         else:
-            method.execute(rpc_call[rpc_header_size:])
+            method.execute(rpc_call, offset + rpc_header_size)
 
     @property
     def has_rpc_calls(self):
@@ -85,6 +109,16 @@ class Channel(DelegateByNetmode):
 @with_tag(Netmodes.client)
 class ClientChannel(Channel):
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        # Updates are decoded against states reconstructed from earlier updates, or the initial values
+        self.default_state = {a.name: deepcopy(a.initial_value) for a in self.attribute_storage.data}
+        self.states = OrderedDict()
+
+        self.applied_update_id = None
+        self.applied_state = self.default_state
+
     def notify_callback(self, notifications):
         invoke_notify = self.replicable.on_notify
         for attribute_name in notifications:
@@ -102,8 +136,61 @@ class ClientChannel(Channel):
     def set_attributes(self, bytes_string, offset=0):
         """Unpacks byte stream and updates attributes
 
+        Updates which arrive out of order are retained as baselines, but not applied
+
         :param bytes\_: byte stream of attribute"""
-        replicable = self.replicable
+        update_id, id_size = self.update_id_packer.unpack_from(bytes_string, offset)
+        offset += id_size
+
+        baseline_offset, baseline_offset_size = self.baseline_offset_packer.unpack_from(bytes_string, offset)
+        offset += baseline_offset_size
+
+        states = self.states
+
+        if baseline_offset:
+            baseline_id = (update_id - baseline_offset) & UPDATE_ID_MASK
+
+            try:
+                baseline = states[baseline_id]
+
+            except KeyError:
+                logger.error("Unable to find baseline {} for update {} of {}"
+                             .format(baseline_id, update_id, self.replicable))
+                return
+
+            # The server no longer references baselines older than this
+            for state_id in [i for i in states if is_newer_update(baseline_id, i)]:
+                del states[state_id]
+
+        else:
+            baseline_id = None
+            baseline = self.default_state
+
+        changes = self.serialiser.unpack(bytes_string, baseline, offset=offset)
+
+        state = baseline.copy()
+        state.update(changes)
+
+        states[update_id] = state
+        if len(states) > MAX_CLIENT_BASELINES:
+            states.popitem(last=False)
+
+        # Don't apply out of date updates
+        applied_update_id = self.applied_update_id
+        if applied_update_id is not None and not is_newer_update(update_id, applied_update_id):
+            return
+
+        # Apply values which differ between the baseline and the last applied state
+        if baseline_id is None or baseline_id != applied_update_id:
+            applied_state = self.applied_state
+            changed_names = {name for name, _ in changes}
+            get_description = static_description
+
+            changes.extend([(name, value) for name, value in state.items() if name not in changed_names and
+                            get_description(value) != get_description(applied_state[name])])
+
+        self.applied_update_id = update_id
+        self.applied_state = state
 
         # Create local references outside loop
         replicable_data = self.attribute_storage.data
@@ -111,10 +198,10 @@ class ClientChannel(Channel):
         notifications = []
         notify = notifications.append
 
-        for attribute_name, value in self.serialiser.unpack(bytes_string, replicable_data, offset=offset):
+        for attribute_name, value in changes:
             attribute = get_attribute(attribute_name)
-            # Store new value
-            replicable_data[attribute] = value
+            # Store copy of new value, as the state may be a baseline of later updates
+            replicable_data[attribute] = deepcopy(value)
 
             # Check if needs notification
             if attribute.notify:
@@ -130,9 +217,28 @@ class ServerChannel(Channel):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.hash_dict = self.attribute_storage.get_default_descriptions()
         self.complaint_dict = self.attribute_storage.get_default_complaints()
 
+        # Baseline is (descriptions, values of delta encoded attributes) last acknowledged by the client
+        delta_names = self.serialiser.delta_names
+        default_values = {a.name: deepcopy(a.initial_value) for a in self.attribute_storage.data
+                          if a.name in delta_names}
+        self.default_baseline = self.attribute_storage.get_default_descriptions(), default_values
+
+        self.baseline = self.default_baseline
+        self.baseline_sequence = 0
+
+        # Sequence of last sent update, and the (baseline sequence, state, sent complaint hashes, is initial) of
+        # unacknowledged updates
+        self.update_sequence = 0
+        self.pending_updates = OrderedDict()
+
+        # Updates are only used as baselines once the client has created the replicable
+        self.is_created = False
+
+        # Initial and complaint attributes are replicated until an update containing them is acknowledged
+        self.is_initial_update_pending = True
+
     @property
     def replication_priority(self):
         """Gets the replication priority for a replicable
@@ -150,16 +256,66 @@ class ServerChannel(Channel):
         return ((interval >= self.replicable.replication_update_period)
                 or self.is_initial)
 
+    def acknowledge_creation(self, packet):
+        """Callback for acknowledgement of replicable creation by the client
+
+        :param packet: acknowledged packet
+        """
+        self.is_created = True
+
+    def acknowledge_update(self, update_sequence, packet):
+        """Callback for acknowledgement of attribute update by the client.
+
+        Uses the update as the baseline of later updates, if it is newer than the current baseline, and the client could
+        decode it. Complaints and initial attributes sent by the update are no longer replicated
+
+        :param update_sequence: sequence of acknowledged update
+        :param packet: acknowledged packet
+        """
+        try:
+            update_baseline_sequence, state, complaints, is_initial = self.pending_updates.pop(update_sequence)
+
+        except KeyError:
+            return
+
+        if not self.is_created:
+            return
+
+        self.complaint_dict.update(complaints)
+
+        if is_initial:
+            self.is_initial_update_pending = False
+
+        if update_sequence <= self.baseline_sequence:
+            return
+
+        # Client discards baselines older than those which have been referenced
+        if update_baseline_sequence and update_baseline_sequence < self.baseline_sequence:
+            return
+
+        self.baseline = state
+        self.baseline_sequence = update_sequence
+
     def get_attributes(self, is_owner):
         # Get Replicable and its class
         replicable = self.replicable
 
+        update_sequence = self.update_sequence + 1
+
+        # Fall back to the default baseline if the acknowledged baseline is too old
+        if self.baseline_sequence and update_sequence - self.baseline_sequence > MAX_BASELINE_AGE:
+            self.baseline = self.default_baseline
+            self.baseline_sequence = 0
+            self.pending_updates.clear()
+
+        baseline_descriptions, baseline_values = self.baseline
+
         # Set role context
         with replicable.roles.set_context(is_owner):
 
             # Local access
-            previous_hashes = self.hash_dict
             previous_complaints = self.complaint_dict
+            is_initial = self.is_initial_update_pending
 
             complaint_hashes = self.attribute_storage.complaints
             is_complaining = previous_complaints != complaint_hashes
@@ -167,7 +323,7 @@ class ServerChannel(Channel):
             # Get names of Replicable attributes
             can_replicate = replicable.conditions(is_owner,
                                                   is_complaining,
-                                                  self.is_initial)
+                                                  is_initial)
 
             get_description = static_description
             get_attribute = self.attribute_storage.get_member_by_name
@@ -176,14 +332,22 @@ class ServerChannel(Channel):
             # Store dict of attribute-> value
             to_serialise = {}
 
+            # Complaint hashes which are acknowledged with this update
+            sent_complaints = {}
+
+            # State of client after this update
+            descriptions = baseline_descriptions.copy()
+            values = baseline_values.copy()
+            delta_names = self.serialiser.delta_names
+
             # Iterate over attributes
             for name in can_replicate:
                 # Get current value
                 attribute = get_attribute(name)
                 value = attribute_data[attribute]
 
-                # Check if the last hash is the same
-                last_hash = previous_hashes[attribute]
+                # Check if the baseline hash is the same
+                last_hash = baseline_descriptions[attribute]
 
                 # Get value hash
                 # Use the complaint hash if it is there to save computation
@@ -197,11 +361,15 @@ class ServerChannel(Channel):
                 to_serialise[name] = value
 
                 # Remember hash of value
-                previous_hashes[attribute] = new_hash
+                descriptions[attribute] = new_hash
+
+                # Remember value for delta encoding
+                if name in delta_names:
+                    values[name] = deepcopy(value)
 
-                # Set new complaint hash if it was complaining
+                # Set new complaint hash if it was complaining, once acknowledged
                 if attribute.complain and attribute in complaint_hashes:
-                    previous_complaints[attribute] = new_hash
+                    sent_complaints[attribute] = new_hash
 
             # We must have now replicated
             self.last_replication_time = clock()
@@ -209,8 +377,21 @@ class ServerChannel(Channel):
 
             # Outputting bytes asserts we have data
             if to_serialise:
+                baseline_sequence = self.baseline_sequence
+                baseline_offset = update_sequence - baseline_sequence if baseline_sequence else 0
+
                 # Returns packed data
-                data = self.serialiser.pack(to_serialise)
+                data = self.update_id_packer.pack(update_sequence & UPDATE_ID_MASK) + \
+                    self.baseline_offset_packer.pack(baseline_offset) + \
+                    self.serialiser.pack(to_serialise, baseline_values)
+
+                self.update_sequence = update_sequence
+
+                pending_updates = self.pending_updates
+                pending_updates[update_sequence] = (baseline_sequence, (descriptions, values), sent_complaints,
+                                                    is_initial)
+                if len(pending_updates) > MAX_BASELINE_AGE:
+                    pending_updates.popitem(last=False)
 
             else:
                 data = None
@@ -0,0 +1,606 @@
+from .bitfield import BitField, USE_BITARRAY
+from .bitstream import BitReader, BitWriter, get_bit_handler
+from .descriptors import FromClass
+from .flag_serialiser import FlagSerialiser
+from .handlers import get_handler
+from .serialiser import ZigZagHandler, handler_from_bit_length
+from .type_flag import TypeFlag
+
+from collections import OrderedDict
+from copy import deepcopy
+from struct import Struct
+
+__all__ = ['BitCodec', 'DifferenceDelta', 'XorDelta', 'ListDelta', 'DeltaCodec', 'build_codec', 'get_attribute_codec', 'get_attribute_flags',
+           'get_delta_codec']
+
+
+attribute_flags = {}
+codecs = {}
+delta_codecs = {}
+
+# Sentinel for members absent from packed data
+_missing = object()
+
+
+def _find_fixed_runs(handlers):
+    """Group consecutive handlers which pack a single struct character into runs
+
+    Returns list of (start index, stop index) pairs
+
+    :param handlers: list of handlers in packed order
+    """
+    runs = []
+    start = None
+
+    for index, handler in enumerate(handlers + [None]):
+        is_fixed = getattr(handler, "order_format", None) == "!" and hasattr(handler, "character_format")
+
+        if is_fixed:
+            if start is None:
+                start = index
+            continue
+
+        if start is not None and index - start > 1:
+            runs.append((start, index))
+
+        start = None
+
+    return runs
+
+
+def _pack_member_source(index):
+    return ["if v{0} is not _missing:".format(index),
+            "    contents |= {}".format(1 << index),
+            "    if v{} is None:".format(index),
+            "        nones |= {}".format(1 << index),
+            "    else:",
+            "        append(pack_{0}(v{0}))".format(index)]
+
+
+def _unpack_member_source(index, key, can_merge):
+    lines = ["if contents & {}:".format(1 << index),
+             "    if nones & {}:".format(1 << index),
+             "        append(({!r}, None))".format(key),
+             "    else:"]
+
+    if can_merge:
+        lines += ["        previous_value = previous_values.get({!r})".format(key),
+                  "        if previous_value is not None:",
+                  "            offset += merge_{}(previous_value, bytes_string, offset)".format(index),
+                  "            append(({!r}, previous_value))".format(key),
+                  "        else:",
+                  "            value, value_size = unpack_{}(bytes_string, offset)".format(index),
+                  "            offset += value_size",
+                  "            append(({!r}, value))".format(key)]
+
+    else:
+        lines += ["        value, value_size = unpack_{}(bytes_string, offset)".format(index),
+                  "        offset += value_size",
+                  "        append(({!r}, value))".format(key)]
+
+    return lines
+
+
+def _indent(lines, depth=1):
+    return ["    " * depth + line for line in lines]
+
+
+def build_codec(name, arguments):
+    """Create codec for an ordered attribute layout.
+
+    Generates one pack and one unpack function, with handlers bound as locals and consecutive fixed-size members
+    packed by a single Struct. The packed format is that of :py:class:`network.flag_serialiser.FlagSerialiser`
+
+    :param name: name of codec class
+    :param arguments: ordered mapping of name to TypeFlag
+    """
+    non_bool_args = [(key, value) for key, value in arguments.items() if value.type is not bool]
+    bool_args = [(key, value) for key, value in arguments.items() if value.type is bool]
+
+    non_bool_handlers = [get_handler(value) for _, value in non_bool_args]
+
+    total_non_booleans = len(non_bool_args)
+    total_contents = total_non_booleans + len(bool_args)
+
+    # Additional two bits when including NoneType and Boolean values
+    contents_packer = handler_from_bit_length(total_contents + 2)
+    boolean_packer = handler_from_bit_length(len(bool_args))
+
+    none_content_bit = 1 << (total_contents + 1)
+    bool_content_bit = 1 << total_contents
+    non_bool_mask = (1 << total_non_booleans) - 1
+
+    namespace = {"_missing": _missing, "pack_contents": contents_packer.pack,
+                 "unpack_contents": contents_packer.unpack_from, "pack_booleans": boolean_packer.pack,
+                 "unpack_booleans": boolean_packer.unpack_from}
+
+    for index, handler in enumerate(non_bool_handlers):
+        namespace["pack_{}".format(index)] = handler.pack
+        namespace["unpack_{}".format(index)] = handler.unpack_from
+
+        if hasattr(handler, "unpack_merge"):
+            namespace["merge_{}".format(index)] = handler.unpack_merge
+
+    pack_lines = ["def pack(data):",
+                  "    get = data.get",
+                  "    contents = nones = 0",
+                  "    values = []",
+                  "    append = values.append"]
+    pack_lines += ["    v{} = get({!r}, _missing)".format(index, key)
+                   for index, (key, _) in enumerate(non_bool_args + bool_args)]
+
+    unpack_lines = ["def unpack(bytes_string, previous_values={}, offset=0):",
+                    "    contents, contents_size = unpack_contents(bytes_string, offset)",
+                    "    offset += contents_size",
+                    "    if contents & {}:".format(none_content_bit),
+                    "        nones, nones_size = unpack_contents(bytes_string, offset)",
+                    "        offset += nones_size",
+                    "    else:",
+                    "        nones = 0",
+                    "    items = []",
+                    "    append = items.append"]
+
+    runs = dict(_find_fixed_runs(non_bool_handlers))
+
+    index = 0
+    while index < total_non_booleans:
+        if index not in runs:
+            key = non_bool_args[index][0]
+            can_merge = hasattr(non_bool_handlers[index], "unpack_merge")
+            pack_lines += _indent(_pack_member_source(index))
+            unpack_lines += _indent(_unpack_member_source(index, key, can_merge))
+            index += 1
+            continue
+
+        # Fuse fixed-size members when all are included and not None
+        run_indices = range(index, runs[index])
+        run_struct = Struct("!" + "".join(non_bool_handlers[i].character_format for i in run_indices))
+        run_mask = sum(1 << i for i in run_indices)
+        run_values = ", ".join("v{}".format(i) for i in run_indices)
+
+        namespace["pack_run_{}".format(index)] = run_struct.pack
+        namespace["unpack_run_{}".format(index)] = run_struct.unpack_from
+
+        pack_lines.append("    if {}:".format(" and ".join("v{0} is not None and v{0} is not _missing".format(i)
+                                                           for i in run_indices)))
+        pack_lines.append("        contents |= {}".format(run_mask))
+        pack_lines.append("        append(pack_run_{}({}))".format(index, run_values))
+        pack_lines.append("    else:")
+
+        unpack_lines.append("    if contents & {0} == {0} and not nones & {0}:".format(run_mask))
+        unpack_lines.append("        {}, = unpack_run_{}(bytes_string, offset)".format(run_values, index))
+        unpack_lines.append("        offset += {}".format(run_struct.size))
+        unpack_lines += _indent(["append(({!r}, v{}))".format(non_bool_args[i][0], i) for i in run_indices], 2)
+        unpack_lines.append("    else:")
+
+        for i in run_indices:
+            key = non_bool_args[i][0]
+            pack_lines += _indent(_pack_member_source(i), 2)
+            unpack_lines += _indent(_unpack_member_source(i, key, False), 2)
+
+        index = runs[index]
+
+    # Booleans are packed into a single bitmask
+    pack_lines.append("    booleans = 0")
+    for bool_index, (key, _) in enumerate(bool_args):
+        content_bit = 1 << (total_non_booleans + bool_index)
+        pack_lines += ["    if v{} is not _missing:".format(total_non_booleans + bool_index),
+                       "        contents |= {}".format(content_bit),
+                       "        if v{} is None:".format(total_non_booleans + bool_index),
+                       "            nones |= {}".format(content_bit),
+                       "        elif v{}:".format(total_non_booleans + bool_index),
+                       "            booleans |= {}".format(1 << bool_index)]
+
+    # The Boolean bitmask is included with any NoneType non-boolean values, as packed by FlagSerialiser
+    pack_lines += ["    if contents & {} or nones & {}:".format(non_bool_mask ^ ((1 << total_contents) - 1),
+                                                              non_bool_mask),
+                   "        contents |= {}".format(bool_content_bit),
+                   "        append(pack_booleans(booleans))",
+                   "    if nones:",
+                   "        contents |= {}".format(none_content_bit),
+                   "        return pack_contents(contents) + pack_contents(nones) + b''.join(values)",
+                   "    return pack_contents(contents) + b''.join(values)"]
+
+    if bool_args:
+        unpack_lines += ["    if contents & {}:".format(bool_content_bit),
+                         "        booleans = unpack_booleans(bytes_string, offset)[0]"]
+
+        for bool_index, (key, _) in enumerate(bool_args):
+            content_bit = 1 << (total_non_booleans + bool_index)
+            unpack_lines += ["        if contents & {}:".format(content_bit),
+                             "            append(({!r}, None if nones & {} else bool(booleans & {})))"
+                             .format(key, content_bit, 1 << bool_index)]
+
+    unpack_lines.append("    return items")
+
+    exec("\n".join(pack_lines), namespace)
+    exec("\n".join(unpack_lines), namespace)
+
+    cls_dict = {"pack": namespace["pack"], "unpack": namespace["unpack"],
+                "pack_source": "\n".join(pack_lines), "unpack_source": "\n".join(unpack_lines)}
+
+    return type(name, (), cls_dict)
+
+
+class BitCodec:
+    """Codec which packs an ordered attribute layout at bit granularity.
+
+    Packed format: a content bit per member, a bit indicating NoneType values, a NoneType bit per member (only if
+    indicated), then included values from their bit handlers. Only the final byte is padded
+    """
+
+    # Smallest estimated saving (fraction of byte aligned size) for which classes which opt in use bit packing.
+    # Packing at bit granularity is several times slower, so it is not worth layouts dominated by full width values
+    min_saving = 0.25
+
+    @staticmethod
+    def estimate_saving(arguments):
+        """Estimate the fraction of the size of a full update which is saved by packing at bit granularity, compared
+        to the generated byte aligned codec (which packs booleans into a bitmask).
+
+        Members which are packed byte aligned by both codecs are excluded
+
+        :param arguments: ordered mapping of names to TypeFlags
+        """
+        # Content masks
+        total_contents = len(arguments)
+        aligned_bits = 8 * -(-(total_contents + 2) // 8)
+        packed_bits = total_contents + 1
+
+        total_booleans = 0
+
+        for type_flag in arguments.values():
+            if type_flag.type is bool:
+                total_booleans += 1
+                continue
+
+            bits = get_bit_handler(type_flag).bits
+            if bits is None:
+                continue
+
+            packed_bits += bits
+            aligned_bits += 8 * get_handler(type_flag).size()
+
+        aligned_bits += 8 * -(-total_booleans // 8)
+        packed_bits += total_booleans
+
+        return 1 - packed_bits / aligned_bits
+
+    def __init__(self, arguments):
+        self.members = [(key, get_bit_handler(value)) for key, value in arguments.items()]
+        self.total_contents = len(self.members)
+
+    def pack(self, data):
+        """Pack data into bytes
+
+        :param data: data to be packed
+        """
+        contents = nones = 0
+        included = []
+
+        for index, (key, handler) in enumerate(self.members):
+            if key not in data:
+                continue
+
+            value = data[key]
+            contents |= 1 << index
+
+            if value is None:
+                nones |= 1 << index
+
+            else:
+                included.append((handler, value))
+
+        writer = BitWriter()
+        writer.write(contents, self.total_contents)
+        writer.write_bool(nones)
+
+        if nones:
+            writer.write(nones, self.total_contents)
+
+        for handler, value in included:
+            handler.write(writer, value)
+
+        return writer.to_bytes()
+
+    def unpack(self, bytes_string, previous_values={}, offset=0):
+        """Unpack bytes into list of (name, value) pairs
+
+        :param bytes_string: packed data
+        :param previous_values: previous packed values (unused, values are always replaced)
+        :param offset: offset of packed data
+        """
+        reader = BitReader(bytes_string, offset)
+        contents = reader.read(self.total_contents)
+        nones = reader.read(self.total_contents) if reader.read_bool() else 0
+
+        items = []
+        for index, (key, handler) in enumerate(self.members):
+            if not contents & (1 << index):
+                continue
+
+            items.append((key, None if nones & (1 << index) else handler.read(reader)))
+
+        return items
+
+
+def get_attribute_flags(cls):
+    """Return ordered mapping of name to TypeFlag for the Attributes of a Struct or Replicable class.
+
+    FromClass instances in Attribute data are replaced with the class attribute values
+
+    :param cls: class with Attribute members
+    """
+    try:
+        return attribute_flags[cls]
+
+    except KeyError:
+        ordered_arguments = cls._attribute_container.callback.keywords['ordered_mapping']
+        flags = attribute_flags[cls] = OrderedDict()
+
+        for key, attribute in ordered_arguments.items():
+            data = attribute.data
+
+            if any(isinstance(value, FromClass) for value in data.values()):
+                data = {name: getattr(cls, value.name) if isinstance(value, FromClass) else value
+                        for name, value in data.items()}
+                attribute = TypeFlag(attribute.type, **data)
+
+            flags[key] = attribute
+
+        return flags
+
+
+def get_attribute_codec(cls):
+    """Return codec for the Attributes of a Struct or Replicable class, shared by all instances of the class
+
+    :param cls: class with Attribute members
+    """
+    try:
+        return codecs[cls]
+
+    except KeyError:
+        ordered_arguments = get_attribute_flags(cls)
+
+        # Classes may opt in to packing at bit granularity, which is used if it saves enough
+        if getattr(cls, "use_bit_packing", False) and \
+                BitCodec.estimate_saving(ordered_arguments) >= BitCodec.min_saving:
+            codec = BitCodec(ordered_arguments)
+
+        # Generated codecs pack masks as integers, which the bitarray BitField does not
+        elif USE_BITARRAY:
+            codec = FlagSerialiser(ordered_arguments)
+
+        else:
+            codec = build_codec("{}Codec".format(cls.__name__), ordered_arguments)
+
+        codecs[cls] = codec
+        return codec
+
+
+class DifferenceDelta:
+    """Delta of an integer (or value quantized to an integer), as the zigzag varint encoded difference from the baseline
+    value
+    """
+
+    packer = ZigZagHandler
+
+    def __init__(self, to_int=int, from_int=int):
+        self.to_int = to_int
+        self.from_int = from_int
+
+    def pack_delta(self, value, baseline):
+        return self.packer.pack(self.to_int(value) - self.to_int(baseline))
+
+    def unpack_delta(self, baseline, bytes_string, offset=0):
+        difference, difference_size = self.packer.unpack_from(bytes_string, offset)
+        return self.from_int(self.to_int(baseline) + difference), difference_size
+
+
+class XorDelta:
+    """Delta of a fixed size value, as the XOR of its packed bytes with those of the baseline value.
+
+    For values larger than two bytes, leading zero bytes of the XOR are replaced by a count of them
+    """
+
+    count_packer = handler_from_bit_length(8)
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.packed_size = handler.size()
+
+    def pack_delta(self, value, baseline):
+        pack = self.handler.pack
+        delta = bytes(a ^ b for a, b in zip(pack(value), pack(baseline)))
+
+        if self.packed_size <= 2:
+            return delta
+
+        significant_delta = delta.lstrip(b'\x00')
+        return self.count_packer.pack(self.packed_size - len(significant_delta)) + significant_delta
+
+    def unpack_delta(self, baseline, bytes_string, offset=0):
+        packed_size = self.packed_size
+
+        if packed_size <= 2:
+            zero_count = header_size = 0
+
+        else:
+            zero_count, header_size = self.count_packer.unpack_from(bytes_string, offset)
+
+        delta_size = packed_size - zero_count
+        delta_start = offset + header_size
+        delta = bytes(zero_count) + bytes(bytes_string[delta_start: delta_start + delta_size])
+
+        packed_value = bytes(a ^ b for a, b in zip(delta, self.handler.pack(baseline)))
+        value, _ = self.handler.unpack_from(packed_value)
+        return value, header_size + delta_size
+
+
+class ListDelta:
+    """Delta of a list, as a mask of changed indices and the changed elements.
+
+    Lists which differ in length from the baseline are packed in full
+    """
+
+    mode_packer = handler_from_bit_length(8)
+
+    FULL, CHANGED_INDICES = range(2)
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.element_packer = handler.element_packer
+
+    def pack_delta(self, value, baseline):
+        if len(value) != len(baseline):
+            return self.mode_packer.pack(self.FULL) + self.handler.pack(value)
+
+        changed = BitField(len(value))
+        changed_elements = []
+
+        for index, (element, baseline_element) in enumerate(zip(value, baseline)):
+            if element != baseline_element:
+                changed[index] = True
+                changed_elements.append(element)
+
+        pack_element = self.element_packer.pack
+        return self.mode_packer.pack(self.CHANGED_INDICES) + changed.to_bytes() + \
+            b''.join([pack_element(e) for e in changed_elements])
+
+    def unpack_delta(self, baseline, bytes_string, offset=0):
+        mode, mode_size = self.mode_packer.unpack_from(bytes_string, offset)
+        original_offset = offset
+        offset += mode_size
+
+        if mode == self.FULL:
+            value, value_size = self.handler.unpack_from(bytes_string, offset)
+            return value, mode_size + value_size
+
+        # Length of changed mask is that of the baseline
+        changed, changed_size = BitField.from_bytes(len(baseline), bytes_string, offset)
+        offset += changed_size
+
+        value = deepcopy(baseline)
+        unpack_element = self.element_packer.unpack_from
+
+        for index, is_changed in enumerate(changed):
+            if is_changed:
+                value[index], element_size = unpack_element(bytes_string, offset)
+                offset += element_size
+
+        return value, offset - original_offset
+
+
+def get_delta(type_flag):
+    """Return delta encoding for a TypeFlag, or None if values are always packed in full
+
+    :param type_flag: TypeFlag subclass
+    """
+    handler = get_handler(type_flag)
+
+    if isinstance(type_flag.type, type) and issubclass(type_flag.type, list):
+        return ListDelta(handler)
+
+    if type_flag.type is int:
+        return DifferenceDelta()
+
+    if hasattr(handler, "quantize_int"):
+        return DifferenceDelta(handler.quantize_int, handler.dequantize_int)
+
+    # XOR requires that values are packed to a fixed size, and repacked to the same bytes after unpacking
+    if type_flag.type is float or hasattr(handler, "quantize"):
+        try:
+            handler.size()
+
+        except TypeError:
+            return None
+
+        return XorDelta(handler)
+
+    return None
+
+
+class DeltaCodec:
+    """Codec which packs attributes as deltas from baseline values.
+
+    Packed format: a content mask of delta encoded members (with a final bit for the presence of remaining members),
+    their deltas, then the remaining members as packed by the attribute codec of the class. Members are delta encoded
+    when they have a delta encoding and neither the value nor the baseline value is None
+    """
+
+    def __init__(self, arguments, codec):
+        self.codec = codec
+        self.deltas = [(key, delta) for key, delta in ((k, get_delta(v)) for k, v in arguments.items())
+                       if delta is not None]
+        self.delta_names = frozenset(key for key, _ in self.deltas)
+        self.contents_packer = handler_from_bit_length(len(self.deltas) + 1)
+        self.full_contents_bit = 1 << len(self.deltas)
+
+    def pack(self, data, baseline):
+        """Pack data into bytes
+
+        :param data: data to be packed
+        :param baseline: baseline values of delta encoded members
+        """
+        if not self.deltas:
+            return self.codec.pack(data)
+
+        full_data = dict(data)
+        contents = 0
+        packed_deltas = []
+
+        for index, (key, delta) in enumerate(self.deltas):
+            value = data.get(key)
+            baseline_value = baseline.get(key)
+
+            if value is None or baseline_value is None:
+                continue
+
+            del full_data[key]
+            contents |= 1 << index
+            packed_deltas.append(delta.pack_delta(value, baseline_value))
+
+        if not full_data:
+            return self.contents_packer.pack(contents) + b''.join(packed_deltas)
+
+        contents |= self.full_contents_bit
+        return self.contents_packer.pack(contents) + b''.join(packed_deltas) + self.codec.pack(full_data)
+
+    def unpack(self, bytes_string, baseline, offset=0):
+        """Unpack bytes into list of (name, value) pairs
+
+        :param bytes_string: packed data
+        :param baseline: baseline values of delta encoded members
+        :param offset: offset of packed data
+        """
+        if not self.deltas:
+            return list(self.codec.unpack(bytes_string, offset=offset))
+
+        contents, contents_size = self.contents_packer.unpack_from(bytes_string, offset)
+        offset += contents_size
+
+        items = []
+        for index, (key, delta) in enumerate(self.deltas):
+            if contents & (1 << index):
+                value, value_size = delta.unpack_delta(baseline[key], bytes_string, offset)
+                offset += value_size
+                items.append((key, value))
+
+        if contents & self.full_contents_bit:
+            items.extend(self.codec.unpack(bytes_string, offset=offset))
+
+        return items
+
+
+def get_delta_codec(cls):
+    """Return delta codec for the Attributes of a Replicable class, shared by all instances of the class
+
+    :param cls: class with Attribute members
+    """
+    try:
+        return delta_codecs[cls]
+
+    except KeyError:
+        ordered_arguments = get_attribute_flags(cls)
+        codec = delta_codecs[cls] = DeltaCodec(ordered_arguments, get_attribute_codec(cls))
+        return codec
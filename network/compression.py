@@ -0,0 +1,157 @@
+from collections import Counter
+from time import clock
+from zlib import adler32, compressobj, decompressobj, error as ZlibError, DEFLATED, Z_DEFAULT_COMPRESSION
+
+__all__ = ['Compressor', 'CompressionMetrics', 'train_dictionary']
+
+
+def train_dictionary(samples, size=4096, substring_size=8):
+    """Build a preset compression dictionary from captured payloads.
+
+    The most common substrings are placed at the end of the dictionary, where they are cheapest to reference
+
+    :param samples: iterable of captured payloads
+    :param size: maximum size of dictionary
+    :param substring_size: length of counted substrings
+    """
+    counts = Counter()
+
+    for sample in samples:
+        sample = bytes(sample)
+        counts.update(sample[i: i + substring_size] for i in range(len(sample) - substring_size + 1))
+
+    chosen = []
+    total_size = 0
+
+    for substring, count in counts.most_common():
+        # Substrings which occur once are not worth storing
+        if count < 2 or total_size + len(substring) > size:
+            break
+
+        chosen.append(substring)
+        total_size += len(substring)
+
+    return b''.join(reversed(chosen))
+
+
+class Compressor:
+    """Raw deflate compression of individual datagrams, with a preset dictionary.
+
+    Each datagram is compressed independently, so that it can be decompressed if others are lost
+    """
+
+    # Largest UDP payload, which bounds the size of decompressed data
+    max_size = 65507
+
+    def __init__(self, dictionary=b'', level=Z_DEFAULT_COMPRESSION, threshold=64, max_size=None):
+        self.dictionary = dictionary
+        self.threshold = threshold
+
+        if max_size is not None:
+            self.max_size = max_size
+
+        # Primed (de)compressors are copied for each datagram, which avoids loading the dictionary each time
+        self._compressor = compressobj(level, DEFLATED, -15, zdict=dictionary)
+        self._decompressor = decompressobj(-15, zdict=dictionary)
+
+        self.metrics = CompressionMetrics()
+
+    @staticmethod
+    def get_dictionary_id(dictionary):
+        """Return non-zero identifier of dictionary
+
+        :param dictionary: preset dictionary
+        """
+        return adler32(dictionary) or 1
+
+    @property
+    def dictionary_id(self):
+        return self.get_dictionary_id(self.dictionary)
+
+    def compress(self, data):
+        """Compress data if it is larger than the threshold, and compression reduces its size
+
+        :param data: data to compress
+        :returns: data, whether data was compressed
+        """
+        if len(data) < self.threshold:
+            return data, False
+
+        started = clock()
+
+        compressor = self._compressor.copy()
+        compressed_data = compressor.compress(data) + compressor.flush()
+
+        self.metrics.on_compressed(len(data), len(compressed_data), clock() - started)
+
+        if len(compressed_data) >= len(data):
+            return data, False
+
+        return compressed_data, True
+
+    def decompress(self, data):
+        """Decompress data.
+
+        Raises ValueError if data is invalid, incomplete or decompresses to more than max_size bytes
+
+        :param data: compressed data
+        """
+        started = clock()
+
+        decompressor = self._decompressor.copy()
+
+        try:
+            decompressed_data = decompressor.decompress(data, self.max_size)
+
+        except ZlibError as err:
+            raise ValueError("Invalid compressed data") from err
+
+        finally:
+            self.metrics.on_decompressed(clock() - started)
+
+        if decompressor.unconsumed_tail:
+            raise ValueError("Decompressed data exceeds {} bytes".format(self.max_size))
+
+        if not decompressor.eof:
+            raise ValueError("Incomplete compressed data")
+
+        return decompressed_data
+
+
+class CompressionMetrics:
+    """Metrics for datagram compression"""
+
+    def __init__(self):
+        self.uncompressed_bytes = 0
+        self.compressed_bytes = 0
+
+        self.compression_time = 0.0
+        self.decompression_time = 0.0
+
+        # Time spent compressing and decompressing during the current and previous ticks
+        self.tick_time = 0.0
+        self.last_tick_time = 0.0
+
+    @property
+    def ratio(self):
+        """Ratio of compressed to uncompressed size of compressed data"""
+        if not self.uncompressed_bytes:
+            return 1.0
+
+        return self.compressed_bytes / self.uncompressed_bytes
+
+    def on_compressed(self, uncompressed_size, compressed_size, duration):
+        self.uncompressed_bytes += uncompressed_size
+        self.compressed_bytes += min(compressed_size, uncompressed_size)
+
+        self.compression_time += duration
+        self.tick_time += duration
+
+    def on_decompressed(self, duration):
+        self.decompression_time += duration
+        self.tick_time += duration
+
+    def on_tick(self):
+        """Start timing a new tick"""
+        self.last_tick_time = self.tick_time
+        self.tick_time = 0.0
@@ -1,6 +1,6 @@
 from inspect import isfunction
 
-__all__ = ["is_reliable", "is_simulated", "is_signal_listener", "is_annotatable", "is_class_method",
+__all__ = ["is_reliable", "is_urgent", "is_simulated", "is_signal_listener", "is_annotatable", "is_class_method",
            "is_instance_method", "is_static_method"]
 
 """API Helper functions for internal operations"""
@@ -42,6 +42,15 @@ def is_reliable(func):
     return func.__annotations__.get("reliable", False)
 
 
+def is_urgent(func):
+    """Determines if a function is replicated immediately
+
+    :param func: function to evaluate
+    :returns: result of condition
+    """
+    return func.__annotations__.get("urgent", False)
+
+
 def is_simulated(func):
     """Determine if a function is marked as simulated
 
@@ -0,0 +1,107 @@
+__all__ = ['CongestionController', 'TokenBucket']
+
+
+class CongestionController:
+    """AIMD send rate controller with slow start.
+
+    The send rate doubles each round trip during slow start, and grows additively afterwards, up to maximum_rate.
+    It only grows when the sender was limited by the rate during the last round trip.
+    On congestion, the rate is halved and slow start ends
+    """
+
+    def __init__(self, initial_rate, minimum_rate, maximum_rate, additive_increase):
+        self.minimum_rate = minimum_rate
+        self.maximum_rate = maximum_rate
+        self.additive_increase = additive_increase
+
+        self.rate = initial_rate
+        self.slow_start_threshold = maximum_rate
+
+        self.rate_limited = False
+        self._epoch_start_time = None
+
+    @property
+    def in_slow_start(self):
+        return self.rate < self.slow_start_threshold
+
+    def on_rate_limited(self):
+        """Record that data was deferred by the current rate"""
+        self.rate_limited = True
+
+    def on_ack(self, current_time, round_trip_time):
+        """Grow send rate at most once per round trip
+
+        :param current_time: time of acknowledgement
+        :param round_trip_time: smoothed round trip time
+        """
+        if self._epoch_start_time is None:
+            self._epoch_start_time = current_time
+            return
+
+        if current_time - self._epoch_start_time < round_trip_time:
+            return
+
+        self._epoch_start_time = current_time
+
+        # Don't grow without evidence that a higher rate is usable
+        if not self.rate_limited:
+            return
+
+        self.rate_limited = False
+
+        if self.in_slow_start:
+            rate = min(self.rate * 2, self.slow_start_threshold)
+
+        else:
+            rate = self.rate + self.additive_increase
+
+        self.rate = min(rate, self.maximum_rate)
+
+    def on_congestion(self, current_time):
+        """Halve send rate in response to loss
+
+        :param current_time: time of congestion event
+        """
+        self.rate = max(self.rate / 2, self.minimum_rate)
+        self.slow_start_threshold = self.rate
+
+        self.rate_limited = False
+        self._epoch_start_time = current_time
+
+
+class TokenBucket:
+    """Token bucket pacer.
+
+    Tokens accumulate at the given rate up to a capacity of burst_duration seconds' worth.
+    The balance may become negative when a packet is larger than the remaining tokens
+    """
+
+    def __init__(self, rate, burst_duration=0.1, minimum_capacity=1200):
+        self.rate = rate
+        self.burst_duration = burst_duration
+        self.minimum_capacity = minimum_capacity
+
+        self.tokens = self.capacity
+        self._last_time = None
+
+    @property
+    def capacity(self):
+        return max(self.rate * self.burst_duration, self.minimum_capacity)
+
+    def refill(self, current_time):
+        """Add tokens accumulated since last refill
+
+        :param current_time: current time
+        """
+        if self._last_time is not None:
+            self.tokens = min(self.tokens + (current_time - self._last_time) * self.rate, self.capacity)
+
+        self._last_time = current_time
+        return self.tokens
+
+    def consume(self, size):
+        """Remove tokens for sent data
+
+        :param size: size of sent data
+        """
+        self.tokens -= size
@@ -1,14 +1,17 @@
-from collections import deque
 from time import clock
 from socket import gethostbyname
 
-from .bitfield import BitField
+from .compression import Compressor
+from .congestion import CongestionController, TokenBucket
 from .conversions import conversion
+from .enums import ConnectionProtocols
 from .type_flag import TypeFlag
 from .handlers import get_handler
+from .logger import logger
 from .metaclasses.register import InstanceRegister
 from .packet import PacketCollection
-from .streams import Dispatcher, InjectorStream, HandshakeStream
+from .reliability import HeaderFormat, CompactHeaderFormat, ReceivedWindow, SentWindow, RetransmissionTimer, ReliabilityMetrics
+from .streams import Dispatcher, InjectorStream, FragmentStream, OrderedLaneStream, HandshakeStream
 
 
 __all__ = "Connection",
@@ -22,29 +25,70 @@ class Connection(metaclass=InstanceRegister):
 
     subclasses = {}
 
+    # Registered and pending connections by address
+    by_address = {}
+
+    # Supported ack window sizes and sequence widths
+    ack_window_sizes = 32, 64, 128
+    sequence_widths = 16, 32
+
+    # Send rate limits (bytes per second)
+    initial_send_rate = conversion(1, "Mb", "B")
+    minimum_send_rate = conversion(32, "Kb", "B")
+    maximum_send_rate = conversion(10, "Mb", "B")
+    send_rate_increase = conversion(32, "Kb", "B")
+
+    # Maximum datagram size (bytes), excluding IP and UDP headers
+    mtu = 1200
+
+    # Target send rate (datagrams per second), and interval between sends (seconds) when there is no data to send
+    send_rate = 60
+    keepalive_interval = 0.1
+
+    # Longest time (seconds) that acks of received data wait for outgoing data, before they are sent alone
+    ack_delay = 0.05
+
+    # Largest ack window and sequence width requested from (client), or granted to (server) the remote peer
+    max_ack_window = 32
+    max_sequence_bits = 16
+
+    # Compress datagrams with a preset dictionary, if enabled by both peers (with the same dictionary)
+    use_compression = False
+    compression_dictionary = b''
+    compression_threshold = 64
+
+    # Use variable length connection and packet headers, if enabled by both peers
+    use_compact_headers = False
+
     @classmethod
     def create_connection(cls, address, port):
         address = gethostbyname(address)
         ip_info = address, port
 
         try:
-            return cls.get_from_graph(ip_info)
+            return cls.by_address[ip_info]
 
-        except LookupError:
+        except KeyError:
             return cls(ip_info)
 
     def on_initialised(self):
+        # Number of packets to ack per packet, and sequence width (until negotiated)
+        self.ack_window = 32
+        self.sequence_bits = 16
+
         # Maximum sequence number value
-        self.sequence_max_size = 2 ** 16 - 1
-        self.sequence_handler = get_handler(TypeFlag(int, max_value=self.sequence_max_size))
+        self.sequence_max_size = 2 ** self.sequence_bits - 1
 
-        # Number of packets to ack per packet
-        self.ack_window = 32
+        # Header formats for outgoing and incoming packets
+        self.send_format = self.receive_format = HeaderFormat(self.ack_window, self.sequence_bits)
 
-        # BitField and bitfield size
-        self.incoming_ack_bitfield = BitField(self.ack_window)
-        self.outgoing_ack_bitfield = BitField(self.ack_window)
-        self.ack_packer = get_handler(TypeFlag(BitField, fields=self.ack_window))
+        # Datagram compression (until negotiated)
+        self.compressor = None
+
+        # Header format switch after negotiation
+        self._previous_receive_format = None
+        self._pending_send_format = None
+        self._receive_switch_sequence = None
 
         # Additional data
         self.netmode_packer = get_handler(TypeFlag(int))
@@ -55,97 +99,276 @@ class Connection(metaclass=InstanceRegister):
         self.handshake_packer = get_handler(TypeFlag(int))
 
         # Storage for packets requesting ack or received
-        self.requested_ack = {}
-        self.received_window = deque(maxlen=self.ack_window)
+        self.sent_window = SentWindow(self.ack_window, self.sequence_max_size)
+        self.received_window = ReceivedWindow(self.ack_window, self.sequence_max_size)
 
-        # Current indicators of latest out/incoming sequence numbers
+        # Current indicator of latest outgoing sequence number
         self.local_sequence = 0
-        self.remote_sequence = 0
 
-        # Estimate available bandwidth
-        self.bandwidth = conversion(1, "Mb", "B")
-        self.packet_growth = conversion(0.5, "KB", "B")
+        # Retransmission of reliable members which are not acknowledged in time
+        self.retransmission_timer = RetransmissionTimer()
+        self.reliability_metrics = ReliabilityMetrics()
+
+        # Estimate available bandwidth, and pace outgoing data to it
+        self.congestion_controller = CongestionController(self.initial_send_rate, self.minimum_send_rate,
+                                                          self.maximum_send_rate, self.send_rate_increase)
+        self.pacer = TokenBucket(self.initial_send_rate)
+
+        # Send scheduling, and network ticks deferred until the next send
+        self.last_send_time = 0.0
+        self.next_send_time = 0.0
+        self.network_tick_pending = False
+
+        # Time by which received data must be acknowledged
+        self.ack_deadline = None
 
         # Bandwidth throttling
         self.tagged_throttle_sequence = None
         self.throttle_pending = False
 
+        # Callback to send datagrams of urgent data, set by the network
+        self.on_urgent_data = None
+
+        # Urgent sends requested while received packets are dispatched are deferred until dispatch finishes
+        self._dispatching = False
+        self._urgent_send_pending = False
+
         # Internal packet data
         self.dispatcher = Dispatcher()
+        self.dispatcher.send_urgent = self.send_urgent
+        self.dispatcher.schedule_send = self.schedule_send
         self.injector = self.dispatcher.create_stream(InjectorStream)
+        self.fragments = self.dispatcher.create_stream(FragmentStream)
+        self.lanes = self.dispatcher.create_stream(OrderedLaneStream)
 
         self.handshake = self.dispatcher.create_stream(HandshakeStream)
         self.handshake.connection_info = self.instance_id
         self.handshake.remove_connection = self.deregister
+        self.handshake.connection_settings = self.max_ack_window, self.max_sequence_bits, self.dictionary_id, \
+            self.use_compact_headers
+        self.handshake.negotiate_settings = self.negotiate_settings
+
+    def register(self, instance_id, immediately=False):
+        self._remove_address()
+        super().register(instance_id, immediately)
+
+        self.by_address[self.instance_id] = self
+
+    def on_unregistered(self):
+        self._remove_address()
+        super().on_unregistered()
+
+    def on_registration_cancelled(self):
+        self._remove_address()
+        super().on_registration_cancelled()
+
+    def _remove_address(self):
+        """Remove address index entry of this connection, unless it was replaced by another connection"""
+        if self.by_address.get(self.instance_id) is self:
+            self.by_address.pop(self.instance_id)
+
+    @property
+    def dictionary_id(self):
+        """Identifier of compression dictionary, or zero if compression is not used"""
+        if not self.use_compression:
+            return 0
+
+        return Compressor.get_dictionary_id(self.compression_dictionary)
+
+    def negotiate_settings(self, ack_window, sequence_bits, dictionary_id, compact_headers, switch_send_format):
+        """Adopt the largest supported ack window and sequence width which do not exceed those requested.
+        Compression is used if both peers use the same compression dictionary, and compact headers if both peers
+        enable them.
+
+        Incoming headers which acknowledge the next sent packet (or later) are read in the new format.
+        If switch_send_format is False, outgoing headers switch to the new format once the first such header is
+        received (the remote peer must have adopted the new format by then).
+
+        :param ack_window: requested ack window size
+        :param sequence_bits: requested sequence width
+        :param dictionary_id: identifier of requested compression dictionary (zero if not requested)
+        :param compact_headers: whether compact headers were requested
+        :param switch_send_format: switch outgoing header format immediately
+        :returns: adopted ack window size, sequence width, dictionary ID and whether compact headers are used, or None
+        if unchanged
+        """
+        ack_window = max(w for w in self.ack_window_sizes if w <= min(ack_window, self.max_ack_window))
+        sequence_bits = max(b for b in self.sequence_widths if b <= min(sequence_bits, self.max_sequence_bits))
+
+        if dictionary_id != self.dictionary_id:
+            dictionary_id = 0
+
+        compression = bool(dictionary_id)
+        compact_headers = compact_headers and self.use_compact_headers
+
+        if (ack_window, sequence_bits, compression, compact_headers) == \
+                (self.ack_window, self.sequence_bits, self.compressor is not None,
+                 isinstance(self.receive_format, CompactHeaderFormat)):
+            return None
+
+        self.ack_window = ack_window
+        self.sequence_bits = sequence_bits
+        self.sequence_max_size = 2 ** sequence_bits - 1
+
+        self.sent_window.resize(ack_window, self.sequence_max_size)
+        self.received_window.resize(ack_window, self.sequence_max_size)
+
+        if compression:
+            self.compressor = Compressor(self.compression_dictionary, threshold=self.compression_threshold)
+
+        else:
+            self.compressor = None
+
+        # Compressed datagrams are flagged in the header
+        header_format_cls = CompactHeaderFormat if compact_headers else HeaderFormat
+        header_format = header_format_cls(ack_window, sequence_bits, has_flags=compression)
 
-    def get_reliable_information(self, remote_sequence):
-        """Update stored information for remote peer reliability feedback
+        self._previous_receive_format = self.receive_format
+        self._receive_switch_sequence = (self.local_sequence + 1) & 0xFFFF
+        self.receive_format = header_format
 
-        :param remote_sequence: latest received packet's sequence
+        if switch_send_format:
+            self.send_format = header_format
+
+        else:
+            self._pending_send_format = header_format
+
+        return ack_window, sequence_bits, dictionary_id, compact_headers
+
+    def select_receive_format(self, bytes_string):
+        """Determine header format of received bytes during a header format switch
+
+        :param bytes_string: data from peer
         """
-        # The last received sequence number and received list
-        received_window = self.received_window
-        ack_bitfield = self.outgoing_ack_bitfield
+        # Compare low 16 bits of ack base against first sequence sent after switch
+        distance = (HeaderFormat.read_ack_base(bytes_string) - self._receive_switch_sequence) & 0xFFFF
 
-        # Acknowledge all packets we've received
-        for index in range(self.ack_window):
-            packet_sqn = remote_sequence - (index + 1)
+        # Sent before peer received any packet after switch
+        if distance >= 0x8000:
+            return self._previous_receive_format
 
-            if packet_sqn < 0:
-                continue
+        # Peer has adopted new format
+        if self._pending_send_format is not None:
+            self.send_format = self._pending_send_format
+            self._pending_send_format = None
+
+        # Previous format can no longer be distinguished
+        if distance >= 0x4000:
+            self._previous_receive_format = None
+            self._receive_switch_sequence = None
 
-            ack_bitfield[index] = packet_sqn in received_window
+        return self.receive_format
 
-        return ack_bitfield
+    @property
+    def bandwidth(self):
+        """Estimated available bandwidth (bytes per second)"""
+        return self.congestion_controller.rate
 
-    def handle_reliable_information(self, ack_base, ack_bitfield):
+    @property
+    def remote_sequence(self):
+        """Latest received sequence"""
+        return self.received_window.latest_sequence
+
+    def get_reliable_information(self):
+        """Return ack mask of packets received before the latest received sequence"""
+        return self.received_window.ack_mask
+
+    def handle_reliable_information(self, ack_base, ack_mask):
         """Update internal packet management, concerning dropped packets and available bandwidth
 
         :param ack_base: base sequence for ack window
-        :param ack_bitfield: ack window bitfield
+        :param ack_mask: ack window bitmask
         """
-        requested_ack = self.requested_ack
-        window_size = self.ack_window
+        sent_window = self.sent_window
+        current_time = clock()
 
-        # Iterate over ACK bitfield
-        for relative_sequence in range(window_size):
-            absolute_sequence = ack_base - (relative_sequence + 1)
+        acknowledged = sent_window.acknowledge(ack_base, ack_mask)
 
-            # If we are waiting for this packet, acknowledge it
-            if ack_bitfield[relative_sequence] and absolute_sequence in requested_ack:
-                sent_packet = requested_ack.pop(absolute_sequence)
-                sent_packet.on_ack()
+        # Acknowledge the sequence of this packet and those in the ack window
+        for sequence, sent_packet, sent_time, retransmitted in acknowledged:
+            # Measure round trip time of latest packet
+            if sequence == ack_base:
+                self.retransmission_timer.on_sample(current_time - sent_time)
 
-                # If a packet has had time to return since throttling began
-                if absolute_sequence == self.tagged_throttle_sequence:
-                    self.stop_throttling()
+            # If a packet has had time to return since throttling began
+            if sequence == self.tagged_throttle_sequence:
+                self.stop_throttling()
+
+            # Reliable members were already resent
+            if retransmitted:
+                self.reliability_metrics.on_spurious_retransmit()
+                continue
 
-        # Acknowledge the sequence of this packet
-        if ack_base in self.requested_ack:
-            sent_packet = requested_ack.pop(ack_base)
             sent_packet.on_ack()
 
-            # If a packet has had time to return since throttling began
-            if ack_base == self.tagged_throttle_sequence:
-                self.stop_throttling()
+        if acknowledged:
+            timer = self.retransmission_timer
+            round_trip_time = timer.timeout if timer.smoothed_rtt is None else timer.smoothed_rtt
+            self.congestion_controller.on_ack(current_time, round_trip_time)
 
-        # Dropped locals
-        missed_ack = False
+        # If the packet drops off the ack_window assume it is lost
+        self.handle_dropped(sent_window.take_dropped(ack_base))
+
+    def handle_dropped(self, dropped_collections):
+        """Resend reliable members of dropped packet collections
+
+        :param dropped_collections: packet collections considered dropped
+        """
+        if not dropped_collections:
+            return
 
-        # Find packets we think are dropped and resend them
-        considered_dropped = [s for s in requested_ack if (ack_base - s) >= window_size]
         redelivery_queue = self.injector.queue
-        # If the packet drops off the ack_window assume it is lost
-        for absolute_sequence in considered_dropped:
+        on_dropped = self.reliability_metrics.on_dropped
+
+        for packet_collection in dropped_collections:
             # Only reliable members asked to be informed if received/dropped
-            reliable_collection = requested_ack.pop(absolute_sequence).to_reliable()
+            reliable_collection = packet_collection.to_reliable()
+            reliable_collection.on_not_ack()
+
+            redelivery_queue.extend(reliable_collection.members)
+            on_dropped(len(reliable_collection.members))
+
+        self.schedule_send()
+
+        # Respond to network conditions
+        if not self.throttle_pending:
+            self.start_throttling()
+
+    def handle_expired(self, current_time):
+        """Resend reliable members of packet collections which were not acknowledged within the retransmission timeout
+
+        :param current_time: current time
+        """
+        sent_window = self.sent_window
+        expired = sent_window.find_expired(current_time - self.retransmission_timer.timeout)
+
+        if not expired:
+            return
+
+        redelivery_queue = self.injector.queue
+        on_timeout = self.reliability_metrics.on_timeout
+        any_retransmitted = False
+
+        for sequence, packet_collection, sent_time in expired:
+            reliable_collection = packet_collection.to_reliable()
+            if not reliable_collection.members:
+                continue
+
             reliable_collection.on_not_ack()
 
-            missed_ack = True
             redelivery_queue.extend(reliable_collection.members)
+            sent_window.mark_retransmitted(sequence)
+
+            on_timeout(len(reliable_collection.members), sent_time, current_time)
+            any_retransmitted = True
+
+        if not any_retransmitted:
+            return
+
+        self.retransmission_timer.on_expired()
 
         # Respond to network conditions
-        if missed_ack and not self.throttle_pending:
+        if not self.throttle_pending:
             self.start_throttling()
 
     def receive(self, bytes_string):
@@ -153,66 +376,244 @@ class Connection(metaclass=InstanceRegister):
 
         :param bytes_string: data from peer
         """
-        # Get the sequence id
-        sequence, offset = self.sequence_handler.unpack_from(bytes_string)
+        if self._receive_switch_sequence is None:
+            header_format = self.receive_format
+
+        else:
+            header_format = self.select_receive_format(bytes_string)
 
-        # Get the base value for the bitfield
-        ack_base, ack_base_size = self.sequence_handler.unpack_from(bytes_string, offset=offset)
-        offset += ack_base_size
+        # Read sequence, base value for the ack mask, ack mask and flags
+        sequence, ack_base, ack_mask, flags, offset = header_format.unpack_from(bytes_string)
 
-        # Read the acknowledgement bitfield
-        ack_bitfield_size = self.ack_packer.unpack_merge(self.incoming_ack_bitfield, bytes_string, offset=offset)
-        offset += ack_bitfield_size
+        if flags & HeaderFormat.compressed:
+            if self.compressor is None:
+                logger.error("Discarding compressed datagram {}, compression was not negotiated".format(sequence))
+                return
 
-        # Dictionary of packets waiting for acknowledgement
-        self.handle_reliable_information(ack_base, self.incoming_ack_bitfield)
+            try:
+                bytes_string = self.compressor.decompress(bytes_string[offset:])
 
-        # If we receive a newer foreign sequence, update our local record
-        if self.sequence_more_recent(sequence, self.remote_sequence):
-            self.remote_sequence = sequence
+            except ValueError as err:
+                logger.error("Discarding compressed datagram {}: {}".format(sequence, err))
+                return
+
+            offset = 0
+
+        # Process packets waiting for acknowledgement
+        self.handle_reliable_information(ack_base, ack_mask)
 
         # Update received window
-        self.received_window.append(sequence)
-        if len(self.received_window) > self.ack_window:
-            self.received_window.popleft()
+        received_window = self.received_window
+        received_window.receive(sequence)
 
         # Handle received packets
-        packet_collection = PacketCollection.from_bytes(bytes_string[offset:])
-        self.dispatcher.handle_packets(packet_collection)
+        packet_collection = header_format.unpack_packets(bytes_string, offset)
 
-    def send(self, network_tick):
-        """Pull data from connection interfaces to send
+        self._dispatching = True
+        try:
+            self.dispatcher.handle_packets(packet_collection)
 
-        :param network_tick: if this is a network tick
+        finally:
+            self._dispatching = False
+
+        # Acknowledge gaps immediately, so that the peer detects losses sooner
+        if received_window.gap_detected:
+            self.request_ack(0.0)
+
+        elif packet_collection.members:
+            self.request_ack(self.ack_delay)
+
+        # Send urgent data requested by received packets, with acks of this datagram
+        if self._urgent_send_pending:
+            self._urgent_send_pending = False
+            self.send_urgent()
+
+    def split_datagrams(self, members, repeated=()):
+        """Split packets into groups which fit within the MTU, preserving their order.
+
+        A packet which exceeds the MTU (but is not fragmented) is sent alone (with any repeated packets)
+
+        :param members: packets to send
+        :param repeated: packets to include in every datagram
+        :returns: list of lists of packets
+        """
+        payload_size = self.mtu - self.send_format.size - sum([m.size for m in repeated])
+
+        datagram_members = list(repeated)
+        datagram_size = 0
+        groups = [datagram_members]
+
+        for member in members:
+            member_size = member.size
+
+            # Start a new datagram
+            if datagram_size and datagram_size + member_size > payload_size:
+                datagram_members = list(repeated)
+                datagram_size = 0
+                groups.append(datagram_members)
+
+            datagram_members.append(member)
+            datagram_size += member_size
+
+        return groups
+
+    def write_datagram(self, members, current_time):
+        """Write header and packets to a new datagram
+
+        :param members: packets to send
+        :param current_time: time of sending
         """
         # Increment the local sequence, ensure that the sequence does not overflow, by wrapping it around
         sequence = self.local_sequence = (self.local_sequence + 1) % (self.sequence_max_size + 1)
-        remote_sequence = self.remote_sequence
 
         # If we are waiting to detect when throttling will have returned
         if self.throttle_pending and self.tagged_throttle_sequence is None:
             self.tagged_throttle_sequence = sequence
 
-        packet_collection = self.dispatcher.pull_packets(network_tick, self.bandwidth)
-
-        # Get ack bitfield for reliable feedback
-        ack_bitfield = self.get_reliable_information(remote_sequence)
+        packet_collection = PacketCollection(members)
 
         # Store acknowledge request for reliable members of packet
-        self.requested_ack[sequence] = packet_collection
-
-        # Construct header information
-        payload = [self.sequence_handler.pack(sequence), self.sequence_handler.pack(remote_sequence),
-                   self.ack_packer.pack(ack_bitfield)]
+        self.handle_dropped(self.sent_window.add(sequence, packet_collection, current_time))
 
         # Include user defined payload
-        packet_bytes = packet_collection.to_bytes()
-        payload.append(packet_bytes)
+        payload = self.send_format.pack_packets(members)
+        flags = 0
+
+        if self.send_format.has_flags:
+            payload, compressed = self.compressor.compress(payload)
+
+            if compressed:
+                flags |= HeaderFormat.compressed
+
+        # Construct header information, including ack mask for reliable feedback
+        header = self.send_format.pack(sequence, self.remote_sequence, self.get_reliable_information(), flags)
+        return header + payload
+
+    def send(self, network_tick):
+        """Pull data from connection interfaces to send.
+
+        Returns at least one datagram, and more if the pulled data exceeds the MTU.
+        Packets which are too large for a datagram are queued to be sent as fragments
+
+        :param network_tick: if this is a network tick
+        :returns: list of datagrams
+        """
+        if self.compressor is not None:
+            self.compressor.metrics.on_tick()
+
+        # Resend reliable members which have not been acknowledged in time
+        current_time = clock()
+        self.handle_expired(current_time)
+
+        # Streams defer data which exceeds the paced budget
+        pacer = self.pacer
+        pacer.rate = self.congestion_controller.rate
+        budget = pacer.refill(current_time) - self.send_format.size
+
+        packet_collection = self.dispatcher.pull_packets(network_tick, budget)
+
+        # Budget was exhausted, so a higher rate could be used
+        if packet_collection.size >= budget:
+            self.congestion_controller.on_rate_limited()
+
+        # Packets which are too large for a datagram are sent as fragments
+        members = self.fragments.divert_oversized(packet_collection.members)
+
+        # Until the peer adopts negotiated settings, every datagram carries them, as incoming datagrams which
+        # acknowledge any of them are read in the new format
+        if self._pending_send_format is not None:
+            handshake_success = ConnectionProtocols.handshake_success
+            repeated = [m for m in members if m.protocol == handshake_success]
+            members = [m for m in members if m.protocol != handshake_success]
+
+        else:
+            repeated = ()
+
+        datagrams = [self.write_datagram(members, current_time)
+                     for members in self.split_datagrams(members, repeated)]
+
+        pacer.consume(sum([len(data) for data in datagrams]))
+
+        # Datagrams without data are sent as keepalives, until there is more data to send
+        if packet_collection.members:
+            next_send_time = self.next_send_time + 1 / self.send_rate
+            self.next_send_time = max(next_send_time, current_time)
+
+        else:
+            self.next_send_time = current_time + self.keepalive_interval
+
+        self.last_send_time = current_time
+
+        # Every datagram carries acks
+        self.ack_deadline = None
+
+        return datagrams
+
+    def send_urgent(self):
+        """Send pending data immediately, if the pacer permits. Otherwise, send it at the target send rate.
+
+        Requests made while received packets are dispatched are sent once dispatch finishes
+        """
+        self.schedule_send()
+
+        if not callable(self.on_urgent_data):
+            return
+
+        if self._dispatching:
+            self._urgent_send_pending = True
+            return
+
+        if self.pacer.refill(clock()) <= self.send_format.size:
+            return
+
+        self.on_urgent_data(self.send(False))
+
+    def is_send_due(self, current_time):
+        """Determine if the connection should send at the given time, or must send acks.
+
+        Sends which are less than half an interval early are permitted, so that frame jitter does not skip sends
+
+        :param current_time: current time
+        """
+        ack_deadline = self.ack_deadline
+        if ack_deadline is not None and current_time >= ack_deadline:
+            return True
+
+        return current_time >= self.next_send_time - 0.5 / self.send_rate
+
+    def request_ack(self, delay):
+        """Send acks within delay, with outgoing data if there is any
+
+        :param delay: longest time before acks are sent
+        """
+        ack_deadline = clock() + delay
+
+        if self.ack_deadline is None or ack_deadline < self.ack_deadline:
+            self.ack_deadline = ack_deadline
+
+    def schedule_send(self):
+        """Send at the target send rate, instead of waiting for the keepalive interval"""
+        self.next_send_time = min(self.next_send_time, self.last_send_time + 1 / self.send_rate)
+
+    def send_scheduled(self, network_tick, current_time):
+        """Pull data to send if the connection is due to send.
+
+        Network ticks which occur between sends are deferred until the next send
+
+        :param network_tick: if this is a network tick
+        :param current_time: current time
+        :returns: list of datagrams
+        """
+        if network_tick:
+            self.network_tick_pending = True
+
+        if not self.is_send_due(current_time):
+            return []
 
-        # Force bandwidth to grow (until throttled)
-        self.bandwidth += self.packet_growth
+        network_tick = self.network_tick_pending
+        self.network_tick_pending = False
 
-        return b''.join(payload)
+        return self.send(network_tick)
 
     def sequence_more_recent(self, base, sequence):
         """Compare two sequence identifiers and determine if one is newer than the other
@@ -226,7 +627,7 @@ class Connection(metaclass=InstanceRegister):
 
     def start_throttling(self):
         """Start updating metric for bandwidth"""
-        self.bandwidth /= 2
+        self.congestion_controller.on_congestion(clock())
         self.throttle_pending = True
 
     def stop_throttling(self):
@@ -0,0 +1,108 @@
+from .enums import ConnectionProtocols
+from .packet import Packet
+from .reliability import HeaderFormat
+
+from hashlib import sha256
+from hmac import compare_digest, new as new_hmac
+from os import urandom
+from time import clock
+
+__all__ = ['HandshakeCookies']
+
+
+class HandshakeCookies:
+    """Stateless validation of handshake requests from unknown peers.
+
+    A cookie is an HMAC of the peer address and the current time period, so that a peer must receive datagrams at its
+    address before the server allocates state for it. Cookies are valid for between one and two lifetimes
+    """
+
+    cookie_size = 16
+    lifetime = 10.0
+
+    # Unknown peers are sent the header format used before negotiation
+    header_format = HeaderFormat()
+
+    def __init__(self, secret=None):
+        if secret is None:
+            secret = urandom(32)
+
+        self.secret = secret
+
+    def create_cookie(self, address, period=None):
+        """Return cookie for address
+
+        :param address: address of peer
+        :param period: time period of cookie (defaults to current period)
+        """
+        if period is None:
+            period = int(clock() / self.lifetime)
+
+        message = "{}:{}:{}".format(address[0], address[1], period).encode()
+        return new_hmac(self.secret, message, sha256).digest()[:self.cookie_size]
+
+    def validate_cookie(self, cookie, address):
+        """Determine if cookie was created for address during the current or previous time period
+
+        :param cookie: cookie echoed by peer
+        :param address: address of peer
+        """
+        if len(cookie) != self.cookie_size:
+            return False
+
+        period = int(clock() / self.lifetime)
+        return compare_digest(cookie, self.create_cookie(address, period)) or \
+            compare_digest(cookie, self.create_cookie(address, period - 1))
+
+    def read_handshake_request(self, bytes_string):
+        """Find handshake request and cookie in datagram, without creating packets
+
+        :param bytes_string: datagram
+        :returns: sequence of datagram, cookie (or None), whether datagram contains a handshake request
+        """
+        header_format = self.header_format
+        if len(bytes_string) < header_format.size:
+            return None, None, False
+
+        sequence, _, _, _, offset = header_format.unpack_from(bytes_string)
+
+        unpack_size = Packet.size_handler.unpack_from
+        unpack_protocol = Packet.protocol_handler.unpack_from
+        length_size = Packet.size_handler.size()
+        protocol_size = Packet.protocol_handler.size()
+        end_offset = len(bytes_string)
+
+        cookie = None
+        is_request = False
+
+        while offset + length_size + protocol_size <= end_offset:
+            length, _ = unpack_size(bytes_string, offset)
+            offset += length_size
+
+            protocol, _ = unpack_protocol(bytes_string, offset)
+            packet_end = offset + length
+
+            # Truncated packet
+            if length < protocol_size or packet_end > end_offset:
+                break
+
+            if protocol == ConnectionProtocols.handshake_cookie:
+                cookie = bytes_string[offset + protocol_size: packet_end]
+
+            elif protocol == ConnectionProtocols.request_handshake:
+                is_request = True
+
+            offset = packet_end
+
+        return sequence, cookie, is_request
+
+    def create_challenge(self, address, sequence):
+        """Create datagram which sends a cookie to a peer
+
+        :param address: address of peer
+        :param sequence: sequence of peer's handshake request
+        """
+        header = self.header_format.pack(0, sequence, 0)
+        packet = Packet(protocol=ConnectionProtocols.handshake_cookie, payload=self.create_cookie(address))
+
+        return header + packet.to_bytes()
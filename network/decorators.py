@@ -5,7 +5,7 @@ from .conditions import is_simulated, is_annotatable
 from .enums import Roles
 
 
-__all__ = ['reliable', 'simulated', 'signal_listener', 'requires_netmode', 'with_tag', 'ignore_arguments',
+__all__ = ['reliable', 'simulated', 'urgent', 'signal_listener', 'requires_netmode', 'with_tag', 'ignore_arguments',
            'set_annotation', 'set_annotation', 'get_annotation', 'IgnoredArgumentsDescriptor', 'simulate_methods']
 
 
@@ -95,6 +95,15 @@ def reliable(func):
     return set_annotation("reliable")(True)(func)
 
 
+def urgent(func):
+    """Mark a function to be replicated immediately, instead of with the next network send
+
+    :param func: function to be marked
+    :returns: function that was passed as func
+    """
+    return set_annotation("urgent")(True)(func)
+
+
 def simulated(func):
     """Mark a function to be a simulated function
 
@@ -1,6 +1,12 @@
 from itertools import groupby
+from struct import Struct
 
-__all__ = ["RunLengthCodec"]
+__all__ = ["RunLengthCodec", "VarIntCodec", "ZigZagCodec"]
+
+
+_single_bytes = [bytes((value,)) for value in range(0x80)]
+_pack_two = Struct("2B").pack
+_pack_three = Struct("3B").pack
 
 
 class RunLengthCodec:
@@ -22,4 +28,157 @@ class RunLengthCodec:
         :returns: original sequence as a list
         :param sequence: sequence of value pairs to decode
         """
-        return [key for (length, key) in sequence for _ in range(length)]
\ No newline at end of file
+        return [key for (length, key) in sequence for _ in range(length)]
+
+class VarIntCodec:
+    """LEB128 codec for unsigned integers, which packs 7 bits per byte.
+
+    Values of up to three bytes are packed and unpacked without a loop
+    """
+
+    @staticmethod
+    def encode(value):
+        """Encode unsigned integer to bytes
+
+        :param value: integer to encode
+        """
+        if value < 0x80:
+            if value < 0:
+                raise ValueError("Cannot encode negative integer {} as unsigned varint".format(value))
+
+            return _single_bytes[value]
+
+        if value < 0x4000:
+            return _pack_two((value & 0x7F) | 0x80, value >> 7)
+
+        if value < 0x200000:
+            return _pack_three((value & 0x7F) | 0x80, ((value >> 7) & 0x7F) | 0x80, value >> 14)
+
+        data = bytearray()
+
+        while value > 0x7F:
+            data.append((value & 0x7F) | 0x80)
+            value >>= 7
+
+        data.append(value)
+        return bytes(data)
+
+    @staticmethod
+    def encode_multiple(values):
+        """Encode sequence of unsigned integers to bytes
+
+        :param values: integers to encode
+        """
+        # Single byte values encode directly
+        if not values or max(values) < 0x80:
+            return bytes(values)
+
+        data = bytearray()
+        append = data.append
+
+        for value in values:
+            while value > 0x7F:
+                append((value & 0x7F) | 0x80)
+                value >>= 7
+
+            append(value)
+
+        return bytes(data)
+
+    @staticmethod
+    def decode(bytes_string, offset=0):
+        """Decode unsigned integer from bytes
+
+        :returns: value, size of encoded value
+        :param bytes_string: bytes to decode
+        :param offset: offset of encoded value
+        """
+        byte = bytes_string[offset]
+        if byte < 0x80:
+            return byte, 1
+
+        value = byte & 0x7F
+
+        byte = bytes_string[offset + 1]
+        if byte < 0x80:
+            return value | (byte << 7), 2
+
+        value |= (byte & 0x7F) << 7
+
+        byte = bytes_string[offset + 2]
+        if byte < 0x80:
+            return value | (byte << 14), 3
+
+        value |= (byte & 0x7F) << 14
+        shift = 21
+        index = offset + 3
+
+        while True:
+            byte = bytes_string[index]
+            index += 1
+
+            value |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return value, index - offset
+
+            shift += 7
+
+    @staticmethod
+    def decode_multiple(bytes_string, count, offset=0):
+        """Decode sequence of unsigned integers from bytes
+
+        :returns: list of values, size of encoded values
+        :param bytes_string: bytes to decode
+        :param count: number of values to decode
+        :param offset: offset of encoded values
+        """
+        # Single byte values decode directly
+        data = bytes_string[offset: offset + count]
+        if len(data) == count and (not count or max(data) < 0x80):
+            return list(data), count
+
+        values = []
+        append = values.append
+        value = shift = size = 0
+        remaining = count
+
+        for byte in bytes_string[offset:]:
+            size += 1
+
+            if byte < 0x80:
+                append(value | (byte << shift))
+
+                remaining -= 1
+                if not remaining:
+                    break
+
+                value = shift = 0
+
+            else:
+                value |= (byte & 0x7F) << shift
+                shift += 7
+
+        if remaining:
+            raise ValueError("Cannot decode {} varints beyond end of data".format(count))
+
+        return values, size
+
+
+class ZigZagCodec:
+    """Codec which maps signed integers to unsigned integers, so that small magnitudes have small encodings"""
+
+    @staticmethod
+    def encode(value):
+        """Map signed integer to unsigned integer
+
+        :param value: signed integer
+        """
+        return value << 1 if value >= 0 else (-value << 1) - 1
+
+    @staticmethod
+    def decode(value):
+        """Map unsigned integer to signed integer
+
+        :param value: unsigned integer
+        """
+        return (value >> 1) ^ -(value & 1)
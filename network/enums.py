@@ -19,7 +19,8 @@ class Netmodes(Enumeration):
 
 class ConnectionProtocols(Enumeration):
     values = "request_disconnect", "request_handshake", "handshake_success", "handshake_failed", "replication_init", \
-             "replication_del",  "attribute_update", "method_invoke",
+             "replication_del",  "attribute_update", "method_invoke", "fragment", \
+             "handshake_cookie", "ordered"
 
 
 class IterableCompressionType(Enumeration):
@@ -30,7 +30,7 @@ class FlagSerialiser:
 
         # BitFields used for packing
         self.bool_bits = BitField(self.total_booleans)
-        self.none_bits = BitField(self.total_contents)
+        self.none_bits = BitField(self.total_contents + 2)
 
         # Additional two bits when including NoneType and Boolean values
         self.content_bits = BitField(self.total_contents + 2)
@@ -129,6 +129,7 @@ class FlagSerialiser:
                 if previous_value is not None and hasattr(handler, "unpack_merge"):
                     # If we can't merge use default unpack
                     value_size = handler.unpack_merge(previous_value, bytes_string, offset)
+                    value = previous_value
 
                 # Otherwise ask for a new value
                 else:
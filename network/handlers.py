@@ -1,8 +1,13 @@
+from .type_flag import TypeFlag
+
 handlers = {}
 descriptions = {}
 
+# Handlers built for TypeFlags, keyed by type and normalised data
+handler_cache = {}
+
 __all__ = ['static_description', 'register_handler', 'register_description',
-           'get_handler']
+           'get_handler', 'clear_handler_cache', 'quantize_value', 'is_within_range']
 
 
 def static_description(value):
@@ -41,15 +46,17 @@ def static_description(value):
     return description_func(value)
 
 
-def register_handler(value_type, handler, is_callable=False):
+def register_handler(value_type, handler, is_callable=False, is_stateful=False):
     """Registers new handler for custom serialisers
 
     :param value_type: type of object
     :param handler: handler object for value_type
     :param is_callable: whether handler should be called with the TypeFlag that
     requests it
+    :param is_stateful: whether built handlers hold state, and so must not be
+    shared between TypeFlags
     """
-    handlers[value_type] = handler, is_callable
+    handlers[value_type] = handler, is_callable, is_stateful
 
 
 def register_description(value_type, callback):
@@ -63,12 +70,40 @@ def register_description(value_type, callback):
     descriptions[value_type] = callback
 
 
+def clear_handler_cache():
+    """Forget handlers built for previous TypeFlags"""
+    handler_cache.clear()
+
+
+def _normalise_flag_data(value):
+    """Return hashable representation of TypeFlag data
+
+    :param value: TypeFlag data value
+    """
+    if isinstance(value, TypeFlag):
+        return value.type, _normalise_flag_data(value.data)
+
+    if isinstance(value, dict):
+        return tuple(sorted((key, _normalise_flag_data(item)) for key, item in value.items()))
+
+    if isinstance(value, (list, tuple)):
+        return tuple(_normalise_flag_data(item) for item in value)
+
+    if isinstance(value, (set, frozenset)):
+        return frozenset(_normalise_flag_data(item) for item in value)
+
+    return value
+
+
 def get_handler(type_flag):
     """Takes a TypeFlag (or subclass thereof) and return handler.
 
     If a handler cannot be found for the provided type, look for a handled
     superclass, assign it to the requested type and return it.
 
+    Built handlers are remembered for TypeFlags with equal type and data,
+    unless registered as stateful.
+
     :param type_flag: TypeFlag subclass
     :returns: handler object
     """
@@ -76,7 +111,7 @@ def get_handler(type_flag):
     value_type = type_flag.type
 
     try:
-        handler, is_callable = handlers[value_type]
+        handler, is_callable, is_stateful = handlers[value_type]
 
     except KeyError:
         try:
@@ -91,6 +126,60 @@ def get_handler(type_flag):
 
         else:
             # Remember this for later call
-            handler, is_callable = handlers[value_type] = handlers[handled_type]
+            handler, is_callable, is_stateful = handlers[value_type] = handlers[handled_type]
+
+    if not is_callable:
+        return handler
+
+    if is_stateful:
+        return handler(type_flag)
+
+    try:
+        cache_key = value_type, _normalise_flag_data(type_flag.data)
+        return handler_cache[cache_key]
+
+    # Unhashable data cannot be remembered
+    except TypeError:
+        return handler(type_flag)
+
+    except KeyError:
+        built_handler = handler_cache[cache_key] = handler(type_flag)
+        return built_handler
+
+
+def quantize_value(type_flag, value):
+    """Return value as it will be unpacked by the handler for a TypeFlag.
+
+    Values are returned unchanged unless the handler quantizes them
+
+    :param type_flag: TypeFlag subclass
+    :param value: value to quantize
+    """
+    handler = get_handler(type_flag)
+
+    try:
+        quantize = handler.quantize
+
+    except AttributeError:
+        return value
+
+    return quantize(value)
+
+
+def is_within_range(type_flag, value):
+    """Return True if value is within the range of the handler for a TypeFlag, so it is quantized without clamping.
+
+    Handlers without a bounded range contain every value
+
+    :param type_flag: TypeFlag subclass
+    :param value: value to check
+    """
+    handler = get_handler(type_flag)
+
+    try:
+        contains = handler.contains
+
+    except AttributeError:
+        return True
 
-    return handler(type_flag) if is_callable else handler
+    return contains(value)
@@ -37,6 +37,9 @@ class _ManagedInstanceBase(SignalListener):
     def on_unregistered(self):
         pass
 
+    def on_registration_cancelled(self):
+        pass
+
     def register(self, instance_id, immediately=False):
         """Mark the instance for registered on the next graph update
 
@@ -51,13 +54,16 @@ class _ManagedInstanceBase(SignalListener):
 
             instance_id = cls.get_next_id()
 
+        # Remove stale index entry if re-registering
+        cls._remove_pending(self)
+
         self.instance_id = instance_id
 
         if immediately:
             cls._register_to_graph(self)
 
         else:
-            cls._pending_registered.add(self)
+            cls._add_pending(self)
 
     def deregister(self, immediately=False):
         """Mark the instance for unregistered on the next graph update
@@ -109,6 +115,7 @@ class InstanceRegister(TypeRegister):
         if not hasattr(cls, "_instances"):
             cls._instances = {}
             cls._pending_registered = set()
+            cls._pending_registered_by_id = {}
             cls._pending_unregistered = set()
             cls._id_generator = RenewableGenerator(cls.iter_available_ids)
 
@@ -118,12 +125,46 @@ class InstanceRegister(TypeRegister):
     def total_instances(cls):
         return len(cls._instances) + len(cls._pending_registered)
 
+    def _add_pending(cls, instance):
+        """Internal graph method
+        Adds an instance to the pending registered set and ID index
+
+        :param instance: instance to be registered
+        """
+        cls._pending_registered.add(instance)
+
+        try:
+            cls._pending_registered_by_id[instance.instance_id].append(instance)
+
+        except KeyError:
+            cls._pending_registered_by_id[instance.instance_id] = [instance]
+
+    def _remove_pending(cls, instance):
+        """Internal graph method
+        Removes an instance from the pending registered set and ID index
+
+        :param instance: instance pending registration
+        """
+        if instance not in cls._pending_registered:
+            return
+
+        cls._pending_registered.remove(instance)
+
+        # Several instances may be pending with the same ID
+        pending_with_id = cls._pending_registered_by_id[instance.instance_id]
+        pending_with_id.remove(instance)
+
+        if not pending_with_id:
+            cls._pending_registered_by_id.pop(instance.instance_id)
+
     def _register_to_graph(cls, instance):
         """Internal graph method
         Registers an instance to the instance dict
 
         :param instance: instance to be registered
         """
+        cls._remove_pending(instance)
+
         if instance.registered:
             return
 
@@ -142,6 +183,12 @@ class InstanceRegister(TypeRegister):
 
         :param instance: instance to be unregistered
         """
+        # Prevent registration of pending instance
+        if instance in cls._pending_registered:
+            cls._remove_pending(instance)
+            instance.on_registration_cancelled()
+            return
+
         if not instance.instance_id in cls._instances:
             return
 
@@ -233,9 +280,9 @@ class InstanceRegister(TypeRegister):
                 raise LookupError
 
             try:
-                return next(i for i in cls._pending_registered if i.instance_id == instance_id)
+                return cls._pending_registered_by_id[instance_id][0]
 
-            except StopIteration:
+            except KeyError:
                 raise LookupError
 
     def remove_from_graph(cls, instance_id):
@@ -264,11 +311,11 @@ class InstanceRegister(TypeRegister):
         Un-registers managed instances which requested un-registered
         """
         if cls._pending_registered:
-            get_instance = cls._pending_registered.pop
+            pending_registered = cls._pending_registered
             register = cls._register_to_graph
 
-            while cls._pending_registered:
-                instance = get_instance()
+            while pending_registered:
+                instance = next(iter(pending_registered))
                 register(instance)
 
         if cls._pending_unregistered:
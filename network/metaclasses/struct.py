@@ -1,5 +1,5 @@
 from .mapping.attribute_mapping import AttributeMeta
-from ..flag_serialiser import FlagSerialiser
+from ..codecs import get_attribute_codec
 
 __all__ = ['StructMeta']
 
@@ -10,11 +10,7 @@ class StructMeta(AttributeMeta):
     def __new__(mcs, name, bases, cls_dict):
         cls = super().__new__(mcs, name, bases, cls_dict)
 
-        attribute_container = cls._attribute_container
-        factory_callback = attribute_container.callback
-        ordered_arguments = factory_callback.keywords['ordered_mapping']
-
-        cls._serialiser = FlagSerialiser(ordered_arguments)
+        cls._serialiser = get_attribute_codec(cls)
         cls.__slots__ = ()
 
         return cls
\ No newline at end of file
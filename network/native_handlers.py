@@ -112,7 +112,7 @@ class IterableHandler:
         except KeyError as err:
             raise TypeError("Unable to pack iterable without full type information") from err
 
-        int_flag = TypeFlag(int)
+        int_flag = TypeFlag(int, encoding="varint")
         variable_bitfield_flag = TypeFlag(BitField)
 
         self.element_type = element_flag.type
@@ -276,27 +276,31 @@ class IterableHandler:
         :param bytes_string: incoming bytes offset to packed_iterable start
         """
         elements_count, count_size = self.count_packer.unpack_from(bytes_string)
-        data = bytes_string[count_size:]
-
-        element_get_size = self.element_packer.size
         total_size = count_size
 
-        # Faster unpacking
+        # Boolean elements are packed in a bitfield before their counts
         if self.element_type is bool:
             if elements_count:
-                bitfield_size = self.bitfield_packer.size(data)
-                total_size += bitfield_size + count_size * elements_count
+                total_size += self.bitfield_packer.size(bytes_string[total_size:])
 
-        elif not self.is_variable_sized:
-            total_size += (element_get_size(None) + count_size) * elements_count
+        _, counts_size = self.count_packer.unpack_multiple(bytes_string, elements_count, total_size)
+        total_size += counts_size
 
-        else:
-            for i in range(elements_count):
-                element_data = data[count_size:]
-                element_size = element_get_size(element_data)
-                data = element_data[element_size:]
+        if self.element_type is bool:
+            return total_size
+
+        element_get_size = self.element_packer.size
+
+        # Faster unpacking
+        if not self.is_variable_sized:
+            return total_size + element_get_size(None) * elements_count
+
+        data = bytes_string[total_size:]
+        for i in range(elements_count):
+            element_size = element_get_size(data)
+            data = data[element_size:]
 
-                total_size += element_size + count_size
+            total_size += element_size
 
         return total_size
 
@@ -409,7 +413,7 @@ class ReplicableBaseHandler:
     """
 
     def __init__(self):
-        id_flag = TypeFlag(int, max_value=Replicable._MAXIMUM_REPLICABLES)
+        id_flag = TypeFlag(int, encoding="varint")
         self._packer = get_handler(id_flag)
 
     def pack(self, replicable):
@@ -469,8 +473,8 @@ class ReplicableBaseHandler:
 
         return replicables, offset
 
-    def size(self, bytes_string=None):
-        return self._packer.size()
+    def size(self, bytes_string):
+        return self._packer.size(bytes_string)
 
 
 class StructHandler:
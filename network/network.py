@@ -1,13 +1,17 @@
+from .backends import DatagramBackend
 from .connection import Connection
-from .decorators import ignore_arguments
+from .cookies import HandshakeCookies
 from .enums import ConnectionStatus
-from .signals import SignalListener
+from .timers import TimerWheel
 
-from collections import deque
+from functools import partial
+from heapq import heappop, heappush
+from random import Random
 from socket import socket, AF_INET, SOCK_DGRAM, error as SOCK_ERROR, gethostbyname
 from time import clock
 
-__all__ = ['NonBlockingSocketUDP', 'UnreliableSocketUDP', 'Network', 'NetworkMetrics']
+__all__ = ['NonBlockingSocketUDP', 'NetworkConditions', 'SimulatedSocketUDP', 'UnreliableSocketUDP', 'Network',
+           'NetworkMetrics']
 
 
 class NonBlockingSocketUDP(socket):
@@ -21,43 +25,182 @@ class NonBlockingSocketUDP(socket):
         self.setblocking(False)
 
 
-class UnreliableSocketUDP(SignalListener, NonBlockingSocketUDP):
-    """Non blocking socket class.
+class NetworkConditions:
+    """Simulated network conditions for outgoing datagrams.
 
-    A SignalListener which applies artificial latency
-    to outgoing packets
+    Loss follows a Gilbert-Elliott model: datagrams are lost with probability loss in the good state, and burst_loss
+    in the bad state. The bad state is entered with probability burst_probability per datagram, and left with
+    probability burst_recovery. Bursts are disabled when burst_probability is zero
     """
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
+    def __init__(self, latency=0.0, jitter=0.0, loss=0.0, burst_probability=0.0, burst_recovery=0.5,
+                 burst_loss=1.0, duplication=0.0, reordering=0.0, reordering_delay=0.02, bandwidth=None,
+                 max_queue_delay=None):
+        """Network conditions initialiser
+
+        :param latency: one way delay (seconds)
+        :param jitter: maximum additional random delay (seconds)
+        :param loss: probability of loss in good state
+        :param burst_probability: probability of entering bad state
+        :param burst_recovery: probability of leaving bad state
+        :param burst_loss: probability of loss in bad state
+        :param duplication: probability of sending a datagram twice
+        :param reordering: probability of delaying a datagram by reordering_delay, so that later datagrams overtake it
+        :param reordering_delay: additional delay of reordered datagrams (seconds)
+        :param bandwidth: link capacity (bytes per second), or None if unlimited
+        :param max_queue_delay: maximum time datagrams wait for the link before being dropped, or None if unlimited
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.loss = loss
+        self.burst_probability = burst_probability
+        self.burst_recovery = burst_recovery
+        self.burst_loss = burst_loss
+        self.duplication = duplication
+        self.reordering = reordering
+        self.reordering_delay = reordering_delay
+        self.bandwidth = bandwidth
+        self.max_queue_delay = max_queue_delay
+
+
+class SimulatedSocketUDP(NonBlockingSocketUDP):
+    """Non blocking socket class which applies simulated network conditions to outgoing datagrams.
+
+    Random decisions are drawn from a seeded generator, so that runs with the same traffic are reproducible.
+    Delayed datagrams are held in a heap, and are sent by release_sends, which is called whenever the socket is used.
+    Datagrams sent through the file descriptor (e.g. by MultipleMessageBackend) are not affected
+    """
 
-        self.delay = 0.000
-        self._buffer_out = deque()
+    def __init__(self, addr, port, conditions=None, seed=0):
+        super().__init__(addr, port)
 
-    @ignore_arguments
-    def delayed_send(self):
-        current_time = clock()
+        if conditions is None:
+            conditions = NetworkConditions()
+
+        self.conditions = conditions
+        self.random = Random(seed)
+
+        self.sent_datagrams = 0
+        self.dropped_datagrams = 0
+        self.duplicated_datagrams = 0
+        self.reordered_datagrams = 0
+
+        self._in_burst = False
+        self._link_free_time = 0.0
+        self._pending_sends = []
+        self._send_index = 0
+
+    def is_lost(self):
+        """Determine if next datagram is lost"""
+        conditions = self.conditions
+        random = self.random.random
+
+        if self._in_burst:
+            self._in_burst = random() >= conditions.burst_recovery
+
+        else:
+            self._in_burst = random() < conditions.burst_probability
+
+        return random() < (conditions.burst_loss if self._in_burst else conditions.loss)
+
+    def schedule_send(self, data, address, current_time):
+        """Add datagram to pending sends, according to network conditions
 
-        # Check if we can send delayed data
-        delay = self.delay
+        :param data: datagram
+        :param address: address of remote peer
+        :param current_time: time datagram was sent
+        """
+        conditions = self.conditions
+        random = self.random.random
+
+        send_time = current_time
+
+        # Serialise onto the link
+        if conditions.bandwidth is not None:
+            start_time = max(current_time, self._link_free_time)
+
+            if conditions.max_queue_delay is not None and start_time - current_time > conditions.max_queue_delay:
+                self.dropped_datagrams += 1
+                return
 
-        index = 0
-        for index, (timestamp, *payload) in enumerate(self._buffer_out):
-            if (current_time - timestamp) < delay:
-                break
+            send_time = self._link_free_time = start_time + len(data) / conditions.bandwidth
 
-        pending_send = self._buffer_out[:index]
-        self._buffer_out[:] = self._buffer_out[index:]
+        send_time += conditions.latency + conditions.jitter * random()
 
-        # Send the delayed data
+        if random() < conditions.reordering:
+            send_time += conditions.reordering_delay
+            self.reordered_datagrams += 1
+
+        # Index preserves order of datagrams with equal send times
+        heappush(self._pending_sends, (send_time, self._send_index, bytes(data), address))
+        self._send_index += 1
+
+    def release_sends(self):
+        """Send pending datagrams which are due"""
+        pending_sends = self._pending_sends
+        current_time = clock()
         send = super().sendto
-        for timestamp, (args, kwargs) in pending_send:
-            send(*args, **kwargs)
 
-    def sendto(self, *args, **kwargs):
-        # Store data for delay
-        self._buffer_out.append((clock(), args, kwargs))
-        return 0
+        while pending_sends and pending_sends[0][0] <= current_time:
+            _, _, data, address = heappop(pending_sends)
+
+            try:
+                send(data, address)
+
+            except SOCK_ERROR:
+                self.dropped_datagrams += 1
+
+            else:
+                self.sent_datagrams += 1
+
+    def sendto(self, data, *args):
+        current_time = clock()
+        address = args[-1]
+
+        self.release_sends()
+
+        if self.is_lost():
+            self.dropped_datagrams += 1
+
+        else:
+            self.schedule_send(data, address, current_time)
+
+            if self.random.random() < self.conditions.duplication:
+                self.schedule_send(data, address, current_time)
+                self.duplicated_datagrams += 1
+
+        self.release_sends()
+        return len(data)
+
+    def recvfrom(self, *args, **kwargs):
+        self.release_sends()
+        return super().recvfrom(*args, **kwargs)
+
+    def recvfrom_into(self, *args, **kwargs):
+        self.release_sends()
+        return super().recvfrom_into(*args, **kwargs)
+
+    def recvmsg_into(self, *args, **kwargs):
+        self.release_sends()
+        return super().recvmsg_into(*args, **kwargs)
+
+
+class UnreliableSocketUDP(SimulatedSocketUDP):
+    """Non blocking socket class which applies artificial latency to outgoing packets.
+
+    Retained for compatibility, SimulatedSocketUDP supports other network conditions
+    """
+
+    @property
+    def delay(self):
+        return self.conditions.latency
+
+    @delay.setter
+    def delay(self, delay):
+        self.conditions.latency = delay
+
+    def delayed_send(self, *args, **kwargs):
+        self.release_sends()
 
 
 class NetworkMetrics:
@@ -108,12 +251,30 @@ class NetworkMetrics:
 
 
 class Network:
-    """Network management class"""
+    """Network management class.
 
-    def __init__(self, address, port):
+    Connections are only created for unknown peers which echo a handshake cookie, so that datagrams from spoofed
+    addresses do not allocate state
+    """
+
+    use_handshake_cookies = True
+
+    def __init__(self, address, port, backend=DatagramBackend, socket_factory=NonBlockingSocketUDP):
+        """Network initialiser
+
+        :param address: address to bind
+        :param port: port to bind
+        :param backend: socket backend class
+        :param socket_factory: callable which creates a bound socket from an address and port
+        """
         self.metrics = NetworkMetrics()
         self.receive_buffer_size = 63553
-        self.socket = NonBlockingSocketUDP(address, port)
+        self.socket = socket_factory(address, port)
+        self.backend = backend(self.socket, self.receive_buffer_size)
+        self.handshake_cookies = HandshakeCookies()
+
+        # Connections time out when they do not receive data within the timeout duration of their handshake stream
+        self.connection_timeouts = TimerWheel()
 
         self.address = address
         self.port = port
@@ -123,72 +284,133 @@ class Network:
 
     @property
     def received_data(self):
-        buff_size = self.receive_buffer_size
         on_received_bytes = self.metrics.on_received_bytes
 
-        while True:
-            try:
-                data = self.socket.recvfrom(buff_size)
-
-            except SOCK_ERROR:
-                return
-
+        for data in self.backend.receive():
             payload, _ = data
-            on_received_bytes(len(data))
+            on_received_bytes(len(payload))
 
             yield data
 
-    @staticmethod
-    def connect_to(peer_data):
+    def connect_to(self, peer_data):
         """Return connection interface to remote peer.
 
         If connection does not exist, create a new ConnectionInterface.
 
         :param peer_data: tuple of address, port of remote peer
         """
-        return Connection.create_connection(*peer_data)
+        connection = Connection.create_connection(*peer_data)
+        connection.on_urgent_data = partial(self.send_urgent, connection.instance_id)
+
+        if connection not in self.connection_timeouts:
+            self.reset_timeout(connection, clock())
+
+        return connection
+
+    def reset_timeout(self, connection, current_time):
+        """Re-arm timeout of connection
+
+        :param connection: connection which received data
+        :param current_time: current time
+        """
+        self.connection_timeouts.schedule(connection, current_time + connection.handshake.timeout_duration)
+
+    def update_timeouts(self, current_time):
+        """Time out connections which have not received data within their timeout duration
+
+        :param current_time: current time
+        """
+        for connection in self.connection_timeouts.advance(current_time):
+            # Connection may have been removed since it last received data
+            if connection.registered:
+                connection.handshake.on_timeout()
 
     def receive(self):
         """Receive all data from socket"""
-        # Get connections
-        get_connection = Connection.get_from_graph
+        # Get connections, including those pending registration
+        connections = Connection.by_address
+        reset_timeout = self.reset_timeout
+        current_time = clock()
 
         # Receives all incoming data
         for data, address in self.received_data:
             # Find existing connection for address
 
             try:
-                connection = get_connection(address, only_registered=False)
+                connection = connections[address]
 
             # Create a new interface to handle connection
-            except LookupError:
+            except KeyError:
+                if self.use_handshake_cookies and not self.accept_peer(data, address):
+                    continue
+
                 connection = Connection(address)
+                connection.on_urgent_data = partial(self.send_urgent, address)
 
             # Dispatch data to connection
             connection.receive(data)
+            reset_timeout(connection, current_time)
 
         # Apply any changes to the Connection interface
         Connection.update_graph()  # @UndefinedVariable
 
+    def accept_peer(self, data, address):
+        """Determine if a connection should be created for datagram from unknown peer.
+
+        Handshake requests without a valid cookie are answered with a new cookie, if the request is no smaller than
+        the reply
+
+        :param data: datagram
+        :param address: address of peer
+        """
+        handshake_cookies = self.handshake_cookies
+        sequence, cookie, is_request = handshake_cookies.read_handshake_request(data)
+
+        if not is_request:
+            return False
+
+        if cookie is not None and handshake_cookies.validate_cookie(cookie, address):
+            return True
+
+        challenge = handshake_cookies.create_challenge(address, sequence)
+        if len(challenge) <= len(data):
+            self.send_to(challenge, address)
+
+        return False
+
     def send(self, full_update):
-        """Send all connection data and update timeouts
+        """Send data of connections which are due to send, and update timeouts
 
         :param full_update: whether this is a full send call
         """
-        send_func = self.send_to
+        datagrams = []
+        current_time = clock()
 
         # Send all queued data
         for connection in Connection:
-            # Give the option to send nothing
-            data = connection.send(full_update)
+            address = connection.instance_id
+
+            for data in connection.send_scheduled(full_update, current_time):
+                datagrams.append((data, address))
+
+        # Flush all datagrams at once
+        if datagrams:
+            self.send_multiple(datagrams)
 
-            # If returns data, send it
-            if data:
-                send_func(data, connection.instance_id)
+        self.update_timeouts(current_time)
 
         # Delete dead connections
         Connection.update_graph()
 
+    def send_urgent(self, address, datagrams):
+        """Send datagrams of urgent data, before the next network send
+
+        :param address: address of remote peer
+        :param datagrams: list of datagrams
+        """
+        if datagrams:
+            self.send_multiple([(data, address) for data in datagrams])
+
     def send_to(self, data, address):
         """Send data to remote peer
 
@@ -200,6 +422,16 @@ class Network:
         self.metrics.on_sent_bytes(data_length)
         return data_length
 
+    def send_multiple(self, datagrams):
+        """Send sequence of datagrams to remote peers
+
+        :param datagrams: sequence of data, address pairs
+        """
+        data_length = self.backend.send(datagrams)
+
+        self.metrics.on_sent_bytes(data_length)
+        return data_length
+
     def stop(self):
         """Close network socket"""
         self.socket.close()
@@ -35,7 +35,7 @@ class PacketCollection:
 
     @property
     def size(self):
-        return len(self.to_bytes())
+        return sum([m.size for m in self.members])
 
     def to_reliable(self):
         """Create PacketCollection of reliable members
@@ -66,26 +66,30 @@ class PacketCollection:
         return b''.join([m.to_bytes() for m in self.members])
 
     @classmethod
-    def iter_bytes(cls, bytes_string, callback):
+    def iter_bytes(cls, bytes_string, callback, offset=0):
         """Iterates over packets within a byte stream
 
         :param bytes_string: byte stream
-        :param callback: callable object to handle created packets"""
-        while bytes_string:
+        :param callback: callable object to handle created packets
+        :param offset: offset of first packet in byte stream"""
+        end_offset = len(bytes_string)
+
+        while offset < end_offset:
             packet = Packet()
-            bytes_string = packet.take_from(bytes_string)
+            offset = packet.read_from(bytes_string, offset)
             callback(packet)
 
     @classmethod
-    def from_bytes(cls, bytes_string):
+    def from_bytes(cls, bytes_string, offset=0):
         """Creates PacketCollection instance
         Populates with packets in byte stream
 
         :param bytes_string: bytes stream
+        :param offset: offset of first packet in byte stream
         :rtype: :py:class:`network.packet.PacketCollection`
         """
         collection = cls()
-        cls.iter_bytes(bytes_string, collection.members.append)
+        cls.iter_bytes(bytes_string, collection.members.append, offset)
 
         return collection
 
@@ -108,18 +112,25 @@ class PacketCollection:
 class Packet:
     """Interface class for packets sent over the network.
 
-    Supports protocol and length header
+    Supports protocol and length header.
+
+    Received payloads larger than max_copied_payload share memory with the byte stream they were read from
+    (a view, if it was a memoryview). Handlers must copy any payload data they retain
     """
     __slots__ = "protocol", "payload", "reliable", "on_success", "on_failure"
 
+    # Smaller payloads are copied on receipt, as a memoryview object outweighs a small bytes object
+    max_copied_payload = 128
+
     protocol_handler = get_handler(TypeFlag(int))
     size_handler = get_handler(TypeFlag(int, max_value=1000))
 
-    def __init__(self, protocol=None, payload=b'', *, reliable=False,
+    def __init__(self, protocol=None, payload=b'', *, reliable=None,
                  on_success=None, on_failure=None):
 
-        # Force reliability for callbacks
-        reliable = reliable or bool(on_success or on_failure)
+        # Force reliability for callbacks, unless unreliable delivery is requested
+        if reliable is None:
+            reliable = bool(on_success or on_failure)
 
         self.on_success = on_success
         self.on_failure = on_failure
@@ -135,7 +146,7 @@ class Packet:
     @property
     def size(self):
         """Length of packet when reduced to bytes"""
-        return len(self.to_bytes())
+        return self.size_handler.size() + self.protocol_handler.size() + len(self.payload)
 
     def on_ack(self):
         """Called when packet is acknowledged.
@@ -163,42 +174,45 @@ class Packet:
         return self.size_handler.pack(len(data)) + data
 
     @classmethod
-    def from_bytes(cls, bytes_string):
+    def from_bytes(cls, bytes_string, offset=0):
         """Creates packet instance from bytes
 
         :param bytes_string: bytes stream
+        :param offset: offset of packet in byte stream
         :rtype: :py:class:`network.packet.Packet`
         """
         packet = cls()
-        packet.take_from(bytes_string)
+        packet.read_from(bytes_string, offset)
         return packet
 
-    def take_from(self, bytes_string):
+    def read_from(self, bytes_string, offset=0):
         """Populates packet instance with data.
 
-        Offsets returned bytes by length of packet
+        Returns offset of the end of this packet
 
         :param bytes_string: bytes stream
-        :rtype: bytes
+        :param offset: offset of packet in byte stream
+        :rtype: int
         """
-        length_handler = self.size_handler
-        protocol_handler = self.protocol_handler
-
         # Read packet length (excluding length character size)
-        length, length_size = length_handler.unpack_from(bytes_string)
-        bytes_string = bytes_string[length_size:]
+        length, length_size = self.size_handler.unpack_from(bytes_string, offset)
+        offset += length_size
 
         # Read packet protocol
-        self.protocol, protocol_size = protocol_handler.unpack_from(bytes_string)
-        bytes_string = bytes_string[protocol_size:]
+        self.protocol, protocol_size = self.protocol_handler.unpack_from(bytes_string, offset)
+
+        # Determine the slice indices of this payload
+        end_index = offset + length
+        offset += protocol_size
 
-        # Determine the slice index of this payload
-        end_index = length - protocol_size
+        payload = bytes_string[offset:end_index]
+        if isinstance(payload, memoryview) and end_index - offset <= self.max_copied_payload:
+            payload = payload.tobytes()
 
-        self.payload = bytes_string[:end_index]
+        self.payload = payload
         self.reliable = False
 
-        return bytes_string[end_index:]
+        return end_index
 
     def __add__(self, other):
         """Concatenates two Packets
@@ -0,0 +1,655 @@
+from .encoding import VarIntCodec, ZigZagCodec
+from .handlers import get_handler
+from .packet import Packet, PacketCollection
+from .serialiser import bits_to_bytes
+from .type_flag import TypeFlag
+
+__all__ = ['HeaderFormat', 'CompactHeaderFormat', 'ReceivedWindow', 'SentWindow', 'RetransmissionTimer', 'ReliabilityMetrics']
+
+
+class HeaderFormat:
+    """Layout of the connection header for an ack window size and sequence width, with optional flags.
+
+    The low 16 bits of the sequence and ack base are always packed first, followed by the ack mask and then the
+    high 16 bits of each sequence (for 32 bit sequences), and the flags byte. This allows the ack base of a header to be
+    read before its format is known
+    """
+
+    word_handler = get_handler(TypeFlag(int, max_bits=16))
+    word_size = word_handler.size()
+
+    flags_handler = get_handler(TypeFlag(int, max_bits=8))
+
+    # Flag values
+    compressed = 1
+
+    def __init__(self, ack_window=32, sequence_bits=16, has_flags=False):
+        self.ack_window = ack_window
+        self.sequence_bits = sequence_bits
+        self.has_flags = has_flags
+
+        self.ack_mask_size = bits_to_bytes(ack_window)
+        self.full_ack_mask = (1 << ack_window) - 1
+        self.extended = sequence_bits > 16
+
+        self.size = 2 * self.word_size + self.ack_mask_size
+        if self.extended:
+            self.size += 2 * self.word_size
+
+        if has_flags:
+            self.size += self.flags_handler.size()
+
+    @classmethod
+    def read_ack_base(cls, bytes_string):
+        """Return low 16 bits of ack base of a header in any format
+
+        :param bytes_string: header bytes
+        """
+        return cls.word_handler.unpack_from(bytes_string, cls.word_size)[0]
+
+    def pack(self, sequence, ack_base, ack_mask, flags=0):
+        """Pack header to bytes
+
+        :param sequence: sequence of packet
+        :param ack_base: latest received sequence
+        :param ack_mask: mask of sequences received before ack_base
+        :param flags: header flags (ignored if format has no flags)
+        """
+        pack_word = self.word_handler.pack
+        data = [pack_word(sequence & 0xFFFF), pack_word(ack_base & 0xFFFF),
+                (ack_mask & self.full_ack_mask).to_bytes(self.ack_mask_size, "big")]
+
+        if self.extended:
+            data.append(pack_word(sequence >> 16))
+            data.append(pack_word(ack_base >> 16))
+
+        if self.has_flags:
+            data.append(self.flags_handler.pack(flags))
+
+        return b''.join(data)
+
+    def unpack_from(self, bytes_string, offset=0):
+        """Unpack header from bytes
+
+        :param bytes_string: header bytes
+        :param offset: offset of header
+        :returns: sequence, ack_base, ack_mask, flags, end offset
+        """
+        unpack_word = self.word_handler.unpack_from
+        word_size = self.word_size
+
+        sequence, _ = unpack_word(bytes_string, offset)
+        ack_base, _ = unpack_word(bytes_string, offset + word_size)
+        offset += 2 * word_size
+
+        mask_end = offset + self.ack_mask_size
+        ack_mask = int.from_bytes(bytes_string[offset: mask_end], "big")
+        offset = mask_end
+
+        if self.extended:
+            sequence |= unpack_word(bytes_string, offset)[0] << 16
+            ack_base |= unpack_word(bytes_string, offset + word_size)[0] << 16
+            offset += 2 * word_size
+
+        if self.has_flags:
+            flags, flags_size = self.flags_handler.unpack_from(bytes_string, offset)
+            offset += flags_size
+
+        else:
+            flags = 0
+
+        return sequence, ack_base, ack_mask, flags, offset
+
+    @staticmethod
+    def pack_packets(members):
+        """Pack packets to bytes
+
+        :param members: packets to pack
+        """
+        return b''.join([m.to_bytes() for m in members])
+
+    @staticmethod
+    def unpack_packets(bytes_string, offset=0):
+        """Unpack packets from bytes
+
+        :param bytes_string: bytes of packets
+        :param offset: offset of first packet
+        """
+        return PacketCollection.from_bytes(bytes_string, offset)
+
+
+class CompactHeaderFormat(HeaderFormat):
+    """Variable length layout of the connection header and packet headers.
+
+    The header begins with a control byte (ack mask length, flags, and whether the sequence delta continues) and the
+    low byte of the sequence delta, followed by the low 16 bits of the ack base at the same offset as in HeaderFormat.
+    The sequence is packed as a signed delta from the ack base, as the ack base must be read before the format is known.
+    The ack mask is inverted, so that it is zero (and is trimmed to nothing) unless sequences were lost.
+
+    The protocol and length of each packet are packed together as a varint
+    """
+
+    mask_length_bits = 5
+    flags_bits = 2
+
+    delta_continues = 1 << (mask_length_bits + flags_bits)
+
+    # Protocols which do not fit in the packet header are packed after it
+    protocol_bits = 4
+    protocol_escape = (1 << protocol_bits) - 1
+
+    def __init__(self, ack_window=32, sequence_bits=16, has_flags=False):
+        super().__init__(ack_window, sequence_bits, has_flags)
+
+        self.sequence_modulus = 1 << sequence_bits
+
+        # Largest header size, for a delta of any size, a full ack mask, and the high bits of an extended ack base
+        delta_bits = sequence_bits + 1 - 8
+        self.size = 2 + self.word_size + -(-delta_bits // 7) + self.ack_mask_size
+        if self.extended:
+            self.size += 3
+
+    def pack(self, sequence, ack_base, ack_mask, flags=0):
+        delta = (sequence - ack_base) % self.sequence_modulus
+        if delta >= self.sequence_modulus >> 1:
+            delta -= self.sequence_modulus
+
+        delta = ZigZagCodec.encode(delta)
+
+        lost_mask = ~ack_mask & self.full_ack_mask
+        mask_length = (lost_mask.bit_length() + 7) // 8
+
+        control = mask_length
+        if self.has_flags:
+            control |= flags << self.mask_length_bits
+        if delta > 0xFF:
+            control |= self.delta_continues
+
+        data = [bytes((control, delta & 0xFF)), self.word_handler.pack(ack_base & 0xFFFF)]
+
+        if self.extended:
+            data.append(VarIntCodec.encode(ack_base >> 16))
+
+        if delta > 0xFF:
+            data.append(VarIntCodec.encode(delta >> 8))
+
+        data.append(lost_mask.to_bytes(mask_length, "big"))
+        return b''.join(data)
+
+    def unpack_from(self, bytes_string, offset=0):
+        decode = VarIntCodec.decode
+
+        control = bytes_string[offset]
+        delta = bytes_string[offset + 1]
+        ack_base, _ = self.word_handler.unpack_from(bytes_string, offset + 2)
+        offset += 2 + self.word_size
+
+        if self.extended:
+            ack_base_high, size = decode(bytes_string, offset)
+            ack_base |= ack_base_high << 16
+            offset += size
+
+        if control & self.delta_continues:
+            delta_high, size = decode(bytes_string, offset)
+            delta |= delta_high << 8
+            offset += size
+
+        mask_end = offset + (control & ((1 << self.mask_length_bits) - 1))
+        lost_mask = int.from_bytes(bytes_string[offset: mask_end], "big")
+        ack_mask = ~lost_mask & self.full_ack_mask
+
+        sequence = (ack_base + ZigZagCodec.decode(delta)) % self.sequence_modulus
+
+        # Flag bits are unused unless the format has flags
+        if self.has_flags:
+            flags = (control >> self.mask_length_bits) & ((1 << self.flags_bits) - 1)
+
+        else:
+            flags = 0
+
+        return sequence, ack_base, ack_mask, flags, mask_end
+
+    def pack_packets(self, members):
+        encode = VarIntCodec.encode
+        protocol_bits = self.protocol_bits
+        protocol_escape = self.protocol_escape
+        data = []
+
+        for packet in members:
+            protocol = packet.protocol
+            payload = packet.payload
+
+            if protocol < protocol_escape:
+                data.append(encode((len(payload) << protocol_bits) | protocol))
+
+            else:
+                data.append(encode((len(payload) << protocol_bits) | protocol_escape))
+                data.append(encode(protocol))
+
+            data.append(payload)
+
+        return b''.join(data)
+
+    def unpack_packets(self, bytes_string, offset=0):
+        decode = VarIntCodec.decode
+        protocol_bits = self.protocol_bits
+        protocol_escape = self.protocol_escape
+
+        members = []
+        end_offset = len(bytes_string)
+
+        while offset < end_offset:
+            header, size = decode(bytes_string, offset)
+            offset += size
+
+            protocol = header & protocol_escape
+            if protocol == protocol_escape:
+                protocol, size = decode(bytes_string, offset)
+                offset += size
+
+            payload_end = offset + (header >> protocol_bits)
+            members.append(Packet(protocol=protocol, payload=bytes_string[offset: payload_end]))
+            offset = payload_end
+
+        return PacketCollection(members)
+
+
+class ReceivedWindow:
+    """Record of recently received sequences.
+
+    Bit N of the ack mask is set if the sequence (N + 1) before the latest received sequence was received.
+    A gap is detected when a received sequence is newer than the sequence after the latest sequence
+    """
+
+    __slots__ = ("window_size", "sequence_max_size", "latest_sequence", "ack_mask", "gap_detected", "_full_mask",
+                 "_half_sequence", "_received_any")
+
+    def __init__(self, window_size, sequence_max_size):
+        self.window_size = window_size
+        self.sequence_max_size = sequence_max_size
+
+        self.latest_sequence = 0
+        self.ack_mask = 0
+
+        # Whether the last received sequence skipped sequences
+        self.gap_detected = False
+
+        self._full_mask = (1 << window_size) - 1
+        self._half_sequence = (sequence_max_size + 1) // 2
+        self._received_any = False
+
+    def resize(self, window_size, sequence_max_size):
+        """Change size of window and sequence space.
+
+        Received sequences are retained
+
+        :param window_size: new window size
+        :param sequence_max_size: new maximum sequence value
+        """
+        self.window_size = window_size
+        self.sequence_max_size = sequence_max_size
+
+        self._full_mask = (1 << window_size) - 1
+        self._half_sequence = (sequence_max_size + 1) // 2
+
+        self.ack_mask &= self._full_mask
+
+    def receive(self, sequence):
+        """Record that a sequence was received
+
+        :param sequence: received sequence
+        :returns: False if the sequence was already received, or is too old to record
+        """
+        self.gap_detected = False
+
+        if not self._received_any:
+            self._received_any = True
+            self.latest_sequence = sequence
+            return True
+
+        distance = (sequence - self.latest_sequence) % (self.sequence_max_size + 1)
+
+        # Duplicate of latest sequence
+        if not distance:
+            return False
+
+        # Newer sequence, shift window along
+        if distance < self._half_sequence:
+            self.gap_detected = distance > 1
+
+            if distance > self.window_size:
+                self.ack_mask = 0
+
+            else:
+                self.ack_mask = ((self.ack_mask << distance) | (1 << (distance - 1))) & self._full_mask
+
+            self.latest_sequence = sequence
+            return True
+
+        # Older sequence, within window
+        age = (self.sequence_max_size + 1) - distance
+        if age > self.window_size:
+            return False
+
+        bit = 1 << (age - 1)
+        if self.ack_mask & bit:
+            return False
+
+        self.ack_mask |= bit
+        return True
+
+
+class SentWindow:
+    """Ring buffer of sent sequences awaiting acknowledgement.
+
+    Entries which are not acknowledged before falling out of the ack window are considered dropped.
+    Entries which are marked as retransmitted remain in the window until acknowledged or dropped, so that spurious
+    retransmissions can be detected
+    """
+
+    def __init__(self, window_size, sequence_max_size, capacity=None):
+        if capacity is None:
+            capacity = 4 * window_size
+
+        self.window_size = window_size
+        self.sequence_max_size = sequence_max_size
+        self.capacity = capacity
+
+        self._sequences = [None] * capacity
+        self._entries = [None] * capacity
+        self._sent_times = [0.0] * capacity
+        self._retransmitted = [False] * capacity
+
+        self._oldest_sequence = None
+        self._latest_sequence = None
+        self._expiry_sequence = None
+        self._outstanding = 0
+
+    def __len__(self):
+        return self._outstanding
+
+    def __contains__(self, sequence):
+        return self._sequences[sequence % self.capacity] == sequence
+
+    def resize(self, window_size, sequence_max_size, capacity=None):
+        """Change size of window and sequence space.
+
+        Outstanding entries are retained
+
+        :param window_size: new window size
+        :param sequence_max_size: new maximum sequence value
+        :param capacity: new ring buffer capacity
+        """
+        if capacity is None:
+            capacity = 4 * window_size
+
+        outstanding = [(s, e, t, r) for s, e, t, r in zip(self._sequences, self._entries, self._sent_times,
+                                                           self._retransmitted) if s is not None]
+
+        self.window_size = window_size
+        self.sequence_max_size = sequence_max_size
+        self.capacity = capacity
+
+        self._sequences = [None] * capacity
+        self._entries = [None] * capacity
+        self._sent_times = [0.0] * capacity
+        self._retransmitted = [False] * capacity
+
+        for sequence, entry, sent_time, retransmitted in outstanding:
+            index = sequence % capacity
+            self._sequences[index] = sequence
+            self._entries[index] = entry
+            self._sent_times[index] = sent_time
+            self._retransmitted[index] = retransmitted
+
+    def _distance(self, newer, older):
+        return (newer - older) % (self.sequence_max_size + 1)
+
+    def _take(self, index):
+        entry = self._entries[index]
+
+        self._sequences[index] = None
+        self._entries[index] = None
+        self._outstanding -= 1
+
+        return entry
+
+    def _take_unless_retransmitted(self, index, dropped):
+        retransmitted = self._retransmitted[index]
+        entry = self._take(index)
+
+        if not retransmitted:
+            dropped.append(entry)
+
+    def add(self, sequence, entry, sent_time=0.0):
+        """Store entry for sent sequence
+
+        :param sequence: sent sequence
+        :param entry: data to return when sequence is acknowledged or dropped
+        :param sent_time: time sequence was sent
+        :returns: list of entries evicted from the ring buffer, which are considered dropped
+        """
+        evicted = []
+
+        if self._oldest_sequence is None:
+            self._oldest_sequence = self._expiry_sequence = sequence
+
+        # Advance oldest sequence to make room
+        else:
+            while self._distance(sequence, self._oldest_sequence) >= self.capacity:
+                oldest_sequence = self._oldest_sequence
+                index = oldest_sequence % self.capacity
+
+                if self._sequences[index] == oldest_sequence:
+                    self._take_unless_retransmitted(index, evicted)
+
+                self._oldest_sequence = (oldest_sequence + 1) % (self.sequence_max_size + 1)
+
+        index = sequence % self.capacity
+        self._sequences[index] = sequence
+        self._entries[index] = entry
+        self._sent_times[index] = sent_time
+        self._retransmitted[index] = False
+        self._outstanding += 1
+
+        self._latest_sequence = sequence
+
+        return evicted
+
+    def acknowledge(self, ack_base, ack_mask):
+        """Remove acknowledged entries
+
+        :param ack_base: latest sequence received by peer
+        :param ack_mask: mask of sequences received before ack_base
+        :returns: list of (sequence, entry, sent time, retransmitted) tuples
+        """
+        sequences = self._sequences
+        sent_times = self._sent_times
+        retransmitted = self._retransmitted
+        capacity = self.capacity
+        sequence_range = self.sequence_max_size + 1
+
+        acknowledged = []
+
+        index = ack_base % capacity
+        if sequences[index] == ack_base:
+            acknowledged.append((ack_base, self._take(index), sent_times[index], retransmitted[index]))
+
+        # Visit only the set bits
+        while ack_mask:
+            lowest_bit = ack_mask & -ack_mask
+            ack_mask ^= lowest_bit
+
+            sequence = (ack_base - lowest_bit.bit_length()) % sequence_range
+            index = sequence % capacity
+
+            if sequences[index] == sequence:
+                acknowledged.append((sequence, self._take(index), sent_times[index], retransmitted[index]))
+
+        return acknowledged
+
+    def take_dropped(self, ack_base):
+        """Remove entries which have fallen out of the ack window of ack_base.
+
+        Entries which were marked as retransmitted are removed, but not returned
+
+        :param ack_base: latest sequence received by peer
+        :returns: list of dropped entries
+        """
+        dropped = []
+
+        if not self._outstanding:
+            return dropped
+
+        # Ignore stale acknowledgements
+        if self._distance(self._latest_sequence, ack_base) > self._distance(self._latest_sequence,
+                                                                             self._oldest_sequence):
+            return dropped
+
+        sequences = self._sequences
+        capacity = self.capacity
+        window_size = self.window_size
+        sequence_range = self.sequence_max_size + 1
+
+        oldest_sequence = self._oldest_sequence
+        while self._distance(ack_base, oldest_sequence) >= window_size:
+            index = oldest_sequence % capacity
+
+            if sequences[index] == oldest_sequence:
+                self._take_unless_retransmitted(index, dropped)
+
+            if oldest_sequence == self._latest_sequence:
+                break
+
+            oldest_sequence = (oldest_sequence + 1) % sequence_range
+
+        self._oldest_sequence = oldest_sequence
+        return dropped
+
+    def find_expired(self, deadline):
+        """Find entries which were sent before a deadline, and have not yet been returned by this method
+
+        :param deadline: latest send time of expired entries
+        :returns: list of (sequence, entry, sent time) tuples
+        """
+        expired = []
+
+        if self._latest_sequence is None:
+            return expired
+
+        sequences = self._sequences
+        sent_times = self._sent_times
+        capacity = self.capacity
+        sequence_range = self.sequence_max_size + 1
+
+        latest_sequence = self._latest_sequence
+        sequence = self._expiry_sequence
+
+        # Entries older than the oldest sequence were already removed
+        if self._distance(latest_sequence, sequence) > self._distance(latest_sequence, self._oldest_sequence):
+            sequence = self._oldest_sequence
+
+        # Entries are visited in the order they were sent
+        remaining = self._distance(latest_sequence, sequence) + 1
+        while remaining:
+            index = sequence % capacity
+
+            if sequences[index] == sequence:
+                if sent_times[index] > deadline:
+                    break
+
+                expired.append((sequence, self._entries[index], sent_times[index]))
+
+            sequence = (sequence + 1) % sequence_range
+            remaining -= 1
+
+        self._expiry_sequence = sequence
+        return expired
+
+    def mark_retransmitted(self, sequence):
+        """Mark entry as retransmitted, so that it is not returned when dropped
+
+        :param sequence: sent sequence
+        """
+        index = sequence % self.capacity
+
+        if self._sequences[index] == sequence:
+            self._retransmitted[index] = True
+
+
+class RetransmissionTimer:
+    """Retransmission timeout estimator, following RFC 6298.
+
+    The minimum timeout is lower than the 1 second recommended by the RFC, as is usual for real-time protocols
+    """
+
+    alpha = 1 / 8
+    beta = 1 / 4
+    k = 4
+
+    def __init__(self, initial_timeout=1.0, minimum_timeout=0.1, maximum_timeout=60.0, clock_granularity=0.02):
+        self.initial_timeout = initial_timeout
+        self.minimum_timeout = minimum_timeout
+        self.maximum_timeout = maximum_timeout
+        self.clock_granularity = clock_granularity
+
+        self.smoothed_rtt = None
+        self.rtt_variance = None
+        self.timeout = initial_timeout
+
+    def on_sample(self, round_trip_time):
+        """Update estimate with a measured round trip time
+
+        :param round_trip_time: measured round trip time
+        """
+        if self.smoothed_rtt is None:
+            self.smoothed_rtt = round_trip_time
+            self.rtt_variance = round_trip_time / 2
+
+        else:
+            self.rtt_variance += self.beta * (abs(self.smoothed_rtt - round_trip_time) - self.rtt_variance)
+            self.smoothed_rtt += self.alpha * (round_trip_time - self.smoothed_rtt)
+
+        timeout = self.smoothed_rtt + max(self.clock_granularity, self.k * self.rtt_variance)
+        self.timeout = min(max(timeout, self.minimum_timeout), self.maximum_timeout)
+
+    def on_expired(self):
+        """Back off timeout after retransmission"""
+        self.timeout = min(self.timeout * 2, self.maximum_timeout)
+
+
+class ReliabilityMetrics:
+    """Metrics object for reliable delivery of a connection"""
+
+    def __init__(self):
+        self.timeouts = 0
+        self.dropped_packets = 0
+        self.retransmitted_members = 0
+        self.spurious_retransmits = 0
+
+        self.last_retransmit_time = None
+        self.last_retransmit_delay = None
+
+    def on_timeout(self, retransmitted_members, sent_time, current_time):
+        """Update metrics for packet retransmitted after a timeout
+
+        :param retransmitted_members: number of reliable members resent
+        :param sent_time: time packet was sent
+        :param current_time: time of retransmission
+        """
+        self.timeouts += 1
+        self.retransmitted_members += retransmitted_members
+        self.last_retransmit_time = current_time
+        self.last_retransmit_delay = current_time - sent_time
+
+    def on_dropped(self, retransmitted_members):
+        """Update metrics for packet which fell out of the ack window
+
+        :param retransmitted_members: number of reliable members resent
+        """
+        self.dropped_packets += 1
+        self.retransmitted_members += retransmitted_members
+
+    def on_spurious_retransmit(self):
+        """Update metrics for packet acknowledged after it was retransmitted"""
+        self.spurious_retransmits += 1
@@ -18,6 +18,9 @@ class Replicable(metaclass=ReplicableRegister):
     _MAXIMUM_REPLICABLES = 255
     _by_types = defaultdict(list)
 
+    # Pack attributes at bit granularity instead of byte aligned, if the layout saves enough (see BitCodec.min_saving)
+    use_bit_packing = False
+
     roles = Attribute(Roles(Roles.authority, Roles.none), notify=True)
     owner = Attribute(type_of=None, complain=True, notify=True)
     torn_off = Attribute(False, complain=True, notify=True)
@@ -1,7 +1,9 @@
+from .conditions import is_reliable, is_urgent
 from .descriptors import FromClass
 from .flag_serialiser import FlagSerialiser
 from .type_flag import TypeFlag
 from .logger import logger
+from .signals import ReliableRPCSignal, UrgentRPCSignal
 
 from collections import OrderedDict
 from copy import deepcopy
@@ -37,6 +39,11 @@ class RPCInterface:
         # Get the function signature
         self.target = self._function_signature.return_annotation
 
+        # Urgent calls are sent immediately by the connection of their replicable, and reliable calls with its next send
+        self._replicable = function.__self__
+        self._is_urgent = is_urgent(function)
+        self._is_reliable = is_reliable(function)
+
         # Interface between data and bytes
         self._binder = self._function_signature.bind
 
@@ -62,16 +69,24 @@ class RPCInterface:
         except Exception:
             logger.exception("Could not package RPC call: '{}'".format(self._function_name))
 
+        else:
+            if self._is_urgent:
+                UrgentRPCSignal.invoke(target=self._replicable.uppermost)
+
+            elif self._is_reliable:
+                ReliableRPCSignal.invoke(target=self._replicable.uppermost)
+
     def __repr__(self):
         return "<RPC Interface {}>".format(self._function_name)
 
-    def execute(self, bytes_string):
+    def execute(self, bytes_string, offset=0):
         """Execute RPC from bytes_string
         :param bytes_string: Byte stream of RPC call data
+        :param offset: offset of RPC call data
         """
         # Unpack RPC
         try:
-            unpacked_data = self._serialiser.unpack(bytes_string)
+            unpacked_data = self._serialiser.unpack(bytes_string, offset=offset)
             self._function_call(**dict(unpacked_data))
 
         except Exception:
@@ -1,11 +1,18 @@
 from math import ceil
 from struct import Struct, pack, unpack_from
 
+from ..encoding import VarIntCodec, ZigZagCodec
 from ..handlers import register_handler
 
 __all__ = ['UInt16', 'UInt32', 'UInt64', 'UInt8', 'Float32', 'Float64', 'bits_to_bytes', 'handler_from_bit_length',
            'handler_from_int', 'handler_from_byte_length', 'string_handler_builder', 'build_bytes_handler',
-           'int_selector', 'next_or_equal_power_of_two', 'BoolHandler', 'Int8', 'Int16', 'Int32', 'Int64']
+           'int_selector', 'next_or_equal_power_of_two', 'BoolHandler', 'Int8', 'Int16', 'Int32', 'Int64',
+           'QuantizedFloatHandler', 'VarIntHandler', 'ZigZagHandler']
+
+
+_encode_varint, _decode_varint = VarIntCodec.encode, VarIntCodec.decode
+_encode_varints, _decode_varints = VarIntCodec.encode_multiple, VarIntCodec.decode_multiple
+_encode_zigzag, _decode_zigzag = ZigZagCodec.encode, ZigZagCodec.decode
 
 
 def build_function(function_string, locals_dict):
@@ -35,7 +42,7 @@ def build_struct_handler(name, character_format, order_format="!"):
     :param character_format: format string of handler
     :param order_format: format string of byte order
     """
-    cls_dict = {}
+    cls_dict = {'character_format': character_format, 'order_format': order_format}
 
     struct_obj = Struct(order_format + character_format)
     format_size = struct_obj.size
@@ -101,11 +108,96 @@ def next_or_equal_power_of_two(value):
     return value + 1
 
 
+class QuantizedFloatHandler:
+    """Handler for floats quantized to a number of bits over a bounded range.
+
+    Values outside the range are clamped. Also provides the bit handler interface
+    """
+
+    def __init__(self, type_flag):
+        data = type_flag.data
+
+        try:
+            self.minimum, self.maximum, self.bits = data["min"], data["max"], data["bits"]
+
+        except KeyError as err:
+            raise TypeError("Quantized float requires min, max and bits") from err
+
+        if self.maximum <= self.minimum:
+            raise ValueError("Quantized float range is empty: {} to {}".format(self.minimum, self.maximum))
+
+        self.steps = (1 << self.bits) - 1
+        self.step_size = (self.maximum - self.minimum) / self.steps
+        self.packer = handler_from_bit_length(self.bits)
+
+    def quantize_int(self, value):
+        """Return integer step nearest to value
+
+        :param value: float value
+        """
+        if value <= self.minimum:
+            return 0
+
+        if value >= self.maximum:
+            return self.steps
+
+        return round((value - self.minimum) / self.step_size)
+
+    def dequantize_int(self, step):
+        """Return float value of integer step
+
+        :param step: integer step
+        """
+        return self.minimum + step * self.step_size
+
+    def contains(self, value):
+        """Return True if value is within the quantized range
+
+        :param value: float value
+        """
+        return self.minimum <= value <= self.maximum
+
+    def quantize(self, value):
+        """Return value as it will be unpacked
+
+        :param value: float value
+        """
+        return self.dequantize_int(self.quantize_int(value))
+
+    def pack(self, value):
+        return self.packer.pack(self.quantize_int(value))
+
+    def pack_multiple(self, values, count):
+        quantize_int = self.quantize_int
+        return self.packer.pack_multiple([quantize_int(v) for v in values], count)
+
+    def unpack_from(self, bytes_string, offset=0):
+        step, step_size = self.packer.unpack_from(bytes_string, offset)
+        return self.dequantize_int(step), step_size
+
+    def unpack_multiple(self, bytes_string, count, offset=0):
+        steps, steps_size = self.packer.unpack_multiple(bytes_string, count, offset)
+        dequantize_int = self.dequantize_int
+        return [dequantize_int(s) for s in steps], steps_size
+
+    def size(self, bytes_string=None):
+        return self.packer.size()
+
+    def write(self, writer, value):
+        writer.write(self.quantize_int(value), self.bits)
+
+    def read(self, reader):
+        return self.dequantize_int(reader.read(self.bits))
+
+
 def float_selector(type_flag):
     """Return the correct float handler using meta information from a given type_flag
 
     :param type_flag: type flag for float value
     """
+    if "bits" in type_flag.data:
+        return QuantizedFloatHandler(type_flag)
+
     return Float64 if type_flag.data.get("max_precision") else Float32
 
 
@@ -143,11 +235,69 @@ def handler_from_int(value):
     return handler_from_bit_length(value.bit_length())
 
 
+class VarIntHandler:
+    """Handler for unsigned integers of any size, packed as LEB128 varints by
+    :py:class:`network.encoding.VarIntCodec`.
+
+    Each byte holds seven bits of the value, least significant first, and the high bit is set if more bytes follow
+    """
+
+    pack = staticmethod(VarIntCodec.encode)
+    unpack_from = staticmethod(VarIntCodec.decode)
+
+    @staticmethod
+    def pack_multiple(values, count):
+        return _encode_varints(values)
+
+    unpack_multiple = staticmethod(VarIntCodec.decode_multiple)
+
+    @staticmethod
+    def size(bytes_string):
+        return _decode_varint(bytes_string)[1]
+
+
+class ZigZagHandler(VarIntHandler):
+    """Handler for signed integers of any size, zigzag encoded by :py:class:`network.encoding.ZigZagCodec` as LEB128
+    varints.
+
+    Values of small magnitude pack to few bytes, whatever their sign
+    """
+
+    @staticmethod
+    def pack(value):
+        return _encode_varint(_encode_zigzag(value))
+
+    @staticmethod
+    def pack_multiple(values, count):
+        return _encode_varints([_encode_zigzag(v) for v in values])
+
+    @staticmethod
+    def unpack_from(bytes_string, offset=0):
+        value, value_size = _decode_varint(bytes_string, offset)
+        return _decode_zigzag(value), value_size
+
+    @staticmethod
+    def unpack_multiple(bytes_string, count, offset=0):
+        values, values_size = _decode_varints(bytes_string, count, offset)
+        return [_decode_zigzag(v) for v in values], values_size
+
+
+int_encodings = {"varint": VarIntHandler, "zigzag": ZigZagHandler}
+
+
 def int_selector(type_flag):
     """Return the correct integer handler using meta information from a given type_flag
 
     :param type_flag: type flag for integer value
     """
+    encoding = type_flag.data.get("encoding")
+    if encoding is not None:
+        try:
+            return int_encodings[encoding]
+
+        except KeyError as err:
+            raise ValueError("Unknown integer encoding: {}".format(encoding)) from err
+
     if "max_value" in type_flag.data:
         return handler_from_int(type_flag.data["max_value"])
 
@@ -179,7 +329,7 @@ def build_bytes_handler(type_flag):
     methods = ("""def unpack_from(bytes_string, offset=0, *, unpacker=packer.unpack_from):\n\t"""
                """length, length_size = unpacker(bytes_string, offset)\n\t"""
                """end_index = length + length_size\n\t"""
-               """value = bytes_string[length_size + offset: end_index + offset]\n\t"""
+               """value = bytes(bytes_string[length_size + offset: end_index + offset])\n\t"""
                """return value, end_index""",
                """def pack_multiple(value, count, pack_lengths=packer.pack_multiple):\n\t"""
                """lengths = [len(x) for x in value]\n\tpacked_lengths = pack_lengths(lengths, len(lengths))\n\t"""
@@ -187,7 +337,7 @@ def build_bytes_handler(type_flag):
                """def unpack_multiple(bytes_string, count, offset=0, unpack_lengths=packer.unpack_multiple, """
                """unpack_from=unpack_from):\n\t_offset=offset\n\tlengths, length_offset=unpack_lengths(bytes_string, """
                """count, offset)\n\toffset += length_offset\n\tdata = []\n\tfor length in lengths:\n\t\t"""
-               """data.append(bytes_string[offset: offset+length])\n\t\toffset += length\n\t"""
+               """data.append(bytes(bytes_string[offset: offset+length]))\n\t\toffset += length\n\t"""
                """return data, offset - _offset""",
                """def size(bytes_string, unpacker=packer.unpack_from):\n\t"""
                """length, length_size = unpacker(bytes_string)\n\treturn length + length_size""",
@@ -216,7 +366,7 @@ def string_handler_builder(type_flag):
                 length, length_size = unpacker(bytes_string, offset)\n\t
                 end_index = length + length_size\n\t
                 value = bytes_string[length_size + offset: end_index + offset]\n\t
-                return value.decode(), end_index""",
+                return str(value, "utf-8"), end_index""",
                """def pack(string_, packer=packer.pack):\n\treturn packer(len(string_)) + string_.encode()""",
                """def pack_multiple(value, count, pack_lengths=packer.pack_multiple):\n\t"""
                """lengths = [len(x) for x in value]\n\tpacked_lengths = pack_lengths(lengths, len(lengths))\n\t"""
@@ -224,7 +374,7 @@ def string_handler_builder(type_flag):
                """def unpack_multiple(bytes_string, count, offset=0, unpack_lengths=packer.unpack_multiple, """
                """unpack_from=unpack_from):\n\t_offset=offset\n\tlengths, length_offset=unpack_lengths(bytes_string, count, offset)\n\t"""
                """offset += length_offset\n\tdata = []\n\tfor length in lengths:\n\t\t"""
-               """data.append(bytes_string[offset: offset+length].decode())\n\t\toffset += length\n\treturn data, offset - _offset""",)
+               """data.append(str(bytes_string[offset: offset+length], "utf-8"))\n\t\toffset += length\n\treturn data, offset - _offset""",)
 
     register_string = """local_dict = dict();local_dict=locals().copy()\n{}\nfunc_name = next(iter(set(locals())
                          .difference(local_dict)));cls_dict[func_name] = locals()[func_name]"""
@@ -7,7 +7,7 @@ from ..metaclasses.register import TypeRegister
 
 __all__ = ['Signal', 'ReplicableRegisteredSignal', 'ReplicableUnregisteredSignal', 'ConnectionErrorSignal',
            'ConnectionSuccessSignal', 'SignalValue',  'DisconnectSignal', 'ConnectionDeletedSignal',
-           'LatencyUpdatedSignal', 'ConnectionTimeoutSignal']
+           'LatencyUpdatedSignal', 'ConnectionTimeoutSignal', 'UrgentRPCSignal', 'ReliableRPCSignal']
 
 
 class Signal(metaclass=TypeRegister):
@@ -376,4 +376,12 @@ class ConnectionDeletedSignal(Signal):
 
 
 class LatencyUpdatedSignal(Signal):
-    pass
\ No newline at end of file
+    pass
+
+
+class UrgentRPCSignal(Signal):
+    pass
+
+
+class ReliableRPCSignal(Signal):
+    pass
@@ -1,5 +1,6 @@
+from .backends import DatagramBackend
 from .replicable import Replicable
-from .network import Network
+from .network import Network, NonBlockingSocketUDP
 from .connection import Connection
 from .world_info import WorldInfo
 from .signals import Signal
@@ -13,8 +14,8 @@ class SimpleNetwork(Network):
 
     """Simple network update loop"""
 
-    def __init__(self, address, port):
-        super().__init__(address, port)
+    def __init__(self, address, port, backend=DatagramBackend, socket_factory=NonBlockingSocketUDP):
+        super().__init__(address, port, backend, socket_factory)
 
         self.on_initialised = None
         self.on_finished = None
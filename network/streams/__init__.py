@@ -1,3 +1,5 @@
+from .fragments import *
+from .lanes import *
 from .latency_calculator import *
 from .handshake import *
 from .replication import *
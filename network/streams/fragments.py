@@ -0,0 +1,244 @@
+from ..enums import ConnectionProtocols
+from ..handlers import get_handler
+from ..logger import logger
+from ..packet import Packet, PacketCollection
+from ..type_flag import TypeFlag
+
+from collections import deque, OrderedDict
+from functools import partial
+from time import clock
+
+__all__ = 'FragmentStream',
+
+
+class _OutgoingMessage:
+    """Packet being sent in fragments"""
+
+    __slots__ = "message_id", "packet", "payload", "fragment_count", "next_index", "acknowledged", "unacknowledged"
+
+    def __init__(self, message_id, packet, fragment_data_size):
+        self.message_id = message_id
+        self.packet = packet
+        self.payload = memoryview(packet.payload)
+
+        self.fragment_count = -(-len(self.payload) // fragment_data_size)
+        self.next_index = 0
+
+        self.acknowledged = bytearray(self.fragment_count)
+        self.unacknowledged = self.fragment_count
+
+
+class _IncomingMessage:
+    """Packet being reassembled from fragments"""
+
+    __slots__ = "protocol", "fragments", "remaining", "size", "last_received_time"
+
+    def __init__(self, protocol, fragment_count):
+        self.protocol = protocol
+        self.fragments = [None] * fragment_count
+        self.remaining = fragment_count
+        self.size = 0
+        self.last_received_time = 0.0
+
+
+class FragmentStream:
+    """Sends packets which are too large for a datagram as reliable fragments, and reassembles received fragments.
+
+    Fragments are acknowledged individually by the connection, so only lost fragments are resent.
+    Incomplete messages are discarded after reassembly_timeout, or (least recently received first) when the total size
+    of incomplete messages would exceed max_reassembly_size
+    """
+
+    # Largest payload sent without fragmentation, including that of fragments
+    fragment_size = 1024
+
+    # Bounds on incomplete received messages
+    max_reassembly_size = 4 * 1024 * 1024
+    reassembly_timeout = 10.0
+
+    # Number of completed message IDs remembered, to ignore resent fragments
+    completed_history = 64
+
+    def __init__(self, dispatcher):
+        self.dispatcher = dispatcher
+
+        self.id_packer = get_handler(TypeFlag(int, max_value=2 ** 16 - 1))
+        self.index_packer = get_handler(TypeFlag(int, max_value=2 ** 32 - 1))
+        self.protocol_packer = Packet.protocol_handler
+
+        # Size of message data in each fragment
+        header_size = self.id_packer.size() + 2 * self.index_packer.size() + self.protocol_packer.size()
+        self.fragment_data_size = self.fragment_size - header_size
+
+        self._next_message_id = 0
+        self._outgoing = deque()
+
+        self._incoming = OrderedDict()
+        self._incoming_size = 0
+        self._completed_ids = deque(maxlen=self.completed_history)
+
+    def is_oversized(self, packet):
+        return len(packet.payload) > self.fragment_size
+
+    def divert_oversized(self, members):
+        """Queue oversized packets to be sent as fragments, and return the remaining packets
+
+        :param members: packets to send
+        """
+        if not any([self.is_oversized(m) for m in members]):
+            return members
+
+        remaining = []
+
+        for member in members:
+            if not self.is_oversized(member):
+                remaining.append(member)
+                continue
+
+            message = _OutgoingMessage(self._next_message_id, member, self.fragment_data_size)
+            self._next_message_id = (self._next_message_id + 1) & 0xFFFF
+
+            self._outgoing.append(message)
+
+        return remaining
+
+    def handle_packets(self, packet_collection):
+        fragment_protocol = ConnectionProtocols.fragment
+
+        for packet in packet_collection:
+            if packet.protocol == fragment_protocol:
+                self.handle_fragment(packet.payload)
+
+    def handle_fragment(self, data):
+        """Store received fragment, and dispatch its message once complete
+
+        :param data: fragment payload
+        """
+        message_id, offset = self.id_packer.unpack_from(data)
+        fragment_count, count_size = self.index_packer.unpack_from(data, offset)
+        offset += count_size
+        index, index_size = self.index_packer.unpack_from(data, offset)
+        offset += index_size
+        protocol, protocol_size = self.protocol_packer.unpack_from(data, offset)
+        offset += protocol_size
+
+        # Resent fragment of a completed message
+        if message_id in self._completed_ids:
+            return
+
+        try:
+            message = self._incoming[message_id]
+
+        except KeyError:
+            if fragment_count * self.fragment_data_size > self.max_reassembly_size:
+                logger.error("Discarding fragmented message of {} fragments, which exceeds the reassembly limit"
+                             .format(fragment_count))
+                return
+
+            message = self._incoming[message_id] = _IncomingMessage(protocol, fragment_count)
+
+        if index >= len(message.fragments) or message.fragments[index] is not None:
+            return
+
+        # Received payloads share memory with the receive buffer
+        fragment = bytes(data[offset:])
+        fragment_size = len(fragment)
+
+        self._discard_least_recent(self.max_reassembly_size - fragment_size, message_id)
+
+        message.fragments[index] = fragment
+        message.size += fragment_size
+        message.remaining -= 1
+        message.last_received_time = clock()
+
+        self._incoming_size += fragment_size
+        self._incoming.move_to_end(message_id)
+
+        if message.remaining:
+            return
+
+        self._discard(message_id)
+        self._completed_ids.append(message_id)
+
+        packet = Packet(protocol=message.protocol, payload=b''.join(message.fragments))
+        self.dispatcher.handle_packets(PacketCollection([packet]))
+
+    def pull_packets(self, network_tick, bandwidth):
+        self._discard_expired(clock() - self.reassembly_timeout)
+
+        if not self._outgoing:
+            return None
+
+        members = []
+
+        for message in self._outgoing:
+            while message.next_index < message.fragment_count and bandwidth > 0:
+                packet = self._create_fragment(message, message.next_index)
+                message.next_index += 1
+
+                bandwidth -= packet.size
+                members.append(packet)
+
+            if bandwidth <= 0:
+                break
+
+        if not members:
+            return None
+
+        return PacketCollection(members)
+
+    def _create_fragment(self, message, index):
+        start = index * self.fragment_data_size
+        data = message.payload[start: start + self.fragment_data_size]
+
+        header = self.id_packer.pack(message.message_id) + self.index_packer.pack(message.fragment_count) + \
+            self.index_packer.pack(index) + self.protocol_packer.pack(message.packet.protocol)
+
+        return Packet(protocol=ConnectionProtocols.fragment, payload=header + data.tobytes(),
+                      on_success=partial(self._on_fragment_acknowledged, message, index))
+
+    def _on_fragment_acknowledged(self, message, index, packet):
+        if message.acknowledged[index]:
+            return
+
+        message.acknowledged[index] = True
+        message.unacknowledged -= 1
+
+        if message.unacknowledged:
+            return
+
+        self._outgoing.remove(message)
+        message.packet.on_ack()
+
+    def _discard(self, message_id):
+        message = self._incoming.pop(message_id)
+        self._incoming_size -= message.size
+
+    def _discard_least_recent(self, max_size, keep_id):
+        """Discard least recently received messages until the total size of incomplete messages is within max_size
+
+        :param max_size: maximum total size
+        :param keep_id: ID of message to keep
+        """
+        for message_id in list(self._incoming):
+            if self._incoming_size <= max_size:
+                break
+
+            if message_id == keep_id:
+                continue
+
+            logger.error("Discarding incomplete fragmented message {}, reassembly limit exceeded".format(message_id))
+            self._discard(message_id)
+
+    def _discard_expired(self, deadline):
+        """Discard messages which have not received a fragment since deadline
+
+        :param deadline: time of oldest permitted fragment
+        """
+        while self._incoming:
+            message_id, message = next(iter(self._incoming.items()))
+            if message.last_received_time >= deadline:
+                break
+
+            logger.error("Discarding incomplete fragmented message {}, timed out".format(message_id))
+            self._discard(message_id)
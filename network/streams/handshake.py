@@ -1,6 +1,7 @@
 from .streams import ProtocolHandler, response_protocol, send_state, StatusDispatcher
 from .replication import ReplicationStream
 
+from ..cookies import HandshakeCookies
 from ..decorators import with_tag
 from ..errors import NetworkError
 from ..enums import ConnectionStatus, ConnectionProtocols, Netmodes
@@ -21,6 +22,9 @@ __all__ = 'HandshakeStream', 'ServerHandshakeStream', 'ClientHandshakeStream'
 class HandshakeStream(ProtocolHandler, StatusDispatcher, DelegateByNetmode):
     subclasses = {}
 
+    # Duration without received data after which the connection times out (overridden per netmode)
+    timeout_duration = 10.0
+
     def __init__(self, dispatcher):
         self.status = ConnectionStatus.pending
 
@@ -28,35 +32,66 @@ class HandshakeStream(ProtocolHandler, StatusDispatcher, DelegateByNetmode):
 
         self.connection_info = None
         self.remove_connection = None
+        self.replication_stream = None
 
-        self.timeout_duration = 3000.0
-        self._last_received_time = clock()
+        # Requested (client) or maximum (server) ack window size, sequence width, compression dictionary ID and whether
+        # compact headers are used
+        self.connection_settings = None
+        self.negotiate_settings = None
 
         # Additional data
         self.netmode_packer = get_handler(TypeFlag(int))
         self.string_packer = get_handler(TypeFlag(str))
+        self.settings_packer = get_handler(TypeFlag(int))
+        self.dictionary_id_packer = get_handler(TypeFlag(int, max_bits=32))
+
+    def pack_settings(self, ack_window, sequence_bits, dictionary_id, compact_headers):
+        pack = self.settings_packer.pack
+        data = pack(ack_window) + pack(sequence_bits) + pack(compact_headers)
+
+        # Compression is omitted unless used
+        if dictionary_id:
+            data += self.dictionary_id_packer.pack(dictionary_id)
+
+        return data
+
+    def unpack_settings(self, data, offset=0):
+        """Unpack ack window size, sequence width, compression dictionary ID and whether compact headers are used, if
+        included in data
+
+        :param data: packet payload
+        :param offset: offset of settings
+        """
+        if len(data) <= offset:
+            return None
+
+        unpack_from = self.settings_packer.unpack_from
+
+        ack_window, ack_window_size = unpack_from(data, offset)
+        offset += ack_window_size
+        sequence_bits, sequence_bits_size = unpack_from(data, offset)
+        offset += sequence_bits_size
+        compact_headers, compact_headers_size = unpack_from(data, offset)
+        offset += compact_headers_size
+
+        if len(data) > offset:
+            dictionary_id, _ = self.dictionary_id_packer.unpack_from(data, offset)
+
+        else:
+            dictionary_id = 0
 
-    @property
-    def timed_out(self):
-        return (clock() - self._last_received_time) > self.timeout_duration
+        return ack_window, sequence_bits, dictionary_id, bool(compact_headers)
 
     def on_timeout(self):
+        self.status = ConnectionStatus.timeout
+
         if callable(self.remove_connection):
             self.remove_connection()
 
         ConnectionTimeoutSignal.invoke(target=self)
-        self.replication_stream.on_disconnected()
-
-    def handle_packets(self, packet_collection):
-        super().handle_packets(packet_collection)
-
-        self._last_received_time = clock()
-
-    def pull_packets(self, network_tick, bandwidth):
-        if self.timed_out:
-            self.on_timeout()
 
-        return super().pull_packets(network_tick, bandwidth)
+        if self.replication_stream is not None:
+            self.replication_stream.on_disconnected()
 
 
 @with_tag(Netmodes.server)
@@ -67,7 +102,9 @@ class ServerHandshakeStream(HandshakeStream):
         super().__init__(dispatcher)
 
         self.handshake_error = None
-        self.replication_stream = None
+
+        # Adopted connection settings, if they changed
+        self.negotiated_settings = None
 
     def on_ack_handshake_failed(self, packet):
         self.status = ConnectionStatus.failed
@@ -78,6 +115,10 @@ class ServerHandshakeStream(HandshakeStream):
         ConnectionErrorSignal.invoke(target=self)
 
     def on_ack_handshake_success(self, packet):
+        # Handshake result may be sent more than once
+        if self.status != ConnectionStatus.handshake:
+            return
+
         self.status = ConnectionStatus.connected
 
         ConnectionSuccessSignal.invoke(target=self)
@@ -114,6 +155,26 @@ class ServerHandshakeStream(HandshakeStream):
         else:
             self.replication_stream = self.dispatcher.create_stream(ReplicationStream)
 
+            requested_settings = self.unpack_settings(data, netmode_size)
+            if requested_settings is not None and callable(self.negotiate_settings):
+                self.negotiated_settings = self.negotiate_settings(*requested_settings, switch_send_format=False)
+
+    def create_handshake_success(self):
+        if self.negotiated_settings is None:
+            payload = b''
+
+        else:
+            payload = self.pack_settings(*self.negotiated_settings)
+
+        return Packet(protocol=ConnectionProtocols.handshake_success, payload=payload,
+                      on_success=self.on_ack_handshake_success)
+
+    @send_state(ConnectionStatus.handshake)
+    def resend_handshake_success(self, network_tick, bandwidth):
+        # Every packet must carry the new settings until the client has adopted them
+        if self.handshake_error is None and self.negotiated_settings is not None:
+            return self.create_handshake_success()
+
     @send_state(ConnectionStatus.pending)
     def send_handshake_result(self, network_tick, bandwidth):
         connection_failed = self.handshake_error is not None
@@ -129,25 +190,64 @@ class ServerHandshakeStream(HandshakeStream):
                           on_success=self.on_ack_handshake_failed)
 
         else:
-            return Packet(protocol=ConnectionProtocols.handshake_success,
-                          on_success=self.on_ack_handshake_success)
+            return self.create_handshake_success()
 
 
 @with_tag(Netmodes.client)
 class ClientHandshakeStream(HandshakeStream):
 
+    # Tolerate longer interruptions, as the server is the only peer
+    timeout_duration = 20.0
+
+    def __init__(self, dispatcher):
+        super().__init__(dispatcher)
+
+        # Interval between handshake requests, until a response is received
+        self.request_retry_interval = 1.0
+        self._request_time = None
+
+        # Cookie echoed to server (a placeholder of equal size, until received)
+        self.handshake_cookie = bytes(HandshakeCookies.cookie_size)
+
     @send_state(ConnectionStatus.pending)
     def send_handshake_request(self, network_tick, bandwidth):
         self.status = ConnectionStatus.handshake
+        self._request_time = clock()
 
         netmode_data = self.netmode_packer.pack(WorldInfo.netmode)
-        return Packet(protocol=ConnectionProtocols.request_handshake, payload=netmode_data)
+
+        if self.connection_settings is not None:
+            netmode_data += self.pack_settings(*self.connection_settings)
+
+        cookie_packet = Packet(protocol=ConnectionProtocols.handshake_cookie, payload=self.handshake_cookie)
+        return cookie_packet + Packet(protocol=ConnectionProtocols.request_handshake, payload=netmode_data)
+
+    @send_state(ConnectionStatus.handshake)
+    def resend_handshake_request(self, network_tick, bandwidth):
+        # Request or response may have been lost
+        if clock() - self._request_time < self.request_retry_interval:
+            return None
+
+        return self.send_handshake_request(network_tick, bandwidth)
+
+    @response_protocol(ConnectionProtocols.handshake_cookie)
+    def receive_handshake_cookie(self, data):
+        if self.status != ConnectionStatus.handshake:
+            return
+
+        # Repeat request with cookie
+        self.handshake_cookie = bytes(data)
+        self.status = ConnectionStatus.pending
 
     @response_protocol(ConnectionProtocols.handshake_success)
     def receive_handshake_success(self, data):
         if self.status != ConnectionStatus.handshake:
             return
 
+        settings = self.unpack_settings(data)
+        if settings is not None and callable(self.negotiate_settings):
+            self.negotiate_settings(*settings, switch_send_format=True)
+
         self.status = ConnectionStatus.connected
         self.dispatcher.create_stream(ReplicationStream)
 
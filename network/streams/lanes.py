@@ -0,0 +1,215 @@
+from ..enums import ConnectionProtocols
+from ..handlers import get_handler
+from ..logger import logger
+from ..packet import Packet, PacketCollection
+from ..type_flag import TypeFlag
+
+from collections import deque
+from functools import partial
+from time import clock
+
+__all__ = 'OrderedLaneStream', 'LaneMetrics'
+
+
+class LaneMetrics:
+    """Metrics for the reorder buffer of a lane"""
+
+    def __init__(self):
+        self.buffered = 0
+        self.max_buffered = 0
+
+        # Periods during which received packets waited for a missing packet
+        self.stall_count = 0
+        self.stall_time = 0.0
+        self.last_stall_time = 0.0
+
+        self._stall_started = None
+
+    def on_buffered(self, buffered, current_time):
+        self.buffered = buffered
+        self.max_buffered = max(self.max_buffered, buffered)
+
+        if self._stall_started is None:
+            self._stall_started = current_time
+            self.stall_count += 1
+
+    def on_drained(self, current_time):
+        self.buffered = 0
+
+        if self._stall_started is None:
+            return
+
+        self.last_stall_time = current_time - self._stall_started
+        self.stall_time += self.last_stall_time
+        self._stall_started = None
+
+
+class _OutgoingLane:
+    """Packets waiting to be sent in a lane, and sequences awaiting acknowledgement"""
+
+    __slots__ = "queue", "next_sequence", "in_flight"
+
+    def __init__(self):
+        self.queue = deque()
+        self.next_sequence = 0
+
+        # [sequence, acknowledged] from the oldest unacknowledged sequence
+        self.in_flight = deque()
+
+
+class _IncomingLane:
+    """Reorder buffer of a lane"""
+
+    __slots__ = "expected_sequence", "buffer", "metrics"
+
+    def __init__(self):
+        self.expected_sequence = 0
+        self.buffer = {}
+        self.metrics = LaneMetrics()
+
+
+class OrderedLaneStream:
+    """Ordered reliable delivery of packets in numbered lanes.
+
+    Each lane has its own sequence and reorder buffer, so that a lost packet only delays later packets in its own lane.
+    At most lane_window packets of a lane are unacknowledged at once, which bounds the reorder buffer of the receiver.
+    Received packets are dispatched in order, with their original protocol
+    """
+
+    lane_count = 8
+    lane_window = 256
+
+    sequence_modulus = 2 ** 16
+
+    def __init__(self, dispatcher):
+        self.dispatcher = dispatcher
+
+        self.lane_packer = get_handler(TypeFlag(int, max_value=255))
+        self.sequence_packer = get_handler(TypeFlag(int, max_value=self.sequence_modulus - 1))
+        self.protocol_packer = Packet.protocol_handler
+
+        self._outgoing = [_OutgoingLane() for _ in range(self.lane_count)]
+        self._incoming = [_IncomingLane() for _ in range(self.lane_count)]
+
+    @property
+    def metrics(self):
+        """Reorder buffer metrics of each lane"""
+        return [lane.metrics for lane in self._incoming]
+
+    def queue_packet(self, lane, packet):
+        """Queue packet to be delivered in order with other packets of a lane
+
+        :param lane: lane number
+        :param packet: packet to send
+        """
+        self._outgoing[lane].queue.append(packet)
+
+        # Lane packets are delivered reliably
+        schedule_send = self.dispatcher.schedule_send
+        if callable(schedule_send):
+            schedule_send()
+
+    def pull_packets(self, network_tick, bandwidth):
+        members = []
+
+        for lane_id, lane in enumerate(self._outgoing):
+            queue = lane.queue
+
+            while queue and bandwidth > 0 and len(lane.in_flight) < self.lane_window:
+                packet = self._create_lane_packet(lane_id, lane, queue.popleft())
+
+                bandwidth -= packet.size
+                members.append(packet)
+
+        if not members:
+            return None
+
+        return PacketCollection(members)
+
+    def _create_lane_packet(self, lane_id, lane, packet):
+        sequence = lane.next_sequence
+        lane.next_sequence = (sequence + 1) % self.sequence_modulus
+
+        entry = [sequence, False]
+        lane.in_flight.append(entry)
+
+        header = self.lane_packer.pack(lane_id) + self.sequence_packer.pack(sequence) + \
+            self.protocol_packer.pack(packet.protocol)
+
+        return Packet(protocol=ConnectionProtocols.ordered, payload=header + packet.payload,
+                      on_success=partial(self._on_acknowledged, lane, entry, packet))
+
+    def _on_acknowledged(self, lane, entry, packet, lane_packet):
+        if entry[1]:
+            return
+
+        entry[1] = True
+
+        # Advance window past acknowledged sequences
+        in_flight = lane.in_flight
+        while in_flight and in_flight[0][1]:
+            in_flight.popleft()
+
+        packet.on_ack()
+
+    def handle_packets(self, packet_collection):
+        ordered_protocol = ConnectionProtocols.ordered
+
+        for packet in packet_collection:
+            if packet.protocol == ordered_protocol:
+                self.handle_lane_packet(packet.payload)
+
+    def handle_lane_packet(self, data):
+        """Buffer received packet, and dispatch packets of its lane which are now in order
+
+        :param data: lane packet payload
+        """
+        lane_id, offset = self.lane_packer.unpack_from(data)
+        sequence, sequence_size = self.sequence_packer.unpack_from(data, offset)
+        offset += sequence_size
+        protocol, protocol_size = self.protocol_packer.unpack_from(data, offset)
+        offset += protocol_size
+
+        if lane_id >= self.lane_count:
+            logger.error("Discarding packet for unknown lane {}".format(lane_id))
+            return
+
+        lane = self._incoming[lane_id]
+        distance = (sequence - lane.expected_sequence) % self.sequence_modulus
+
+        # Resent packet which was already delivered, or buffered
+        if distance >= self.sequence_modulus // 2 or sequence in lane.buffer:
+            return
+
+        if distance >= self.lane_window:
+            logger.error("Discarding packet {} of lane {}, which is outside the lane window".format(sequence, lane_id))
+            return
+
+        # Received payloads share memory with the receive buffer
+        lane.buffer[sequence] = Packet(protocol=protocol, payload=bytes(data[offset:]))
+
+        if distance:
+            lane.metrics.on_buffered(len(lane.buffer), clock())
+            return
+
+        self._deliver(lane)
+
+    def _deliver(self, lane):
+        """Dispatch buffered packets of lane until the next missing sequence
+
+        :param lane: incoming lane
+        """
+        buffer = lane.buffer
+        members = []
+
+        while lane.expected_sequence in buffer:
+            members.append(buffer.pop(lane.expected_sequence))
+            lane.expected_sequence = (lane.expected_sequence + 1) % self.sequence_modulus
+
+        if buffer:
+            lane.metrics.on_buffered(len(buffer), clock())
+
+        else:
+            lane.metrics.on_drained(clock())
+
+        self.dispatcher.handle_packets(PacketCollection(members))
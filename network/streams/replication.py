@@ -1,4 +1,4 @@
-from .streams import response_protocol, ProtocolHandler
+from .streams import response_protocol, take_within_bandwidth, ProtocolHandler
 from .latency_calculator import LatencyCalculator
 
 from ..channel import Channel
@@ -9,7 +9,7 @@ from ..logger import logger
 from ..packet import Packet, PacketCollection
 from ..replicable import Replicable
 from ..signals import (Signal, SignalListener, ReplicableRegisteredSignal, ReplicableUnregisteredSignal,
-                       LatencyUpdatedSignal)
+                       LatencyUpdatedSignal, ReliableRPCSignal, UrgentRPCSignal)
 from ..tagged_delegate import DelegateByNetmode
 from ..type_flag import TypeFlag
 from ..world_info import WorldInfo
@@ -26,7 +26,8 @@ class ReplicationStream(SignalListener, ProtocolHandler, DelegateByNetmode):
 
     def __init__(self, dispatcher):
         self.channels = {}
-        self.replicable = None
+        self._replicable = None
+        self.dispatcher = dispatcher
 
         self.string_packer = get_handler(TypeFlag(str))
         self.int_packer = get_handler(TypeFlag(int))
@@ -35,10 +36,30 @@ class ReplicationStream(SignalListener, ProtocolHandler, DelegateByNetmode):
 
         self.method_queue = []
 
+        # Size of queued packets which have not yet been sent
+        self.queued_size = 0
+
         # Call this last to ensure we intercept registration callbacks at the correct time
         self.register_signals()
         Signal.update_graph()
 
+    @property
+    def replicable(self):
+        """Uppermost owner of the replicables owned by this connection"""
+        return self._replicable
+
+    @replicable.setter
+    def replicable(self, replicable):
+        # RPC signals which target the replicable are received by this stream
+        for signal_cls in ReliableRPCSignal, UrgentRPCSignal:
+            if self._replicable is not None:
+                signal_cls.remove_parent(self, self._replicable)
+
+            if replicable is not None:
+                signal_cls.set_parent(self, replicable)
+
+        self._replicable = replicable
+
     @property
     def prioritised_channels(self):
         """Returns a generator for replicables
@@ -57,6 +78,44 @@ class ReplicationStream(SignalListener, ProtocolHandler, DelegateByNetmode):
 
             yield channel, replicable.relevant_to_owner and channel.is_owner
 
+    def enqueue_packet(self, queue, packet):
+        """Add packet to send queue
+
+        :param queue: send queue
+        :param packet: packet to send
+        """
+        queue.append(packet)
+        self.queued_size += packet.size
+
+        if packet.reliable:
+            self.schedule_send()
+
+    def schedule_send(self):
+        """Request a send at the target send rate, for queued reliable data"""
+        schedule_send = self.dispatcher.schedule_send
+        if callable(schedule_send):
+            schedule_send()
+
+    def dequeue_packets(self, queues, bandwidth):
+        """Remove packets from send queues, in order, while bandwidth remains.
+        Remaining packets are deferred until the next call
+
+        :param queues: send queues
+        :param bandwidth: available bandwidth
+        """
+        members = []
+
+        for queue in queues:
+            taken = take_within_bandwidth(queue, bandwidth)
+            taken_size = sum([p.size for p in taken])
+
+            bandwidth -= taken_size
+            self.queued_size -= taken_size
+
+            members.extend(taken)
+
+        return members
+
     @response_protocol(ConnectionProtocols.method_invoke)
     def handle_method_call(self, data):
 
@@ -66,8 +125,7 @@ class ReplicationStream(SignalListener, ProtocolHandler, DelegateByNetmode):
 
         # If we have permission to execute
         if channel.is_owner:
-            channel_data = data[id_size:]
-            channel.invoke_rpc_call(channel_data)
+            channel.invoke_rpc_call(data, offset=id_size)
 
     @ReplicableUnregisteredSignal.global_listener
     def notify_unregistered(self, target):
@@ -90,6 +148,24 @@ class ReplicationStream(SignalListener, ProtocolHandler, DelegateByNetmode):
 
         self.channels[target.instance_id] = Channel(self, target)
 
+    @ReliableRPCSignal.listener
+    def on_reliable_rpc(self, target):
+        """Called when a reliable RPC is queued by a replicable owned by this connection
+
+        :param target: uppermost owner of replicable which queued the RPC
+        """
+        self.schedule_send()
+
+    @UrgentRPCSignal.listener
+    def on_urgent_rpc(self, target):
+        """Called when an urgent RPC is queued by a replicable owned by this connection
+
+        :param target: uppermost owner of replicable which queued the RPC
+        """
+        send_urgent = self.dispatcher.send_urgent
+        if callable(send_urgent):
+            send_urgent()
+
     def send_method_calls(self, replicables, available_bandwidth):
         """Creates a packet collection of replicated function calls
 
@@ -97,6 +173,10 @@ class ReplicationStream(SignalListener, ProtocolHandler, DelegateByNetmode):
         :returns: PacketCollection instance
         """
         for item in replicables:
+            # Defer lower priority channels
+            if self.queued_size >= available_bandwidth:
+                break
+
             channel, is_and_relevant_to_owner = item
 
             # Only send attributes if relevant
@@ -108,10 +188,11 @@ class ReplicationStream(SignalListener, ProtocolHandler, DelegateByNetmode):
     def write_method_calls(self, channel):
         packed_id = channel.packed_id
         method_invoke_protocol = ConnectionProtocols.method_invoke
-        packets = [Packet(protocol=method_invoke_protocol, payload=packed_id + rpc_call, reliable=reliable)
-                   for rpc_call, reliable in channel.take_rpc_calls()]
+        method_queue = self.method_queue
 
-        self.method_queue.extend(packets)
+        for rpc_call, reliable in channel.take_rpc_calls():
+            packet = Packet(protocol=method_invoke_protocol, payload=packed_id + rpc_call, reliable=reliable)
+            self.enqueue_packet(method_queue, packet)
 
 
 @with_tag(Netmodes.server)
@@ -173,6 +254,10 @@ class ServerReplicationStream(ReplicationStream):
         connection_replicable = self.replicable
 
         for item in replicables:
+            # Defer lower priority channels
+            if self.queued_size >= available_bandwidth:
+                break
+
             channel, is_and_relevant_to_owner = item
 
             # Get replicable
@@ -205,11 +290,7 @@ class ServerReplicationStream(ReplicationStream):
 
         self.send_method_calls(replicables, bandwidth)
 
-        members = []
-
-        for queue in self.queues:
-            members.extend(queue)
-            queue.clear()
+        members = self.dequeue_packets(self.queues, bandwidth)
 
         if not members:
             return None
@@ -231,9 +312,14 @@ class ServerReplicationStream(ReplicationStream):
         if not attributes:
             return
 
+        # Lost updates are superseded by deltas against the last acknowledged baseline, which resend initial and
+        # complaint attributes until acknowledged
+        # Temporary replicables are only updated once, so must be sent reliably
         update_payload = channel.packed_id + attributes
-        packet = Packet(protocol=ConnectionProtocols.attribute_update, payload=update_payload, reliable=True)
-        self.attribute_queue.append(packet)
+        on_success = partial(channel.acknowledge_update, channel.update_sequence)
+        packet = Packet(protocol=ConnectionProtocols.attribute_update, payload=update_payload,
+                        reliable=channel.replicable.replicate_temporarily, on_success=on_success)
+        self.enqueue_packet(self.attribute_queue, packet)
 
     def write_creation(self, channel):
         replicable = channel.replicable
@@ -243,12 +329,13 @@ class ServerReplicationStream(ReplicationStream):
 
         # Send the protocol, class name and owner status to client
         payload = channel.packed_id + packed_class + packed_is_host
-        packet = Packet(protocol=ConnectionProtocols.replication_init, payload=payload, reliable=True)
-        self.creation_queue.append(packet)
+        packet = Packet(protocol=ConnectionProtocols.replication_init, payload=payload, reliable=True,
+                        on_success=channel.acknowledge_creation)
+        self.enqueue_packet(self.creation_queue, packet)
 
     def write_removal(self, channel):
         packet = Packet(protocol=ConnectionProtocols.replication_del, payload=channel.packed_id, reliable=True)
-        self.removal_queue.append(packet)
+        self.enqueue_packet(self.removal_queue, packet)
 
 
 @with_tag(Netmodes.client)
@@ -323,13 +410,12 @@ class ClientReplicationStream(ReplicationStream):
         replicables = self.prioritised_channels
         self.send_method_calls(replicables, bandwidth)
 
-        members = self.method_queue
+        members = self.dequeue_packets((self.method_queue,), bandwidth)
 
         if not members:
             return None
 
         packets = PacketCollection()
-        packets.members.extend(members)
-        members.clear()
+        packets.members = members
 
         return packets
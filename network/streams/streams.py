@@ -6,18 +6,54 @@ from ..metaclasses.register import TypeRegister
 from ..packet import PacketCollection
 
 
-__all__ = 'Dispatcher', 'InjectorStream', 'ProtocolHandler', 'StatusDispatcher', 'response_protocol', 'send_state'
+__all__ = 'Dispatcher', 'InjectorStream', 'ProtocolHandler', 'StatusDispatcher', 'response_protocol', 'send_state', \
+          'take_within_bandwidth'
 
 response_protocol = set_annotation("response_to")
 send_state = set_annotation("send_for")
 
 
+def take_within_bandwidth(queue, bandwidth):
+    """Remove and return packets from the front of a queue while bandwidth remains.
+
+    The last packet taken may exceed the remaining bandwidth, so that large packets are not deferred indefinitely
+
+    :param queue: list of packets
+    :param bandwidth: available bandwidth
+    """
+    if bandwidth <= 0:
+        return []
+
+    for index, packet in enumerate(queue):
+        bandwidth -= packet.size
+
+        if bandwidth <= 0:
+            break
+
+    else:
+        index = len(queue) - 1
+
+    members = queue[:index + 1]
+    del queue[:index + 1]
+
+    return members
+
+
 class Dispatcher:
-    """Dispatches packets to subscriber streams, and requests new packets from them"""
+    """Dispatches packets to subscriber streams, and requests new packets from them.
+
+    Streams are pulled in the order they were created, and share the available bandwidth
+    """
 
     def __init__(self):
         self.streams = []
 
+        # Callback to send pulled packets immediately, instead of with the next network send
+        self.send_urgent = None
+
+        # Callback to send at the target send rate, when reliable data is queued
+        self.schedule_send = None
+
     def create_stream(self, stream_cls):
         stream = stream_cls(self)
         self.streams.append(stream)
@@ -36,6 +72,7 @@ class Dispatcher:
                 continue
 
             packet_collection += packets
+            bandwidth -= packets.size
 
         return packet_collection
 
@@ -58,10 +95,8 @@ class InjectorStream:
         if not self.queue:
             return
 
-        packets = PacketCollection(self.queue)
-        self.queue.clear()
-
-        return packets
+        members = take_within_bandwidth(self.queue, bandwidth)
+        return PacketCollection(members)
 
 
 class ProtocolHandler(metaclass=TypeRegister):
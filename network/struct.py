@@ -8,6 +8,9 @@ __all__ = ['Struct']
 class Struct(metaclass=StructMeta):
     """Serialisable object with individual fields"""
 
+    # Pack attributes at bit granularity instead of byte aligned, if the layout saves enough (see BitCodec.min_saving)
+    use_bit_packing = False
+
     def __init__(self):
         self._attribute_container.register_storage_interfaces()
 
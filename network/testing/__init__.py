@@ -1,3 +1,4 @@
 __author__ = 'Angus'
 
-from .testing import *
\ No newline at end of file
+from .testing import *
+from .benchmarks import *
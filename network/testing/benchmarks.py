@@ -0,0 +1,839 @@
+from ..async_network import AsyncSimpleNetwork
+from ..bitfield import BitField
+from ..channel import Channel
+from ..codecs import BitCodec, build_codec
+from ..compression import Compressor, train_dictionary
+from ..connection import Connection
+from ..descriptors import Attribute
+from ..backends import DatagramBackend, RecvmsgBackend, MultipleMessageBackend, get_best_backend
+from ..network import NonBlockingSocketUDP
+from ..packet import Packet, PacketCollection
+from ..enums import ConnectionProtocols, Netmodes
+from ..flag_serialiser import FlagSerialiser
+from ..handlers import clear_handler_cache, get_handler, static_description
+from ..reliability import HeaderFormat, CompactHeaderFormat, ReceivedWindow, SentWindow
+from ..replicable import Replicable
+from ..simple_network import SimpleNetwork
+from ..timers import TimerWheel
+from ..type_flag import TypeFlag
+from ..world_info import WorldInfo
+
+from asyncio import new_event_loop
+from collections import OrderedDict, deque
+from functools import partial
+from random import Random
+from struct import pack
+from time import clock, perf_counter, process_time, sleep
+from tracemalloc import get_traced_memory, start as start_tracing, stop as stop_tracing
+
+__all__ = ["benchmark_socket_backends", "benchmark_tick_scheduling", "benchmark_receive_allocations",
+           "benchmark_ack_processing", "benchmark_compression", "benchmark_send_scheduling",
+           "benchmark_connection_timeouts", "benchmark_header_formats", "benchmark_attribute_codecs",
+           "benchmark_handler_construction", "benchmark_bit_packing", "benchmark_delta_replication",
+           "benchmark_varint_handlers", "run_benchmarks"]
+
+
+def _report(name, results):
+    """Print benchmark results
+
+    :param name: name of benchmark
+    :param results: list of (label, metrics dict) pairs
+    """
+    print("\n{}".format(name))
+    print("-" * len(name))
+
+    for label, metrics in results:
+        formatted_metrics = ", ".join("{}: {:.4g}".format(key, value) for key, value in metrics.items())
+        print("{:<28} {}".format(label, formatted_metrics))
+
+
+def benchmark_socket_backends(datagrams_per_tick=256, ticks=200, payload_size=64):
+    """Measure loopback throughput of each supported socket backend
+
+    :param datagrams_per_tick: datagrams sent and drained per tick
+    :param ticks: number of ticks to simulate
+    :param payload_size: size of each datagram
+    """
+    backends = [DatagramBackend, RecvmsgBackend]
+    if get_best_backend() is MultipleMessageBackend:
+        backends.append(MultipleMessageBackend)
+
+    payload = bytes(payload_size)
+    results = []
+
+    for backend_cls in backends:
+        receiver_socket = NonBlockingSocketUDP("127.0.0.1", 0)
+        sender_socket = NonBlockingSocketUDP("127.0.0.1", 0)
+
+        receiver = backend_cls(receiver_socket)
+        sender = backend_cls(sender_socket)
+
+        datagrams = [(payload, receiver_socket.getsockname())] * datagrams_per_tick
+        received = 0
+
+        started_cpu = process_time()
+        started = perf_counter()
+
+        for _ in range(ticks):
+            sender.send(datagrams)
+            received += sum(1 for _ in receiver.receive())
+
+        elapsed = perf_counter() - started
+        elapsed_cpu = process_time() - started_cpu
+
+        receiver_socket.close()
+        sender_socket.close()
+
+        total_sent = datagrams_per_tick * ticks
+        results.append((backend_cls.__name__, {"datagrams/sec": total_sent / elapsed,
+                                               "cpu ms/tick": 1000 * elapsed_cpu / ticks,
+                                               "delivered": received / total_sent}))
+
+    _report("Socket backends ({} datagrams per tick)".format(datagrams_per_tick), results)
+    return results
+
+
+def benchmark_tick_scheduling(duration=1.0, update_rate=1/60):
+    """Measure CPU usage and wake-up jitter of idle network update loops
+
+    :param duration: duration to run each update loop
+    :param update_rate: interval between ticks
+    """
+    loop = new_event_loop()
+    networks = [SimpleNetwork("127.0.0.1", 0), AsyncSimpleNetwork("127.0.0.1", 0, loop=loop)]
+    results = []
+
+    for network in networks:
+        tick_times = []
+
+        def on_update():
+            tick_times.append(perf_counter())
+            return True
+
+        network.on_update = on_update
+
+        started_cpu = process_time()
+        network.start(timeout=duration, update_rate=update_rate)
+        elapsed_cpu = process_time() - started_cpu
+
+        intervals = [b - a for a, b in zip(tick_times, tick_times[1:])]
+        jitter = sum(abs(interval - update_rate) for interval in intervals) / max(len(intervals), 1)
+
+        results.append((type(network).__name__, {"cpu fraction": elapsed_cpu / duration,
+                                                 "ticks": len(tick_times),
+                                                 "mean jitter ms": 1000 * jitter}))
+
+    loop.close()
+
+    _report("Idle tick scheduling ({:.0f} Hz)".format(1 / update_rate), results)
+    return results
+
+
+def _split_packets_by_slicing(bytes_string):
+    """Reference implementation of the previous packet split, which sliced the byte stream for each field.
+
+    Returns the packets and the number of bytes copied by slicing
+
+    :param bytes_string: byte stream
+    """
+    packets = []
+    copied_bytes = 0
+
+    while bytes_string:
+        packet = Packet()
+        length, length_size = packet.size_handler.unpack_from(bytes_string)
+        bytes_string = bytes_string[length_size:]
+        copied_bytes += len(bytes_string)
+
+        packet.protocol, protocol_size = packet.protocol_handler.unpack_from(bytes_string)
+        bytes_string = bytes_string[protocol_size:]
+        copied_bytes += len(bytes_string)
+
+        end_index = length - protocol_size
+        packet.payload = bytes_string[:end_index]
+        bytes_string = bytes_string[end_index:]
+        copied_bytes += len(packet.payload) + len(bytes_string)
+
+        packets.append(packet)
+
+    return packets, copied_bytes
+
+
+def benchmark_receive_allocations(packets_per_datagram=24, payload_size=40, datagrams=2000, header_size=8):
+    """Measure bytes copied and allocated while splitting received datagrams into packets
+
+    :param packets_per_datagram: number of packets in each datagram
+    :param payload_size: size of each packet payload
+    :param datagrams: number of datagrams to split
+    :param header_size: size of the connection header preceding the packets
+    """
+    packet_bytes = PacketCollection([Packet(protocol=i % 8, payload=bytes(payload_size))
+                                     for i in range(packets_per_datagram)]).to_bytes()
+    datagram = bytes(header_size) + packet_bytes
+
+    # Receive buffer shared by all datagrams
+    receive_view = memoryview(bytearray(datagram))
+
+    def receive_with_slices():
+        # Datagram was allocated by recvfrom, then its header was sliced off
+        received = bytes(receive_view)
+        packets, copied_bytes = _split_packets_by_slicing(received[header_size:])
+        return packets, copied_bytes + 2 * len(datagram) - header_size
+
+    def receive_with_views():
+        packets = PacketCollection.from_bytes(receive_view, header_size).members
+        return packets, sum(len(p.payload) for p in packets if not isinstance(p.payload, memoryview))
+
+    results = []
+    for label, receive in (("slice copies (previous)", receive_with_slices),
+                           ("memoryview offsets", receive_with_views)):
+        start_tracing()
+        baseline, _ = get_traced_memory()
+        packets, copied_bytes = receive()
+        _, peak = get_traced_memory()
+        stop_tracing()
+
+        started = perf_counter()
+        for _ in range(datagrams):
+            receive()
+        elapsed = perf_counter() - started
+
+        results.append((label, {"copied bytes/datagram": copied_bytes,
+                                "peak bytes/datagram": peak - baseline,
+                                "us/datagram": 1e6 * elapsed / datagrams}))
+
+    _report("Receive path ({} byte datagrams)".format(len(datagram)), results)
+    return results
+
+
+def _process_acks_by_scanning(requested_ack, received_window, ack_bitfield, sequence, window_size):
+    """Reference implementation of the previous ack processing, which scanned every bit and outstanding sequence.
+
+    :param requested_ack: dictionary of outstanding sequences
+    :param received_window: deque of received sequences
+    :param ack_bitfield: BitField of received sequences
+    :param sequence: sequence of this packet, acknowledged by the peer
+    :param window_size: size of ack window
+    """
+    requested_ack[sequence] = None
+    received_window.append(sequence)
+
+    for index in range(window_size):
+        ack_bitfield[index] = (sequence - (index + 1)) in received_window
+
+    for index in range(window_size):
+        absolute_sequence = sequence - (index + 1)
+        if ack_bitfield[index] and absolute_sequence in requested_ack:
+            requested_ack.pop(absolute_sequence)
+
+    requested_ack.pop(sequence, None)
+    for absolute_sequence in [s for s in requested_ack if (sequence - s) >= window_size]:
+        requested_ack.pop(absolute_sequence)
+
+
+def benchmark_ack_processing(packets=20000, window_size=32, loss_interval=7):
+    """Measure cost of building and processing ack feedback for each packet
+
+    :param packets: number of packets to process
+    :param window_size: size of ack window
+    :param loss_interval: every Nth packet is dropped
+    """
+    sequence_max_size = 2 ** 16 - 1
+
+    def process_with_scanning():
+        requested_ack = {}
+        received_window = deque(maxlen=window_size)
+        ack_bitfield = BitField(window_size)
+
+        for sequence in range(1, packets):
+            if sequence % loss_interval:
+                _process_acks_by_scanning(requested_ack, received_window, ack_bitfield, sequence, window_size)
+
+            else:
+                requested_ack[sequence] = None
+
+    def process_with_masks():
+        sent_window = SentWindow(window_size, sequence_max_size)
+        received_window = ReceivedWindow(window_size, sequence_max_size)
+
+        for sequence in range(1, packets):
+            sequence %= sequence_max_size + 1
+            sent_window.add(sequence, None)
+
+            if sequence % loss_interval:
+                received_window.receive(sequence)
+                sent_window.acknowledge(received_window.latest_sequence, received_window.ack_mask)
+                sent_window.take_dropped(received_window.latest_sequence)
+
+    results = []
+    for label, process in (("dict and BitField (previous)", process_with_scanning),
+                           ("ring buffer and int mask", process_with_masks)):
+        started = perf_counter()
+        process()
+        elapsed = perf_counter() - started
+
+        results.append((label, {"us/packet": 1e6 * elapsed / packets}))
+
+    _report("Ack processing ({} bit window)".format(window_size), results)
+    return results
+
+
+def _create_replication_datagram(random, replicables=24):
+    """Create datagram body resembling replication traffic
+
+    :param random: Random instance
+    :param replicables: number of replicables updated
+    """
+    packets = []
+
+    for instance_id in range(replicables):
+        packed_id = pack("!H", instance_id)
+
+        # Occasional spawn
+        if random.random() < 0.1:
+            payload = packed_id + pack("!B", 16) + b"PlayerController" + b"\x00"
+            packets.append(Packet(protocol=ConnectionProtocols.replication_init, payload=payload))
+
+        # Position and velocity which barely change
+        position = [round(random.gauss(100, 1), 1) for _ in range(3)]
+        velocity = [0.0, 0.0, round(random.gauss(0, 0.1), 1)]
+        payload = packed_id + b"\x0f" + pack("!6f", *(position + velocity))
+        packets.append(Packet(protocol=ConnectionProtocols.attribute_update, payload=payload))
+
+    return PacketCollection(packets).to_bytes()
+
+
+def benchmark_compression(datagrams=500, training_datagrams=200):
+    """Measure compression ratio and CPU cost of datagram compression
+
+    :param datagrams: number of datagrams to compress
+    :param training_datagrams: number of captured datagrams used to build the dictionary
+    """
+    random = Random(0)
+    training_samples = [_create_replication_datagram(random) for _ in range(training_datagrams)]
+    samples = [_create_replication_datagram(random) for _ in range(datagrams)]
+
+    results = []
+    for label, compressor in (("no dictionary", Compressor()),
+                              ("trained dictionary", Compressor(train_dictionary(training_samples)))):
+        started = perf_counter()
+        compressed_samples = [compressor.compress(data)[0] for data in samples]
+        compress_elapsed = perf_counter() - started
+
+        started = perf_counter()
+        for data in compressed_samples:
+            compressor.decompress(data)
+        decompress_elapsed = perf_counter() - started
+
+        results.append((label, {"ratio": compressor.metrics.ratio,
+                                "compress us/datagram": 1e6 * compress_elapsed / datagrams,
+                                "decompress us/datagram": 1e6 * decompress_elapsed / datagrams}))
+
+    mean_size = sum(len(data) for data in samples) / datagrams
+    _report("Datagram compression ({:.0f} byte datagrams)".format(mean_size), results)
+    return results
+
+
+def benchmark_send_scheduling(connections=200, frames=60, update_rate=1/60):
+    """Measure per-frame send cost and datagram count of idle server connections, when every connection sends each
+    frame and when connections send according to their schedule
+
+    :param connections: number of connections
+    :param frames: number of frames to simulate
+    :param update_rate: interval between frames
+    """
+    previous_netmode = WorldInfo.netmode
+    WorldInfo.netmode = Netmodes.server
+
+    peers = [Connection(("127.0.0.1", 20000 + i)) for i in range(connections)]
+    Connection.update_graph()
+
+    results = []
+    try:
+        for label, send in (("every frame", lambda c, t: c.send(True)),
+                            ("scheduled", lambda c, t: c.send_scheduled(True, t))):
+            datagram_count = 0
+            elapsed = 0.0
+
+            for _ in range(frames):
+                started = perf_counter()
+                current_time = clock()
+                datagram_count += sum([len(send(connection, current_time)) for connection in peers])
+                elapsed += perf_counter() - started
+
+                sleep(update_rate)
+
+            results.append((label, {"us/frame": 1e6 * elapsed / frames, "datagrams/frame": datagram_count / frames}))
+
+    finally:
+        for connection in peers:
+            connection.deregister()
+
+        Connection.update_graph()
+        WorldInfo.netmode = previous_netmode
+
+    _report("Send scheduling ({} idle connections)".format(connections), results)
+    return results
+
+
+class _IdleConnection:
+    """Connection which records the time it last received data"""
+
+    timeout_duration = 10.0
+
+    def __init__(self, current_time):
+        self.last_received_time = current_time
+
+
+def benchmark_connection_timeouts(connections=10000, frames=900, update_rate=1/60, keepalive_interval=0.1,
+                                  unresponsive_fraction=0.1):
+    """Measure per-frame cost of connection timeouts for idle connections, when every connection checks its timeout each
+    frame and when timeouts are held in a timer wheel.
+
+    Responsive connections receive keepalives, which re-arm their timeouts, every keepalive interval
+
+    :param connections: number of connections
+    :param frames: number of frames to simulate
+    :param update_rate: interval between frames
+    :param keepalive_interval: interval between received keepalives
+    :param unresponsive_fraction: fraction of connections which do not receive keepalives
+    """
+    results = []
+
+    for label in ("poll each frame", "timer wheel"):
+        peers = [_IdleConnection(0.0) for _ in range(connections)]
+        timer_wheel = TimerWheel(current_time=0.0)
+
+        for connection in peers:
+            timer_wheel.schedule(connection, connection.timeout_duration)
+
+        responsive = peers[int(connections * unresponsive_fraction):]
+        receivers_per_frame = int(len(responsive) * update_rate / keepalive_interval)
+
+        timed_out = set()
+        started = perf_counter()
+
+        for frame in range(frames):
+            current_time = frame * update_rate
+            first_receiver = frame * receivers_per_frame % len(responsive)
+
+            if label == "timer wheel":
+                for connection in responsive[first_receiver: first_receiver + receivers_per_frame]:
+                    timer_wheel.schedule(connection, current_time + connection.timeout_duration)
+
+                timed_out.update(timer_wheel.advance(current_time))
+
+            else:
+                for connection in responsive[first_receiver: first_receiver + receivers_per_frame]:
+                    connection.last_received_time = current_time
+
+                timed_out.update([c for c in peers if (current_time - c.last_received_time) > c.timeout_duration])
+
+        elapsed = perf_counter() - started
+        results.append((label, {"us/frame": 1e6 * elapsed / frames, "timed out": len(timed_out)}))
+
+    _report("Connection timeouts ({} idle connections)".format(connections), results)
+    return results
+
+
+def benchmark_header_formats(datagrams=2000, window_size=32, loss_interval=20):
+    """Measure size and round trip cost of connection and packet headers, for datagrams of small unreliable updates
+
+    :param datagrams: number of datagrams to pack
+    :param window_size: ack window size
+    :param loss_interval: mean interval between lost sequences in the ack mask
+    """
+    random = Random(0)
+    full_mask = (1 << window_size) - 1
+
+    samples = []
+    ack_base = 0
+    for sequence in range(1, datagrams + 1):
+        # The peer sends at a similar rate
+        ack_base = (ack_base + random.choice((0, 1, 1, 2))) & 0xFFFF
+
+        ack_mask = full_mask
+        if random.random() < window_size / loss_interval / 8:
+            ack_mask ^= 1 << random.randrange(window_size)
+
+        members = [Packet(protocol=ConnectionProtocols.attribute_update, payload=bytes(random.randint(4, 24)))
+                   for _ in range(random.randint(1, 6))]
+        samples.append(((sequence & 0xFFFF, ack_base, ack_mask), members))
+
+    payload_size = sum(len(p.payload) for _, members in samples for p in members)
+
+    results = []
+    for header_format in (HeaderFormat(window_size), CompactHeaderFormat(window_size)):
+        started = perf_counter()
+        packed = [header_format.pack(*header) + header_format.pack_packets(members) for header, members in samples]
+        pack_elapsed = perf_counter() - started
+
+        started = perf_counter()
+        for data in packed:
+            *_, offset = header_format.unpack_from(data)
+            header_format.unpack_packets(data, offset)
+        unpack_elapsed = perf_counter() - started
+
+        header_size = sum(len(header_format.pack(*header)) for header, _ in samples)
+        total_size = sum(len(data) for data in packed)
+
+        results.append((type(header_format).__name__,
+                        {"header bytes": header_size / datagrams,
+                         "packet header bytes": (total_size - header_size - payload_size) / datagrams,
+                         "datagram bytes": total_size / datagrams,
+                         "pack us": 1e6 * pack_elapsed / datagrams,
+                         "unpack us": 1e6 * unpack_elapsed / datagrams}))
+
+    _report("Header formats ({:.0f} payload bytes per datagram)".format(payload_size / datagrams), results)
+    return results
+
+
+def benchmark_attribute_codecs(updates=20000):
+    """Measure per-update cost of packing and unpacking Actor-like attribute layouts, with the generic serialiser and
+    with a generated codec
+
+    :param updates: number of updates to pack and unpack
+    """
+    arguments = OrderedDict([("alive", TypeFlag(bool)), ("ammo", TypeFlag(int, max_value=1000)),
+                             ("health", TypeFlag(int, max_value=1000)), ("name", TypeFlag(str)),
+                             ("position_x", TypeFlag(float)), ("position_y", TypeFlag(float)),
+                             ("position_z", TypeFlag(float)), ("velocity_x", TypeFlag(float)),
+                             ("velocity_y", TypeFlag(float)), ("velocity_z", TypeFlag(float)),
+                             ("visible", TypeFlag(bool))])
+
+    full_update = {"alive": True, "ammo": 40, "health": 100, "name": "Actor", "position_x": 1.0, "position_y": 2.0,
+                   "position_z": 3.0, "velocity_x": 0.0, "velocity_y": 0.0, "velocity_z": -1.0, "visible": True}
+    movement_update = {k: v for k, v in full_update.items() if k.startswith(("position", "velocity"))}
+
+    results = []
+    for label, serialiser in (("FlagSerialiser (previous)", FlagSerialiser(arguments)),
+                              ("generated codec", build_codec("ActorCodec", arguments))):
+        metrics = {}
+
+        for update_name, data in (("full", full_update), ("movement", movement_update)):
+            started = perf_counter()
+            for _ in range(updates):
+                packed_data = serialiser.pack(data)
+            metrics["{} pack us".format(update_name)] = 1e6 * (perf_counter() - started) / updates
+
+            started = perf_counter()
+            for _ in range(updates):
+                for _ in serialiser.unpack(packed_data):
+                    pass
+            metrics["{} unpack us".format(update_name)] = 1e6 * (perf_counter() - started) / updates
+
+        results.append((label, metrics))
+
+    _report("Attribute codecs ({} attributes)".format(len(arguments)), results)
+    return results
+
+
+class _BenchmarkReplicable(Replicable):
+    """Replicable with typical string, list and numeric attributes"""
+
+    name = Attribute(type_of=str, max_length=32)
+    tags = Attribute(type_of=list, element_flag=TypeFlag(str))
+    score = Attribute(0)
+    speed = Attribute(0.0)
+
+
+def benchmark_handler_construction(connections=200, replicables=500):
+    """Measure connection setup and replicable spawn time, when handlers are built for every request and when built
+    handlers are remembered
+
+    :param connections: number of connections to set up
+    :param replicables: number of replicables to spawn
+    """
+    previous_netmode = WorldInfo.netmode
+    WorldInfo.netmode = Netmodes.server
+
+    results = []
+    try:
+        for label, forget_handlers in (("built per request (previous)", True), ("memoized", False)):
+            clear_handler_cache()
+
+            started = perf_counter()
+            for i in range(connections):
+                if forget_handlers:
+                    clear_handler_cache()
+
+                Connection(("127.0.0.1", 20000 + i)).deregister()
+                Connection.update_graph()
+
+            connection_elapsed = perf_counter() - started
+
+            started = perf_counter()
+            for _ in range(replicables):
+                if forget_handlers:
+                    clear_handler_cache()
+
+                replicable = _BenchmarkReplicable(register_immediately=True)
+                Channel(None, replicable)
+                replicable.deregister(immediately=True)
+
+            replicable_elapsed = perf_counter() - started
+
+            results.append((label, {"connection setup us": 1e6 * connection_elapsed / connections,
+                                    "replicable spawn us": 1e6 * replicable_elapsed / replicables}))
+
+    finally:
+        WorldInfo.netmode = previous_netmode
+
+    _report("Handler construction", results)
+    return results
+
+
+def benchmark_bit_packing(updates=2000):
+    """Measure size and cost of attribute updates, when packed byte aligned and at bit granularity.
+
+    Pawn-like updates are dominated by full width floats, whereas status updates are mostly booleans and small integers
+
+    :param updates: number of updates to pack and unpack
+    """
+    pawn_arguments = OrderedDict([("alive", TypeFlag(bool)), ("flash_count", TypeFlag(int, max_value=15)),
+                                  ("health", TypeFlag(int, max_value=100)), ("network_collision_group", TypeFlag(int)),
+                                  ("network_collision_mask", TypeFlag(int)),
+                                  ("network_replication_time", TypeFlag(float)), ("position_x", TypeFlag(float)),
+                                  ("position_y", TypeFlag(float)), ("position_z", TypeFlag(float)),
+                                  ("torn_off", TypeFlag(bool)), ("view_pitch", TypeFlag(float))])
+
+    status_arguments = OrderedDict([("flag_{}".format(i), TypeFlag(bool)) for i in range(8)])
+    status_arguments.update(("counter_{}".format(i), TypeFlag(int, max_value=15)) for i in range(4))
+    status_arguments["health"] = TypeFlag(int, max_value=100)
+
+    random = Random(0)
+    pawn_samples = []
+    status_samples = []
+
+    for _ in range(updates):
+        # Movement each update, occasional changes to game state
+        data = {"network_replication_time": random.random(), "position_x": random.gauss(0, 50),
+                "position_y": random.gauss(0, 50), "position_z": random.gauss(0, 5), "view_pitch": random.random()}
+
+        if random.random() < 0.2:
+            data.update(health=random.randint(0, 100), flash_count=random.randint(0, 15))
+
+        if random.random() < 0.05:
+            data.update(alive=random.random() < 0.5, network_collision_group=1, network_collision_mask=255)
+
+        pawn_samples.append(data)
+
+        # Several flags and counters change each update
+        status_samples.append({key: random.randint(0, 1) if key.startswith("flag") else random.randint(0, 15)
+                               for key in random.sample(list(status_arguments), 6)})
+
+    results = []
+    for name, arguments, samples in (("pawn", pawn_arguments, pawn_samples),
+                                     ("status", status_arguments, status_samples)):
+        saving = BitCodec.estimate_saving(arguments)
+
+        for label, codec in (("byte aligned", build_codec("BenchmarkCodec", arguments)),
+                             ("bit packed", BitCodec(arguments))):
+            started = perf_counter()
+            packed_samples = [codec.pack(data) for data in samples]
+            pack_elapsed = perf_counter() - started
+
+            started = perf_counter()
+            for packed_data in packed_samples:
+                codec.unpack(packed_data)
+            unpack_elapsed = perf_counter() - started
+
+            results.append(("{} {}".format(name, label),
+                            {"estimated saving": saving, "bytes/update": sum(len(data) for data in packed_samples) / updates,
+                             "pack us": 1e6 * pack_elapsed / updates, "unpack us": 1e6 * unpack_elapsed / updates}))
+
+    _report("Bit packing (used if estimated saving >= {})".format(BitCodec.min_saving), results)
+    return results
+
+
+class _SlowActorReplicable(Replicable):
+    """Replicable with slowly changing position, health and inventory"""
+
+    health = Attribute(100, max_value=100)
+    inventory = Attribute(type_of=list, element_flag=TypeFlag(int, max_value=255))
+    position_x = Attribute(0.0, min=-1024, max=1024, bits=20)
+    position_y = Attribute(0.0, min=-1024, max=1024, bits=20)
+    position_z = Attribute(0.0, min=-1024, max=1024, bits=20)
+    score = Attribute(0, max_value=2 ** 32 - 1)
+
+    def conditions(self, is_owner, is_complaint, is_initial):
+        yield from super().conditions(is_owner, is_complaint, is_initial)
+
+        yield "health"
+        yield "inventory"
+        yield "position_x"
+        yield "position_y"
+        yield "position_z"
+        yield "score"
+
+
+def benchmark_delta_replication(ticks=2000, loss=0.1, ack_delay=3):
+    """Measure replicated bytes for a slowly changing replicable under packet loss, when changes are sent reliably in
+    full (previous), and as unreliable deltas against the last acknowledged baseline
+
+    :param ticks: number of replication ticks
+    :param loss: fraction of packets which are lost
+    :param ack_delay: ticks before received packets are acknowledged
+    """
+    previous_netmode = WorldInfo.netmode
+
+    try:
+        WorldInfo.netmode = Netmodes.server
+        server_replicable = _SlowActorReplicable(register_immediately=True)
+        server_replicable.inventory = [0] * 32
+        server_channel = Channel(None, server_replicable)
+        server_channel.acknowledge_creation(None)
+
+        WorldInfo.netmode = Netmodes.client
+        client_replicable = _SlowActorReplicable(register_immediately=True)
+        client_channel = Channel(None, client_replicable)
+
+        attribute_data = server_replicable._attribute_container.data
+        codec = server_channel.serialiser.codec
+        get_description = static_description
+
+        random = Random(0)
+        loss_random = Random(1)
+        previous_descriptions = {}
+        previous_bytes = delta_bytes = 0
+        pending_acks = deque()
+        is_moving = False
+
+        WorldInfo.netmode = Netmodes.server
+
+        # Finish with lossless ticks without changes, for outstanding updates to be acknowledged
+        for tick in range(ticks + 2 * ack_delay):
+            is_settling = tick >= ticks
+
+            # Occasionally walk, with infrequent changes to game state
+            if random.random() < 0.05:
+                is_moving = not is_moving
+
+            if is_moving and not is_settling:
+                server_replicable.position_x += random.uniform(0.0, 0.05)
+                server_replicable.position_y += random.uniform(-0.01, 0.01)
+
+            if random.random() < 0.05 and not is_settling:
+                server_replicable.health = random.randint(0, 100)
+
+            if random.random() < 0.05 and not is_settling:
+                server_replicable.inventory[random.randrange(32)] = random.randint(0, 255)
+
+            if random.random() < 0.1 and not is_settling:
+                server_replicable.score += random.randint(1, 100)
+
+            is_lost = loss_random.random() < loss and not is_settling
+
+            # Previous scheme: changes since last send, resent in full when lost
+            descriptions = {a.name: get_description(v) for a, v in attribute_data.items()}
+            changed = {a.name: v for a, v in attribute_data.items()
+                       if previous_descriptions.get(a.name) != descriptions[a.name]}
+            previous_descriptions = descriptions
+
+            if changed:
+                update_size = len(server_channel.packed_id) + len(codec.pack(changed))
+                previous_bytes += update_size
+
+                if is_lost:
+                    previous_bytes += update_size
+
+            # Delta scheme
+            while pending_acks and pending_acks[0][0] <= tick:
+                pending_acks.popleft()[1](None)
+
+            data = server_channel.get_attributes(False)
+            if data is None:
+                continue
+
+            delta_bytes += len(server_channel.packed_id) + len(data)
+            if is_lost:
+                continue
+
+            client_channel.set_attributes(data)
+            pending_acks.append((tick + ack_delay,
+                                 partial(server_channel.acknowledge_update, server_channel.update_sequence)))
+
+        # Client values are quantized
+        client_data = client_replicable._attribute_container.data
+        mismatches = sum(get_description(codec.pack({a.name: attribute_data[a]})) !=
+                         get_description(codec.pack({a.name: client_data[a]}))
+                         for a in client_data if a.name != "roles")
+
+        server_replicable.deregister(immediately=True)
+        client_replicable.deregister(immediately=True)
+
+    finally:
+        WorldInfo.netmode = previous_netmode
+
+    results = [("full reliable (previous)", {"bytes/tick": previous_bytes / ticks}),
+               ("acked baseline delta", {"bytes/tick": delta_bytes / ticks, "final mismatches": mismatches})]
+
+    _report("Delta replication ({:.0%} loss)".format(loss), results)
+    return results
+
+
+def benchmark_varint_handlers(count=10000, tick_rate=60, session_hours=1):
+    """Measure packed size of tick IDs and iterable counts, and the cost of packing multiple varints individually and
+    with pack_multiple / unpack_multiple
+
+    :param count: number of values to pack
+    :param tick_rate: ticks per second
+    :param session_hours: duration of session over which tick IDs are sampled
+    """
+    random = Random(0)
+    ticks = [random.randrange(tick_rate * 3600 * session_hours) for _ in range(count)]
+    counts = [random.randrange(64) for _ in range(count)]
+
+    results = []
+    for label, int_flag in (("fixed width (previous)", TypeFlag(int, max_value=WorldInfo._MAXIMUM_TICK)),
+                            ("varint", TypeFlag(int, encoding="varint"))):
+        handler = get_handler(int_flag)
+        count_handler = get_handler(TypeFlag(int)) if int_flag.data.get("encoding") is None else handler
+
+        results.append((label, {"tick bytes": len(handler.pack_multiple(ticks, count)) / count,
+                                "count bytes": len(count_handler.pack_multiple(counts, count)) / count}))
+
+    handler = get_handler(TypeFlag(int, encoding="varint"))
+    for label, values in (("varint ticks", ticks), ("varint counts", counts)):
+        started = perf_counter()
+        packed_values = b''.join([handler.pack(v) for v in values])
+        pack_elapsed = perf_counter() - started
+
+        started = perf_counter()
+        offset = 0
+        for _ in range(count):
+            _, value_size = handler.unpack_from(packed_values, offset)
+            offset += value_size
+        unpack_elapsed = perf_counter() - started
+
+        started = perf_counter()
+        handler.pack_multiple(values, count)
+        pack_multiple_elapsed = perf_counter() - started
+
+        started = perf_counter()
+        handler.unpack_multiple(packed_values, count)
+        unpack_multiple_elapsed = perf_counter() - started
+
+        results.append((label, {"pack ns": 1e9 * pack_elapsed / count,
+                                "pack_multiple ns": 1e9 * pack_multiple_elapsed / count,
+                                "unpack ns": 1e9 * unpack_elapsed / count,
+                                "unpack_multiple ns": 1e9 * unpack_multiple_elapsed / count}))
+
+    _report("Varint handlers", results)
+    return results
+
+
+def run_benchmarks():
+    benchmark_socket_backends()
+    benchmark_tick_scheduling()
+    benchmark_receive_allocations()
+    benchmark_ack_processing()
+    benchmark_compression()
+    benchmark_send_scheduling()
+    benchmark_connection_timeouts()
+    benchmark_header_formats()
+    benchmark_attribute_codecs()
+    benchmark_handler_construction()
+    benchmark_bit_packing()
+    benchmark_delta_replication()
+    benchmark_varint_handlers()
@@ -1,15 +1,46 @@
 import unittest
 
+from .. import backends
+from ..async_network import AsyncNetwork, AsyncSimpleNetwork, NetworkDatagramProtocol
+from ..backends import DatagramBackend, RecvmsgBackend, MultipleMessageBackend, get_best_backend
 from ..bitfield import BitField, USE_BITARRAY
-from ..descriptors import Attribute
+from ..bitstream import BitReader, BitWriter, get_bit_handler
+from ..channel import Channel, UPDATE_ID_MASK, is_newer_update
+from ..codecs import BitCodec, DeltaCodec, build_codec, get_attribute_flags
+from ..compression import Compressor, train_dictionary
+from ..connection import Connection
+from ..congestion import CongestionController, TokenBucket
+from ..cookies import HandshakeCookies
+from ..descriptors import Attribute, FromClass
+from ..encoding import VarIntCodec
+from ..enums import ConnectionProtocols, ConnectionStatus, Netmodes, Roles
+from ..flag_serialiser import FlagSerialiser
 from ..type_flag import TypeFlag
-from ..handlers import get_handler
+from ..handlers import get_handler, is_within_range, quantize_value, register_handler
 from ..native_handlers import *
+from ..network import NetworkConditions, NonBlockingSocketUDP, SimulatedSocketUDP
+from ..packet import Packet, PacketCollection
+from ..replicable import Replicable
+from ..reliability import HeaderFormat, CompactHeaderFormat, ReceivedWindow, SentWindow, RetransmissionTimer
 from ..struct import Struct
 from ..serialiser import *
+from ..signals import ReliableRPCSignal, Signal, UrgentRPCSignal
+from ..streams import Dispatcher, FragmentStream, OrderedLaneStream, ServerReplicationStream
+from ..timers import TimerWheel
+from ..world_info import WorldInfo
 
+from asyncio import new_event_loop, sleep as async_sleep
+from collections import OrderedDict
+from ctypes import set_errno
+from errno import EAGAIN, EBADF
+from time import clock, sleep
+from unittest.mock import patch
 
-__all__ = ["SerialiserTest", "run_tests"]
+import sys
+
+
+__all__ = ["SerialiserTest", "CodecTest", "DeltaCodecTest", "BitStreamTest", "ReliabilityTest", "FragmentTest", "LaneTest", "ReceiveBufferTest", "CompressionTest", "HandshakeCookieTest",
+           "ConnectionRegisterTest", "ConnectionTest", "SimulatedSocketTest", "TimerWheelTest", "BackendTest", "AsyncNetworkTest", "run_tests"]
 
 
 class SerialiserTest(unittest.TestCase):
@@ -103,6 +134,95 @@ class SerialiserTest(unittest.TestCase):
 
         self.assertIs(handler_int, UInt64)
 
+    def test_get_handler_memoized(self):
+        string_handler = get_handler(TypeFlag(str, max_length=300))
+
+        self.assertIs(get_handler(TypeFlag(str, max_length=300)), string_handler)
+        self.assertIsNot(get_handler(TypeFlag(str)), string_handler)
+
+        list_flag = TypeFlag(list, element_flag=TypeFlag(str))
+        self.assertIs(get_handler(list_flag), get_handler(TypeFlag(list, element_flag=TypeFlag(str))))
+
+    def test_get_handler_stateful(self):
+        class StatefulType:
+            pass
+
+        register_handler(StatefulType, lambda type_flag: [], is_callable=True, is_stateful=True)
+
+        self.assertIsNot(get_handler(TypeFlag(StatefulType)), get_handler(TypeFlag(StatefulType)))
+
+    def test_quantized_float(self):
+        float_flag = TypeFlag(float, min=-512, max=512, bits=18)
+        handler = get_handler(float_flag)
+
+        self.assertIsInstance(handler, QuantizedFloatHandler)
+        self.assertEqual(handler.size(), 4)
+
+        quantized_value = quantize_value(float_flag, 100.1234)
+        self.assertAlmostEqual(quantized_value, 100.1234, delta=handler.step_size / 2)
+        self.assertEqual(handler.unpack_from(handler.pack(100.1234))[0], quantized_value)
+        self.assertEqual(quantize_value(float_flag, quantized_value), quantized_value)
+
+        # Out of range values are clamped
+        self.assertEqual(handler.unpack_from(handler.pack(1000.0))[0], 512)
+        self.assertTrue(is_within_range(float_flag, 512.0))
+        self.assertFalse(is_within_range(float_flag, 1000.0))
+        self.assertTrue(is_within_range(TypeFlag(float), 1000.0))
+
+        writer = BitWriter()
+        get_bit_handler(float_flag).write(writer, 100.1234)
+        self.assertEqual(len(writer), 18)
+
+    def test_get_int_varint(self):
+        self.assertIs(get_handler(TypeFlag(int, encoding="varint")), VarIntHandler)
+        self.assertIs(get_handler(TypeFlag(int, max_value=2 ** 32 - 1, encoding="zigzag")), ZigZagHandler)
+        self.assertRaises(ValueError, get_handler, TypeFlag(int, encoding="unknown"))
+
+    def test_varint(self):
+        samples = [(0, b'\x00'), (127, b'\x7f'), (128, b'\x80\x01'), (300, b'\xac\x02'), (16383, b'\xff\x7f'),
+                   (16384, b'\x80\x80\x01'), (2 ** 21 - 1, b'\xff\xff\x7f'), (2 ** 21, b'\x80\x80\x80\x01'),
+                   (2 ** 32 - 1, b'\xff\xff\xff\xff\x0f')]
+
+        for value, bytes_string in samples:
+            self.assertEqual(VarIntHandler.pack(value), bytes_string)
+            self.assertEqual(VarIntHandler.unpack_from(b'\x00' + bytes_string, 1), (value, len(bytes_string)))
+            self.assertEqual(VarIntHandler.size(bytes_string), len(bytes_string))
+
+        self.assertEqual(VarIntHandler.unpack_from(VarIntHandler.pack(2 ** 70))[0], 2 ** 70)
+        self.assertEqual(VarIntCodec.encode_multiple([value for value, _ in samples]),
+                         b''.join(bytes_string for _, bytes_string in samples))
+
+        # Negative values are rejected by single and multiple value paths
+        for value in (-1, -128):
+            self.assertRaises(ValueError, VarIntHandler.pack, value)
+            self.assertRaises(ValueError, VarIntHandler.pack_multiple, [value], 1)
+        self.assertTrue(is_variable_sized(VarIntHandler))
+
+    def test_zigzag(self):
+        for value, size in ((0, 1), (-1, 1), (1, 1), (-64, 1), (64, 2), (-2 ** 40, 6)):
+            packed_value = ZigZagHandler.pack(value)
+            self.assertEqual(len(packed_value), size)
+            self.assertEqual(ZigZagHandler.unpack_from(packed_value), (value, size))
+
+    def test_varint_multiple(self):
+        for handler, values in ((VarIntHandler, [1, 2, 127, 0]), (VarIntHandler, [1, 200, 2 ** 40, 0]),
+                                (ZigZagHandler, [-1, 5, -300, 2 ** 40]), (VarIntHandler, [])):
+            packed_values = handler.pack_multiple(values, len(values))
+            self.assertEqual(packed_values, b''.join(handler.pack(v) for v in values))
+
+            unpacked_values = handler.unpack_multiple(memoryview(b'\x00' + packed_values + b'\x81'), len(values), 1)
+            self.assertEqual(unpacked_values, (values, len(packed_values)))
+
+        self.assertRaises(ValueError, VarIntHandler.unpack_multiple, b'\x01\x81', 2)
+
+    def test_iterable_varint_count(self):
+        handler = get_handler(TypeFlag(list, element_flag=TypeFlag(int, max_value=1000)))
+
+        for values in ([7] * 300 + [8], list(range(300))):
+            packed_values = handler.pack(values)
+            self.assertEqual(handler.unpack_from(packed_values), (values, len(packed_values)))
+            self.assertEqual(handler.size(packed_values), len(packed_values))
+
     def test_pack_struct(self):
         struct = self.create_struct()
         handler = StructHandler(TypeFlag(type(struct)))
@@ -194,5 +314,1319 @@ class SerialiserTest(unittest.TestCase):
         self.assertEqual(BoolHandler.unpack_from(self.bool_bytes)[0], self.bool_value)
 
 
+class CodecTest(unittest.TestCase):
+
+    arguments = OrderedDict([("alive", TypeFlag(bool)), ("health", TypeFlag(int, max_value=1000)),
+                             ("name", TypeFlag(str)), ("score", TypeFlag(int)), ("speed", TypeFlag(float)),
+                             ("visible", TypeFlag(bool)), ("x", TypeFlag(float)), ("y", TypeFlag(float))])
+
+    values = {"alive": True, "health": 800, "name": "Player", "score": 12, "speed": 1.5, "visible": False, "x": 2.0,
+              "y": -4.0}
+
+    def test_same_format_as_flag_serialiser(self):
+        codec = build_codec("TestCodec", self.arguments)
+        serialiser = FlagSerialiser(self.arguments)
+
+        samples = [self.values, {"x": 1.0, "y": 2.0}, {"x": 1.0, "speed": None}, {"name": None, "visible": True},
+                   {"alive": None}, {"score": 3}, {}]
+
+        for data in samples:
+            packed_data = codec.pack(data)
+            self.assertEqual(packed_data, serialiser.pack(data))
+            self.assertEqual(dict(codec.unpack(packed_data)), data)
+            self.assertEqual(dict(serialiser.unpack(packed_data)), data)
+
+    def test_unpack_offset(self):
+        codec = build_codec("TestCodec", self.arguments)
+        packed_data = b'\x00\x00' + codec.pack(self.values)
+
+        self.assertEqual(dict(codec.unpack(memoryview(packed_data), offset=2)), self.values)
+
+    def test_attribute_flags_from_class(self):
+        class BoundedStruct(Struct):
+            x_max = 16
+
+            x = Attribute(0.0, min=0, max=FromClass("x_max"), bits=8)
+
+        class WideStruct(BoundedStruct):
+            x_max = 64
+
+        self.assertEqual(get_attribute_flags(BoundedStruct)["x"].data, {"min": 0, "max": 16, "bits": 8})
+        self.assertEqual(get_attribute_flags(WideStruct)["x"].data, {"min": 0, "max": 64, "bits": 8})
+
+        struct = WideStruct()
+        struct.x = 32.0
+        self.assertAlmostEqual(WideStruct.from_bytes(struct.to_bytes()).x, 32.0, delta=0.5)
+
+
+class DeltaCodecTest(unittest.TestCase):
+
+    arguments = OrderedDict([("health", TypeFlag(int, max_value=1000)), ("name", TypeFlag(str)),
+                             ("path", TypeFlag(list, element_flag=TypeFlag(int))), ("score", TypeFlag(int)),
+                             ("x", TypeFlag(float)), ("y", TypeFlag(float, min=-10, max=10, bits=16))])
+
+    baseline = {"health": 800, "name": "Player", "path": [1, 2, 3, 4], "score": 12, "x": 2.0, "y": 0.5}
+
+    def create_codec(self):
+        return DeltaCodec(self.arguments, build_codec("TestCodec", self.arguments))
+
+    def test_delta_names(self):
+        self.assertEqual(self.create_codec().delta_names, {"health", "path", "score", "x", "y"})
+
+    def test_delta_smaller_than_full(self):
+        codec = self.create_codec()
+        data = {"health": 801, "path": [1, 2, 5, 4], "x": 2.5, "y": 0.25}
+
+        packed_data = codec.pack(data, self.baseline)
+        self.assertLess(len(packed_data), len(codec.codec.pack(data)))
+
+        unpacked_data = dict(codec.unpack(packed_data, self.baseline))
+        self.assertEqual(unpacked_data, {k: quantize_value(self.arguments[k], v) for k, v in data.items()})
+
+        # Baseline is not modified
+        self.assertEqual(self.baseline["path"], [1, 2, 3, 4])
+
+    def test_full_fallback(self):
+        codec = self.create_codec()
+        baseline = dict(self.baseline, score=None)
+        samples = [{"score": 3}, {"name": "Other", "health": None}, {"path": [1, 2]}, {}]
+
+        for data in samples:
+            packed_data = b'\x00' + codec.pack(data, baseline)
+            self.assertEqual(dict(codec.unpack(packed_data, baseline, offset=1)), data)
+
+    def test_channel_baselines(self):
+        class DeltaReplicable(Replicable):
+            score = Attribute(0, max_value=1000)
+            speed = Attribute(0.0)
+
+            def conditions(self, is_owner, is_complaint, is_initial):
+                yield "score"
+                yield "speed"
+
+        previous_netmode = WorldInfo.netmode
+        try:
+            WorldInfo.netmode = Netmodes.server
+            server_replicable = DeltaReplicable(register_immediately=True)
+            server_channel = Channel(None, server_replicable)
+            server_channel.acknowledge_creation(None)
+
+            WorldInfo.netmode = Netmodes.client
+            client_replicable = DeltaReplicable(register_immediately=True)
+            client_channel = Channel(None, client_replicable)
+
+            WorldInfo.netmode = Netmodes.server
+            server_replicable.score = 10
+            client_channel.set_attributes(server_channel.get_attributes(False))
+            server_channel.acknowledge_update(server_channel.update_sequence, None)
+            self.assertEqual(server_channel.baseline_sequence, 1)
+
+            # Lost update, later update is against the same baseline
+            server_replicable.score = 20
+            server_channel.get_attributes(False)
+
+            server_replicable.speed = 2.0
+            client_channel.set_attributes(server_channel.get_attributes(False))
+            self.assertEqual((client_replicable.score, client_replicable.speed), (20, 2.0))
+
+            # Out of date updates are not applied
+            server_replicable.score = 30
+            late_update = server_channel.get_attributes(False)
+            server_replicable.score = 40
+            client_channel.set_attributes(server_channel.get_attributes(False))
+            client_channel.set_attributes(late_update)
+            self.assertEqual(client_replicable.score, 40)
+
+            # Unchanged since acknowledged baseline
+            server_channel.acknowledge_update(server_channel.update_sequence, None)
+            self.assertIsNone(server_channel.get_attributes(False))
+
+            server_replicable.deregister(immediately=True)
+            client_replicable.deregister(immediately=True)
+
+        finally:
+            WorldInfo.netmode = previous_netmode
+
+    def test_lost_initial_update(self):
+        previous_netmode = WorldInfo.netmode
+        try:
+            WorldInfo.netmode = Netmodes.server
+            owner = Replicable(register_immediately=True)
+            server_replicable = Replicable(register_immediately=True)
+            server_replicable.roles.remote = Roles.simulated_proxy
+            server_replicable.owner = owner
+
+            server_channel = Channel(None, server_replicable)
+            server_channel.acknowledge_creation(None)
+
+            WorldInfo.netmode = Netmodes.client
+            client_replicable = Replicable(register_immediately=True)
+            client_channel = Channel(None, client_replicable)
+
+            # Initial and complaint attributes are sent until an update carrying them is acknowledged
+            WorldInfo.netmode = Netmodes.server
+            server_channel.get_attributes(False)
+
+            client_channel.set_attributes(server_channel.get_attributes(False))
+            self.assertEqual(client_replicable.owner.instance_id, owner.instance_id)
+            self.assertEqual(client_replicable.roles.local, Roles.simulated_proxy)
+
+            server_channel.acknowledge_update(server_channel.update_sequence, None)
+            self.assertIsNone(server_channel.get_attributes(False))
+
+            # Lost complaint
+            server_replicable.owner = None
+            server_channel.get_attributes(False)
+
+            client_channel.set_attributes(server_channel.get_attributes(False))
+            self.assertIsNone(client_replicable.owner)
+
+            server_channel.acknowledge_update(server_channel.update_sequence, None)
+            self.assertIsNone(server_channel.get_attributes(False))
+
+            for replicable in (server_replicable, client_replicable, owner):
+                replicable.deregister(immediately=True)
+
+        finally:
+            WorldInfo.netmode = previous_netmode
+
+    def test_update_id_wraparound(self):
+        self.assertTrue(is_newer_update(1, UPDATE_ID_MASK))
+        self.assertFalse(is_newer_update(UPDATE_ID_MASK, 1))
+        self.assertFalse(is_newer_update(5, 5))
+
+
+class BitStreamTest(unittest.TestCase):
+
+    def test_write_read(self):
+        writer = BitWriter()
+        writer.write(100, 7)
+        writer.write_bool(True)
+        writer.write(5, 3)
+        writer.write_bytes(b'ab')
+
+        self.assertEqual(len(writer), 27)
+
+        packed_data = writer.to_bytes()
+        self.assertEqual(len(packed_data), 4)
+
+        reader = BitReader(b'\xff' + packed_data, offset=1)
+        self.assertEqual(reader.read(7), 100)
+        self.assertTrue(reader.read_bool())
+        self.assertEqual(reader.read(3), 5)
+        self.assertEqual(reader.read(16), int.from_bytes(b'ab', 'big'))
+        self.assertRaises(ValueError, reader.read, 8)
+
+    def test_write_overflow(self):
+        self.assertRaises(ValueError, BitWriter().write, 128, 7)
+
+    def test_bit_codec(self):
+        arguments = OrderedDict([("alive", TypeFlag(bool)), ("health", TypeFlag(int, max_value=100)),
+                                 ("name", TypeFlag(str)), ("speed", TypeFlag(float)), ("visible", TypeFlag(bool))])
+        codec = BitCodec(arguments)
+
+        data = {"alive": True, "health": 100, "name": "Player", "speed": 0.5, "visible": False}
+        packed_data = codec.pack(data)
+
+        # Header (5 + 1 bits), alive, health (7 bits), aligned name (7 bytes), speed and visible (33 bits)
+        self.assertEqual(len(packed_data), 2 + 7 + 5)
+        self.assertEqual(dict(codec.unpack(packed_data)), data)
+
+        for data in ({"health": 3}, {"name": None, "visible": True}, {}):
+            self.assertEqual(dict(codec.unpack(b'\x00' + codec.pack(data), offset=1)), data)
+
+    def test_bit_packed_struct(self):
+        class BitPackedStruct(Struct):
+            use_bit_packing = True
+
+            health = Attribute(0, max_value=100)
+            armour = Attribute(0, max_value=100)
+            alive = Attribute(True)
+
+        struct = BitPackedStruct()
+        struct.health = 50
+        struct.armour = 20
+
+        self.assertIsInstance(struct._serialiser, BitCodec)
+        self.assertEqual(len(struct.to_bytes()), 3)
+
+        new_struct = BitPackedStruct.from_bytes(struct.to_bytes())
+        self.assertEqual((new_struct.health, new_struct.armour, new_struct.alive), (50, 20, True))
+
+    def test_bit_packing_restricted(self):
+        class FloatStruct(Struct):
+            use_bit_packing = True
+
+            x = Attribute(0.0)
+            y = Attribute(0.0)
+            alive = Attribute(True)
+
+        # Full width floats gain too little from bit packing
+        struct = FloatStruct()
+        self.assertNotIsInstance(struct._serialiser, BitCodec)
+
+        struct.x = 2.0
+        self.assertEqual(FloatStruct.from_bytes(struct.to_bytes()).x, 2.0)
+
+
+class ReliabilityTest(unittest.TestCase):
+
+    window_size = 32
+    sequence_max_size = 2 ** 16 - 1
+
+    def test_received_window_mask(self):
+        window = ReceivedWindow(self.window_size, self.sequence_max_size)
+
+        for sequence in (1, 2, 4, 3):
+            window.receive(sequence)
+
+        self.assertEqual(window.latest_sequence, 4)
+        self.assertEqual(window.ack_mask, 0b111)
+
+    def test_received_window_wraps(self):
+        window = ReceivedWindow(self.window_size, self.sequence_max_size)
+
+        for sequence in (self.sequence_max_size - 1, self.sequence_max_size, 1):
+            window.receive(sequence)
+
+        self.assertEqual(window.latest_sequence, 1)
+        self.assertEqual(window.ack_mask, 0b110)
+
+    def test_received_window_gap(self):
+        window = ReceivedWindow(self.window_size, self.sequence_max_size)
+
+        gaps = []
+        for sequence in (1, 2, 4, 3, 5):
+            window.receive(sequence)
+            gaps.append(window.gap_detected)
+
+        self.assertEqual(gaps, [False, False, True, False, False])
+
+    def test_received_window_duplicate(self):
+        window = ReceivedWindow(self.window_size, self.sequence_max_size)
+        window.receive(5)
+        window.receive(3)
+
+        self.assertFalse(window.receive(5))
+        self.assertFalse(window.receive(3))
+
+    def test_sent_window_acknowledge(self):
+        window = SentWindow(self.window_size, self.sequence_max_size)
+
+        for sequence in range(1, 6):
+            window.add(sequence, sequence * 10)
+
+        acknowledged = window.acknowledge(5, 0b1010)
+        self.assertEqual(sorted(s for s, *_ in acknowledged), [1, 3, 5])
+        self.assertEqual(len(window), 2)
+
+    def test_header_format_default(self):
+        header_format = HeaderFormat()
+        ack_mask = BitField(self.window_size)
+        ack_mask[:4] = [True, True, False, True]
+
+        ack_mask_bytes = get_handler(TypeFlag(BitField, fields=self.window_size)).pack(ack_mask)
+        self.assertEqual(header_format.pack(5, 7, 0b1011), UInt16.pack(5) + UInt16.pack(7) + ack_mask_bytes)
+
+    def test_header_format_extended(self):
+        header_format = HeaderFormat(128, 32)
+        ack_mask = (1 << 127) | 0b101
+
+        header = header_format.pack(70000, 65537, ack_mask)
+        self.assertEqual(header_format.unpack_from(header), (70000, 65537, ack_mask, 0, header_format.size))
+        self.assertEqual(HeaderFormat.read_ack_base(header), 65537 & 0xFFFF)
+
+        header_format = HeaderFormat(has_flags=True)
+        header = header_format.pack(1, 2, 0, HeaderFormat.compressed)
+        self.assertEqual(header_format.unpack_from(header), (1, 2, 0, HeaderFormat.compressed, header_format.size))
+
+    def test_compact_header_format(self):
+        full_mask = (1 << self.window_size) - 1
+        header_format = CompactHeaderFormat(has_flags=True)
+
+        # No lost sequences, and a small delta
+        header = header_format.pack(9, 5, full_mask)
+        self.assertEqual(len(header), 4)
+        self.assertEqual(header_format.unpack_from(header), (9, 5, full_mask, 0, 4))
+
+        # Wrapped sequence with a large delta
+        header = header_format.pack(3, 65000, full_mask ^ 0b10, HeaderFormat.compressed)
+        self.assertEqual(header_format.unpack_from(header), (3, 65000, full_mask ^ 0b10, HeaderFormat.compressed,
+                                                            len(header)))
+        self.assertEqual(HeaderFormat.read_ack_base(header), 65000)
+
+        # Flag bits are neither written nor read without flags
+        header_format = CompactHeaderFormat()
+        self.assertEqual(header_format.pack(9, 5, full_mask, HeaderFormat.compressed),
+                         header_format.pack(9, 5, full_mask))
+        self.assertEqual(header_format.unpack_from(header)[3], 0)
+
+        header_format = CompactHeaderFormat(128, 32)
+        header = header_format.pack(70000, 200000, 0b101)
+        self.assertEqual(header_format.unpack_from(header), (70000, 200000, 0b101, 0, len(header)))
+        self.assertLessEqual(len(header), header_format.size)
+
+    def test_compact_packet_headers(self):
+        header_format = CompactHeaderFormat()
+        members = [Packet(protocol=2, payload=b'abc'), Packet(protocol=20, payload=bytes(300))]
+
+        data = header_format.pack_packets(members)
+        self.assertEqual(len(data), 1 + 3 + 3 + 300)
+
+        packets = header_format.unpack_packets(data).members
+        self.assertEqual([(p.protocol, bytes(p.payload)) for p in packets], [(2, b'abc'), (20, bytes(300))])
+
+    def test_sent_window_dropped(self):
+        window = SentWindow(self.window_size, self.sequence_max_size)
+
+        for sequence in range(1, 41):
+            window.add(sequence, sequence)
+
+        window.acknowledge(40, 0)
+        self.assertEqual(window.take_dropped(40), list(range(1, 9)))
+
+    def test_sent_window_expired(self):
+        window = SentWindow(self.window_size, self.sequence_max_size)
+
+        for sequence in range(1, 6):
+            window.add(sequence, sequence, sent_time=sequence / 10)
+
+        expired = window.find_expired(0.3)
+        self.assertEqual([s for s, *_ in expired], [1, 2, 3])
+        self.assertEqual(window.find_expired(0.3), [])
+
+        # Retransmitted entries are acknowledged as such, but not dropped
+        window.mark_retransmitted(2)
+        window.mark_retransmitted(3)
+        acknowledged = window.acknowledge(3, 0)
+        self.assertEqual([(s, r) for s, _, _, r in acknowledged], [(3, True)])
+
+        window.add(40, 40, sent_time=4.0)
+        self.assertEqual(window.take_dropped(40), [1, 4, 5])
+
+    def test_retransmission_timer(self):
+        timer = RetransmissionTimer(minimum_timeout=0.0, clock_granularity=0.0)
+        timer.on_sample(0.1)
+        self.assertAlmostEqual(timer.timeout, 0.1 + 4 * 0.05)
+
+        timer.on_sample(0.1)
+        self.assertAlmostEqual(timer.rtt_variance, 0.0375)
+        self.assertAlmostEqual(timer.timeout, 0.1 + 4 * 0.0375)
+
+        timer.on_expired()
+        self.assertAlmostEqual(timer.timeout, 2 * (0.1 + 4 * 0.0375))
+
+    def test_congestion_controller(self):
+        controller = CongestionController(1000, 100, 10000, 100)
+        controller.on_ack(0.0, 0.1)
+
+        # Only grow when limited by rate
+        controller.on_ack(0.2, 0.1)
+        self.assertEqual(controller.rate, 1000)
+
+        controller.on_rate_limited()
+        controller.on_ack(0.4, 0.1)
+        self.assertEqual(controller.rate, 2000)
+
+        # At most once per round trip
+        controller.on_rate_limited()
+        controller.on_ack(0.45, 0.1)
+        self.assertEqual(controller.rate, 2000)
+
+        controller.on_congestion(0.5)
+        self.assertEqual(controller.rate, 1000)
+        self.assertFalse(controller.in_slow_start)
+
+        controller.on_rate_limited()
+        controller.on_ack(0.7, 0.1)
+        self.assertEqual(controller.rate, 1100)
+
+    def test_token_bucket(self):
+        bucket = TokenBucket(10000, burst_duration=0.1, minimum_capacity=0)
+        self.assertEqual(bucket.refill(0.0), 1000)
+
+        bucket.consume(1500)
+        self.assertEqual(bucket.tokens, -500)
+        self.assertAlmostEqual(bucket.refill(0.1), 500)
+        self.assertAlmostEqual(bucket.refill(1.0), 1000)
+
+
+class FragmentTest(unittest.TestCase):
+
+    class ReceiverStream:
+
+        def __init__(self, dispatcher):
+            self.received = []
+
+        def handle_packets(self, packet_collection):
+            self.received.extend(packet_collection)
+
+    def setUp(self):
+        self.sender = FragmentStream(Dispatcher())
+
+        dispatcher = Dispatcher()
+        self.receiver = dispatcher.create_stream(FragmentStream)
+        self.received = dispatcher.create_stream(self.ReceiverStream).received
+
+    def test_reassembly(self):
+        acknowledged = []
+        payload = bytes(range(256)) * 10
+        message = Packet(protocol=7, payload=payload, on_success=acknowledged.append)
+        small_packet = Packet(protocol=1)
+
+        self.assertEqual(self.sender.divert_oversized([message, small_packet]), [small_packet])
+
+        fragments = list(self.sender.pull_packets(False, 10000))
+        self.assertEqual(len(fragments), 3)
+
+        # Out of order, with a resent fragment
+        for fragment in fragments[2], fragments[0], fragments[0], fragments[1], fragments[2]:
+            self.receiver.handle_fragment(fragment.payload)
+
+        self.assertEqual(len(self.received), 1)
+        self.assertEqual(self.received[0].protocol, 7)
+        self.assertEqual(self.received[0].payload, payload)
+
+        for fragment in fragments:
+            self.assertFalse(acknowledged)
+            fragment.on_ack()
+
+        self.assertEqual(acknowledged, [message])
+        self.assertIsNone(self.sender.pull_packets(False, 10000))
+
+    def test_reassembly_bounded(self):
+        self.receiver.max_reassembly_size = 4096
+
+        first = Packet(protocol=1, payload=bytes(3000))
+        second = Packet(protocol=2, payload=bytes(3000))
+        self.sender.divert_oversized([first, second])
+
+        fragments = list(self.sender.pull_packets(False, 10000))
+
+        # Receive all but the last fragment of each message
+        for fragment in fragments[:2] + fragments[3:5]:
+            self.receiver.handle_fragment(fragment.payload)
+
+        # Least recently received message is discarded to complete the other
+        self.receiver.handle_fragment(fragments[5].payload)
+        self.receiver.handle_fragment(fragments[2].payload)
+
+        self.assertEqual([p.protocol for p in self.received], [2])
+
+
+class LaneTest(unittest.TestCase):
+
+    class ReceiverStream:
+
+        def __init__(self, dispatcher):
+            self.received = []
+
+        def handle_packets(self, packet_collection):
+            self.received.extend(packet_collection)
+
+    def setUp(self):
+        self.sender = OrderedLaneStream(Dispatcher())
+
+        dispatcher = Dispatcher()
+        self.receiver = dispatcher.create_stream(OrderedLaneStream)
+        self.received = dispatcher.create_stream(self.ReceiverStream).received
+
+    def test_independent_lanes(self):
+        acknowledged = []
+
+        for payload in b'abc':
+            self.sender.queue_packet(0, Packet(protocol=1, payload=bytes([payload]), on_success=acknowledged.append))
+
+        self.sender.queue_packet(1, Packet(protocol=2, payload=b'd'))
+
+        first, second, third, other = self.sender.pull_packets(False, 10000)
+
+        # Loss in lane 0 does not delay lane 1
+        for packet in third, other, second, second:
+            self.receiver.handle_lane_packet(packet.payload)
+
+        self.assertEqual([(p.protocol, p.payload) for p in self.received], [(2, b'd')])
+        self.assertEqual(self.receiver.metrics[0].buffered, 2)
+
+        # Lane 0 is delivered in order once the gap is filled, ignoring resent packets
+        self.receiver.handle_lane_packet(first.payload)
+        self.receiver.handle_lane_packet(third.payload)
+
+        self.assertEqual([p.payload for p in self.received], [b'd', b'a', b'b', b'c'])
+
+        metrics = self.receiver.metrics[0]
+        self.assertEqual((metrics.buffered, metrics.max_buffered, metrics.stall_count), (0, 2, 1))
+        self.assertEqual(self.receiver.metrics[1].stall_count, 0)
+
+        for packet in first, second, third:
+            packet.on_ack()
+
+        self.assertEqual(len(acknowledged), 3)
+
+    def test_lane_window(self):
+        self.sender.lane_window = 2
+
+        for i in range(3):
+            self.sender.queue_packet(0, Packet(protocol=1, reliable=True))
+
+        packets = list(self.sender.pull_packets(False, 10000))
+        self.assertEqual(len(packets), 2)
+        self.assertIsNone(self.sender.pull_packets(False, 10000))
+
+        packets[0].on_ack()
+        self.assertEqual(len(self.sender.pull_packets(False, 10000).members), 1)
+
+
+class ReceiveBufferTest(unittest.TestCase):
+
+    class ReceiverStream:
+
+        def __init__(self, dispatcher):
+            self.received = []
+
+        def handle_packets(self, packet_collection):
+            self.received.extend(packet_collection)
+
+    def setUp(self):
+        self.fragment_sender = FragmentStream(Dispatcher())
+        self.lane_sender = OrderedLaneStream(Dispatcher())
+
+        dispatcher = Dispatcher()
+        self.fragment_receiver = dispatcher.create_stream(FragmentStream)
+        self.lane_receiver = dispatcher.create_stream(OrderedLaneStream)
+        self.received = dispatcher.create_stream(self.ReceiverStream).received
+
+        # Pooled receive buffer, reused for each datagram
+        self.buffer = bytearray(4096)
+        self.view = memoryview(self.buffer)
+
+    def receive(self, packets):
+        data = PacketCollection(packets).to_bytes()
+        self.buffer[:len(data)] = data
+        return PacketCollection.from_bytes(self.view[:len(data)])
+
+    def reuse_buffer(self):
+        self.buffer[:] = bytes(len(self.buffer))
+
+    def test_read_from_offsets(self):
+        small = Packet(protocol=1, payload=b'small')
+        large = Packet(protocol=2, payload=bytes(range(200)))
+        data = b'header' + small.to_bytes() + large.to_bytes()
+        self.buffer[:len(data)] = data
+
+        first = Packet()
+        offset = first.read_from(self.view, 6)
+        self.assertEqual(offset, 6 + len(small.to_bytes()))
+
+        second = Packet()
+        self.assertEqual(second.read_from(self.view, offset), len(data))
+
+        # Small payloads are copied, larger payloads are views of the buffer
+        self.assertIsInstance(first.payload, bytes)
+        self.assertIsInstance(second.payload, memoryview)
+        self.assertEqual((first.protocol, second.protocol), (1, 2))
+        self.assertEqual(bytes(second.payload), large.payload)
+
+        retained = bytes(second.payload)
+        self.reuse_buffer()
+        self.assertEqual(first.payload, b'small')
+        self.assertEqual(retained, large.payload)
+
+    def test_streams_retain_copies(self):
+        message = bytes(range(256)) * 8
+        self.fragment_sender.divert_oversized([Packet(protocol=7, payload=message)])
+        fragments = list(self.fragment_sender.pull_packets(False, 10000))
+
+        lane_payloads = [bytes([i]) * 300 for i in range(2)]
+        for payload in lane_payloads:
+            self.lane_sender.queue_packet(0, Packet(protocol=8, payload=payload))
+        lane_packets = list(self.lane_sender.pull_packets(False, 10000))
+
+        bytes_handler = get_handler(TypeFlag(bytes))
+        value = bytes(range(255, 0, -1))
+        bytes_packet = Packet(protocol=9, payload=bytes_handler.pack(value))
+
+        # Fragments and lane packets arrive out of order, in separate datagrams sharing one buffer
+        self.fragment_receiver.handle_packets(self.receive(fragments[1:]))
+        self.reuse_buffer()
+        self.lane_receiver.handle_packets(self.receive(lane_packets[1:]))
+        self.reuse_buffer()
+
+        received_value = None
+        for packet in self.receive([bytes_packet]):
+            received_value = bytes_handler.unpack_from(packet.payload)[0]
+        self.reuse_buffer()
+
+        self.assertEqual(received_value, value)
+        self.assertIsInstance(received_value, bytes)
+        self.assertFalse(self.received)
+
+        # Completing the message and lane delivers the payloads retained from reused buffers
+        self.fragment_receiver.handle_packets(self.receive(fragments[:1]))
+        self.lane_receiver.handle_packets(self.receive(lane_packets[:1]))
+        self.reuse_buffer()
+
+        self.assertEqual([(p.protocol, bytes(p.payload)) for p in self.received],
+                         [(7, message)] + [(8, payload) for payload in lane_payloads])
+
+
+class CompressionTest(unittest.TestCase):
+
+    def test_compress_with_dictionary(self):
+        samples = [b'\x01PlayerController' + bytes([i]) * 4 for i in range(8)]
+        compressor = Compressor(train_dictionary(samples), threshold=16)
+
+        data = samples[0] + samples[1]
+        compressed_data, compressed = compressor.compress(data)
+
+        self.assertTrue(compressed)
+        self.assertLess(len(compressed_data), len(data))
+        self.assertEqual(compressor.decompress(compressed_data), data)
+        self.assertLess(compressor.metrics.ratio, 1.0)
+
+        self.assertEqual(compressor.compress(samples[0][:8]), (samples[0][:8], False))
+
+    def test_decompress_bounded(self):
+        compressor = Compressor(threshold=0, max_size=1024)
+
+        compressed_data, compressed = compressor.compress(bytes(1024))
+        self.assertTrue(compressed)
+        self.assertEqual(compressor.decompress(compressed_data), bytes(1024))
+
+        # Output is limited to the maximum size
+        compressed_data, _ = compressor.compress(bytes(1025))
+        with self.assertRaises(ValueError):
+            compressor.decompress(compressed_data)
+
+        # Truncated and invalid data are rejected
+        with self.assertRaises(ValueError):
+            compressor.decompress(compressed_data[:-2])
+
+        with self.assertRaises(ValueError):
+            compressor.decompress(b'\xff' * 16)
+
+
+class HandshakeCookieTest(unittest.TestCase):
+
+    address = "127.0.0.1", 1200
+
+    def test_validate_cookie(self):
+        cookies = HandshakeCookies()
+        cookie = cookies.create_cookie(self.address)
+
+        self.assertTrue(cookies.validate_cookie(cookie, self.address))
+        self.assertFalse(cookies.validate_cookie(cookie, ("127.0.0.1", 1201)))
+        self.assertFalse(HandshakeCookies().validate_cookie(cookie, self.address))
+
+    def test_read_handshake_request(self):
+        cookies = HandshakeCookies()
+        cookie = cookies.create_cookie(self.address)
+
+        request = HeaderFormat().pack(9, 0, 0) + \
+            Packet(protocol=ConnectionProtocols.handshake_cookie, payload=cookie).to_bytes() + \
+            Packet(protocol=ConnectionProtocols.request_handshake, payload=b'\x01').to_bytes()
+
+        self.assertEqual(cookies.read_handshake_request(request), (9, cookie, True))
+        self.assertEqual(cookies.read_handshake_request(request[:-1]), (9, cookie, False))
+        self.assertEqual(cookies.read_handshake_request(request[:4]), (None, None, False))
+
+
+class ConnectionRegisterTest(unittest.TestCase):
+
+    address = "127.0.0.1", 1200
+    other_address = "127.0.0.1", 1201
+
+    def tearDown(self):
+        Connection.clear_graph()
+        self.assertFalse(Connection.by_address)
+
+    def test_pending_lookup(self):
+        connection = Connection(self.address)
+
+        self.assertFalse(connection.registered)
+        self.assertIs(Connection.by_address[self.address], connection)
+        self.assertIs(Connection.get_from_graph(self.address, only_registered=False), connection)
+        self.assertIs(Connection.create_connection(*self.address), connection)
+
+        Connection.update_graph()
+        self.assertTrue(connection.registered)
+        self.assertIs(Connection.by_address[self.address], connection)
+
+    def test_reregistration(self):
+        connection = Connection(self.address)
+        connection.register(self.other_address)
+
+        self.assertEqual(list(Connection.by_address), [self.other_address])
+
+        Connection.update_graph()
+        self.assertIs(Connection[self.other_address], connection)
+        self.assertIs(Connection.by_address[self.other_address], connection)
+
+        # Deregistering a replaced connection leaves the entry of its replacement
+        replaced = Connection(self.address)
+        replacement = Connection(self.address)
+        self.assertIs(Connection.by_address[self.address], replacement)
+
+        replaced.deregister(immediately=True)
+        self.assertIs(Connection.by_address[self.address], replacement)
+
+    def test_deregister_before_registration(self):
+        connection = Connection(self.address)
+        connection.deregister(immediately=True)
+
+        self.assertNotIn(self.address, Connection.by_address)
+
+        Connection.update_graph()
+        self.assertFalse(connection.registered)
+
+        # Removal by ID also prevents registration
+        connection = Connection(self.address)
+        self.assertIs(Connection.remove_from_graph(self.address), connection)
+        self.assertNotIn(self.address, Connection.by_address)
+
+        Connection.update_graph()
+        self.assertFalse(connection.registered)
+
+        # Deferred deregistration
+        connection = Connection(self.address)
+        connection.deregister()
+        Connection.update_graph()
+
+        self.assertFalse(connection.registered)
+        self.assertNotIn(self.address, Connection.by_address)
+
+
+class ConnectionTest(unittest.TestCase):
+
+    class ReceiverStream:
+
+        def __init__(self, dispatcher):
+            self.received = []
+
+        def handle_packets(self, packet_collection):
+            self.received.extend(packet_collection)
+
+        def pull_packets(self, network_tick, bandwidth):
+            return None
+
+    def setUp(self):
+        self.server = Connection(("127.0.0.1", 1200))
+
+        with patch.object(WorldInfo, "netmode", Netmodes.client):
+            self.client = Connection(("127.0.0.1", 1201))
+
+        self.server_received = self.server.dispatcher.create_stream(self.ReceiverStream).received
+
+    def tearDown(self):
+        Connection.clear_graph()
+
+    def read_protocols(self, connection, datagram):
+        header_format = connection.send_format
+        offset = header_format.unpack_from(datagram)[-1]
+        return [p.protocol for p in header_format.unpack_packets(datagram, offset)]
+
+    def connect(self):
+        for connection in self.server, self.client:
+            connection.handshake.status = ConnectionStatus.connected
+
+    def test_datagrams_within_mtu(self):
+        self.connect()
+
+        payloads = [bytes([i]) * (i * 37 % 700) for i in range(25)]
+        self.client.injector.queue.extend(Packet(protocol=50, payload=payload) for payload in payloads)
+
+        datagrams = self.client.send(False)
+        self.assertGreater(len(datagrams), 1)
+
+        for datagram in datagrams:
+            self.assertLessEqual(len(datagram), self.client.mtu)
+            self.server.receive(datagram)
+
+        # Order is preserved across datagrams
+        self.assertEqual([bytes(p.payload) for p in self.server_received], payloads)
+
+    def test_oversized_packet(self):
+        self.connect()
+
+        # Packets which are not fragmented are sent alone
+        small = Packet(protocol=50, payload=bytes(10))
+        oversized = Packet(protocol=50, payload=bytes(self.client.mtu * 2))
+        self.assertEqual(self.client.split_datagrams([small, oversized, small]), [[small], [oversized], [small]])
+
+        # Otherwise they are fragmented
+        payload = bytes(range(256)) * 20
+        self.client.injector.queue.append(Packet(protocol=50, payload=payload))
+
+        datagrams = self.client.send(False) + self.client.send(False)
+
+        for datagram in datagrams:
+            self.assertLessEqual(len(datagram), self.client.mtu)
+            self.server.receive(datagram)
+
+        self.assertEqual([bytes(p.payload) for p in self.server_received if p.protocol == 50], [payload])
+
+    def test_split_reliable_packets_acknowledged(self):
+        self.connect()
+
+        acknowledged = []
+        packets = [Packet(protocol=50, payload=bytes([i]) * 300, on_success=acknowledged.append) for i in range(10)]
+        self.client.injector.queue.extend(packets)
+
+        datagrams = self.client.send(False)
+        self.assertGreater(len(datagrams), 1)
+
+        for datagram in datagrams:
+            self.server.receive(datagram)
+
+        for datagram in self.server.send(False):
+            self.client.receive(datagram)
+
+        self.assertCountEqual(acknowledged, packets)
+
+    def test_keepalive_interval(self):
+        self.connect()
+
+        # Idle connections send keepalives, and defer network ticks until then
+        self.server.send(False)
+        send_time = self.server.last_send_time
+        keepalive_time = send_time + self.server.keepalive_interval
+
+        self.assertEqual(self.server.send_scheduled(True, keepalive_time - 0.05), [])
+        self.assertTrue(self.server.network_tick_pending)
+        self.assertTrue(self.server.is_send_due(keepalive_time))
+
+    def test_send_rate_cap(self):
+        self.connect()
+        interval = 1 / self.server.send_rate
+
+        for _ in range(2):
+            self.server.injector.queue.append(Packet(protocol=50, payload=bytes(10)))
+            self.server.send(False)
+
+        # Sends with data are paced at the target send rate, permitting sends up to half an interval early
+        send_time = self.server.last_send_time
+        self.assertFalse(self.server.is_send_due(send_time + 0.4 * interval))
+        self.assertEqual(self.server.send_scheduled(False, send_time + 0.4 * interval), [])
+        self.assertTrue(self.server.is_send_due(send_time + 0.5 * interval))
+
+    def test_reliable_data_scheduled(self):
+        self.connect()
+        interval = 1 / self.server.send_rate
+
+        self.server.send(False)
+        send_time = self.server.last_send_time
+        self.assertFalse(self.server.is_send_due(send_time + interval))
+
+        # Queued reliable data is sent at the target send rate, instead of with the next keepalive
+        self.server.lanes.queue_packet(0, Packet(protocol=50, payload=b'reliable'))
+        self.assertTrue(self.server.is_send_due(send_time + interval))
+
+    def test_reliable_rpc_scheduled(self):
+        self.connect()
+        interval = 1 / self.server.send_rate
+
+        other = Connection(("127.0.0.1", 1202))
+        other.handshake.status = ConnectionStatus.connected
+
+        streams = self.create_replication_streams(self.server, other)
+
+        for connection in self.server, other:
+            connection.send(False)
+
+        # Only the connection which owns the replicable sends sooner
+        ReliableRPCSignal.invoke(target=streams[0].replicable)
+
+        self.assertTrue(self.server.is_send_due(self.server.last_send_time + interval))
+        self.assertFalse(other.is_send_due(other.last_send_time + interval))
+
+    def create_replication_streams(self, *connections):
+        streams = []
+
+        with patch.object(WorldInfo, "rules") as rules:
+            rules.post_initialise.side_effect = lambda stream: object()
+
+            for connection in connections:
+                stream = connection.dispatcher.create_stream(ServerReplicationStream)
+                self.addCleanup(stream.unregister_signals)
+                streams.append(stream)
+
+        self.addCleanup(Signal.update_graph)
+        Signal.update_graph()
+
+        return streams
+
+    def test_urgent_flush(self):
+        self.connect()
+
+        sent = []
+        self.server.on_urgent_data = sent.append
+        self.server.send(False)
+
+        # Urgent data is sent immediately
+        self.server.injector.queue.append(Packet(protocol=50, payload=b'urgent'))
+        self.server.dispatcher.send_urgent()
+
+        self.assertEqual(len(sent), 1)
+        self.assertEqual(self.read_protocols(self.server, sent[0][0]), [50])
+
+        # Unless the pacer is exhausted, in which case it is sent at the target send rate
+        self.server.pacer.tokens = 0
+        self.server.pacer.rate = 0
+        self.server.injector.queue.append(Packet(protocol=50, payload=b'urgent'))
+        self.server.dispatcher.send_urgent()
+
+        self.assertEqual(len(sent), 1)
+        self.assertTrue(self.server.is_send_due(self.server.last_send_time + 1 / self.server.send_rate))
+
+    def test_urgent_flush_after_receive(self):
+        self.connect()
+
+        sent = []
+        self.server.on_urgent_data = sent.append
+
+        test = self
+
+        class UrgentReplyStream(self.ReceiverStream):
+
+            def handle_packets(self, packet_collection):
+                # Requested while the connection is dispatching received packets
+                test.server.injector.queue.append(Packet(protocol=51, payload=b'reply'))
+                test.server.dispatcher.send_urgent()
+                test.assertEqual(sent, [])
+
+        self.server.dispatcher.create_stream(UrgentReplyStream)
+
+        self.client.injector.queue.extend(Packet(protocol=50, payload=bytes(10)) for _ in range(3))
+        self.server.receive(self.client.send(False)[0])
+
+        # Flushed once, after dispatch
+        self.assertEqual(len(sent), 1)
+        self.assertEqual(self.read_protocols(self.server, sent[0][0]), [51])
+
+    def test_urgent_rpc_routed_to_owner(self):
+        self.connect()
+
+        other = Connection(("127.0.0.1", 1202))
+        other.handshake.status = ConnectionStatus.connected
+
+        sent = []
+        for connection in self.server, other:
+            connection.on_urgent_data = lambda datagrams, connection=connection: sent.append(connection)
+
+        streams = self.create_replication_streams(self.server, other)
+
+        UrgentRPCSignal.invoke(target=streams[1].replicable)
+        self.assertEqual(sent, [other])
+
+    def test_compressed_datagram_discarded(self):
+        self.connect()
+
+        header_format = HeaderFormat(has_flags=True)
+        payload = header_format.pack_packets([Packet(protocol=50, payload=b'data')])
+
+        # Compressed flag without negotiated compression
+        self.server.receive_format = header_format
+        self.server.receive(header_format.pack(1, 0, 0, HeaderFormat.compressed) + payload)
+
+        # Data which does not decompress
+        self.server.compressor = Compressor()
+        self.server.receive(header_format.pack(2, 0, 0, HeaderFormat.compressed) + payload)
+
+        self.assertEqual(self.server_received, [])
+        self.assertEqual(self.server.remote_sequence, 0)
+
+        self.server.receive(header_format.pack(3, 0, 0) + payload)
+        self.assertEqual([bytes(p.payload) for p in self.server_received], [b'data'])
+
+    def test_negotiated_settings_repeated(self):
+        for connection in self.server, self.client:
+            connection.max_ack_window = 64
+
+        handshake = self.client.handshake
+        handshake.status = ConnectionStatus.handshake
+        handshake._request_time = clock()
+
+        self.server.handshake.negotiated_settings = self.server.negotiate_settings(64, 16, 0, False,
+                                                                                   switch_send_format=False)
+        self.server.injector.queue.extend(Packet(protocol=50, payload=bytes(500)) for _ in range(5))
+
+        datagrams = self.server.send(False)
+        self.assertGreater(len(datagrams), 1)
+
+        for datagram in datagrams:
+            self.assertIn(ConnectionProtocols.handshake_success, self.read_protocols(self.server, datagram))
+
+        # Client adopts the settings from any datagram, as its replies are read in the new format
+        with patch.object(WorldInfo, "rules"):
+            self.client.receive(datagrams[0])
+
+        self.assertEqual(self.client.ack_window, 64)
+        self.assertEqual(handshake.status, ConnectionStatus.connected)
+
+        self.client.injector.queue.append(Packet(protocol=51, payload=b'reply'))
+        for datagram in self.client.send(False):
+            self.server.receive(datagram)
+
+        self.assertEqual([(p.protocol, bytes(p.payload)) for p in self.server_received], [(51, b'reply')])
+
+        # Settings are no longer repeated once adopted
+        self.server.injector.queue.extend(Packet(protocol=50, payload=bytes(500)) for _ in range(3))
+        for datagram in self.server.send(False)[1:]:
+            self.assertNotIn(ConnectionProtocols.handshake_success, self.read_protocols(self.server, datagram))
+
+
+class SimulatedSocketTest(unittest.TestCase):
+
+    address = "127.0.0.1", 9
+
+    def create_socket(self, conditions, seed=0):
+        sock = SimulatedSocketUDP("127.0.0.1", 0, conditions, seed)
+        self.addCleanup(sock.close)
+        return sock
+
+    def simulate(self, seed):
+        """Return the pending sends and counters after sending datagrams at a fixed time"""
+        conditions = NetworkConditions(latency=1.0, jitter=0.05, loss=0.1, burst_probability=0.05, duplication=0.05,
+                                       reordering=0.1)
+        sock = self.create_socket(conditions, seed)
+
+        # Datagrams are held until the latency elapses
+        with patch(SimulatedSocketUDP.__module__ + ".clock", return_value=0.0):
+            for i in range(500):
+                sock.sendto(i.to_bytes(2, "little"), self.address)
+
+        counters = sock.dropped_datagrams, sock.duplicated_datagrams, sock.reordered_datagrams
+        return sorted(sock._pending_sends), counters
+
+    def test_deterministic(self):
+        pending_sends, counters = self.simulate(seed=1)
+
+        self.assertEqual(self.simulate(seed=1), (pending_sends, counters))
+        self.assertNotEqual(self.simulate(seed=2)[0], pending_sends)
+
+        dropped, duplicated, reordered = counters
+        self.assertTrue(dropped and duplicated and reordered)
+        self.assertEqual(len(pending_sends), 500 - dropped + duplicated)
+
+    def test_loss_rate(self):
+        samples = 20000
+
+        sock = self.create_socket(NetworkConditions(loss=0.2))
+        self.assertAlmostEqual(sum([sock.is_lost() for _ in range(samples)]) / samples, 0.2, delta=0.02)
+
+        # Bad state is occupied for burst_probability / (burst_probability + burst_recovery) of datagrams
+        conditions = NetworkConditions(loss=0.05, burst_probability=0.1, burst_recovery=0.4, burst_loss=0.8)
+        sock = self.create_socket(conditions)
+
+        expected_rate = 0.05 * 0.8 + 0.8 * 0.2
+        self.assertAlmostEqual(sum([sock.is_lost() for _ in range(samples)]) / samples, expected_rate, delta=0.02)
+
+
+class TimerWheelTest(unittest.TestCase):
+
+    def test_expiry(self):
+        timer_wheel = TimerWheel(resolution=0.25, slot_count=8, current_time=0.0)
+        timer_wheel.schedule("a", 0.5)
+        timer_wheel.schedule("b", 3.0)
+        timer_wheel.schedule("c", 0.75)
+
+        # Re-arming delays expiry beyond a rotation of the wheel, cancelling prevents it
+        timer_wheel.schedule("a", 2.5)
+        timer_wheel.cancel("c")
+
+        self.assertEqual(timer_wheel.advance(1.0), [])
+        self.assertEqual(timer_wheel.advance(2.4), [])
+        self.assertEqual(timer_wheel.advance(2.5), ["a"])
+        self.assertEqual(timer_wheel.advance(5.0), ["b"])
+        self.assertEqual(len(timer_wheel), 0)
+
+
+class BackendTest(unittest.TestCase):
+
+    def create_sockets(self):
+        receiver = NonBlockingSocketUDP("127.0.0.1", 0)
+        sender = NonBlockingSocketUDP("127.0.0.1", 0)
+
+        self.addCleanup(receiver.close)
+        self.addCleanup(sender.close)
+
+        return receiver, sender
+
+    def test_best_backend(self):
+        if backends._multiple_message_support:
+            self.assertIs(get_best_backend(), MultipleMessageBackend)
+
+        with patch.object(backends, "_multiple_message_support", False):
+            self.assertIs(get_best_backend(), RecvmsgBackend if sys.platform != "win32" else DatagramBackend)
+
+            with patch.object(backends.sys, "platform", "win32"):
+                self.assertIs(get_best_backend(), DatagramBackend)
+
+            receiver, _ = self.create_sockets()
+            self.assertRaises(OSError, MultipleMessageBackend, receiver)
+
+    def test_send_receive(self):
+        backend_classes = [DatagramBackend, get_best_backend()]
+
+        for backend_cls in backend_classes:
+            receiver_socket, sender_socket = self.create_sockets()
+            receiver, sender = backend_cls(receiver_socket), backend_cls(sender_socket)
+
+            datagrams = [(bytes([i]) * (i + 1), receiver_socket.getsockname()) for i in range(10)]
+            self.assertEqual(sender.send(datagrams), sum(len(data) for data, _ in datagrams))
+
+            for _ in range(100):
+                received = [(bytes(data), address) for data, address in receiver.receive()]
+                if received:
+                    break
+
+                sleep(0.01)
+
+            self.assertEqual([data for data, _ in received], [data for data, _ in datagrams])
+            self.assertEqual(received[0][1], sender_socket.getsockname())
+
+    @unittest.skipUnless(backends._multiple_message_support, "recvmmsg is not supported")
+    def test_receive_errors(self):
+        receiver_socket, _ = self.create_sockets()
+        backend = MultipleMessageBackend(receiver_socket)
+
+        def failing_recvmmsg(error_number):
+            def recvmmsg(*args):
+                set_errno(error_number)
+                return -1
+
+            return recvmmsg
+
+        # Empty queue is not an error
+        with patch.object(backends, "_recvmmsg", failing_recvmmsg(EAGAIN)):
+            self.assertEqual(list(backend.receive()), [])
+
+        with patch.object(backends, "_recvmmsg", failing_recvmmsg(EBADF)):
+            with self.assertRaises(OSError) as context:
+                list(backend.receive())
+
+            self.assertEqual(context.exception.errno, EBADF)
+
+    @unittest.skipUnless(backends._multiple_message_support, "sendmmsg is not supported")
+    def test_send_errors(self):
+        receiver_socket, sender_socket = self.create_sockets()
+        backend = MultipleMessageBackend(sender_socket, batch_size=4)
+        datagrams = [(bytes([i]) * (i + 1), receiver_socket.getsockname()) for i in range(10)]
+
+        def sendmmsg(error_number, sent_counts):
+            sent_counts = iter(sent_counts)
+
+            def sendmmsg(*args):
+                for sent_count in sent_counts:
+                    return sent_count
+
+                set_errno(error_number)
+                return -1
+
+            return sendmmsg
+
+        # Full send buffer drops the unsent datagrams
+        with patch.object(backends, "_sendmmsg", sendmmsg(EAGAIN, [4, 2])):
+            self.assertEqual(backend.send(datagrams), sum(len(data) for data, _ in datagrams[:6]))
+
+        with patch.object(backends, "_sendmmsg", sendmmsg(EAGAIN, [])):
+            self.assertEqual(backend.send(datagrams), 0)
+
+        with patch.object(backends, "_sendmmsg", sendmmsg(EBADF, [4])):
+            with self.assertRaises(OSError) as context:
+                backend.send(datagrams)
+
+            self.assertEqual(context.exception.errno, EBADF)
+
+    def test_send_buffer_full(self):
+        receiver_socket, sender_socket = self.create_sockets()
+        backend = DatagramBackend(sender_socket)
+        datagrams = [(b'\x01', receiver_socket.getsockname()), (b'\x02\x02', receiver_socket.getsockname())]
+
+        with patch.object(backend, "socket") as socket:
+            socket.sendto.side_effect = [1, BlockingIOError()]
+            self.assertEqual(backend.send(datagrams), 1)
+
+
+class AsyncNetworkTest(unittest.TestCase):
+
+    def create_loop(self):
+        loop = new_event_loop()
+        self.addCleanup(loop.close)
+        return loop
+
+    def test_protocol_buffers_datagrams(self):
+        received_queue = []
+        protocol = NetworkDatagramProtocol(received_queue)
+
+        protocol.datagram_received(b'data', ("127.0.0.1", 1000))
+        protocol.error_received(ConnectionRefusedError())
+
+        self.assertEqual(received_queue, [(b'data', ("127.0.0.1", 1000))])
+
+    def test_receive(self):
+        loop = self.create_loop()
+        network = AsyncNetwork("127.0.0.1", 0, loop=loop)
+        self.addCleanup(network.stop)
+
+        loop.run_until_complete(network.open())
+
+        sender = NonBlockingSocketUDP("127.0.0.1", 0)
+        self.addCleanup(sender.close)
+        sender.sendto(b'data', network.socket.getsockname())
+
+        for _ in range(100):
+            loop.run_until_complete(async_sleep(0.01))
+            if network._received_queue:
+                break
+
+        self.assertEqual(list(network.received_data), [(b'data', sender.getsockname())])
+        self.assertEqual(network.metrics.received_bytes, 4)
+        self.assertEqual(list(network.received_data), [])
+
+    def test_default_loop(self):
+        network = AsyncNetwork("127.0.0.1", 0)
+        self.addCleanup(network.loop.close)
+        self.addCleanup(network.stop)
+
+        self.assertFalse(network.loop.is_running())
+
+        async def create_network():
+            running_network = AsyncNetwork("127.0.0.1", 0)
+            running_network.stop()
+            return running_network.loop
+
+        loop = self.create_loop()
+        self.assertIs(loop.run_until_complete(create_network()), loop)
+
+    def test_ticks(self):
+        loop = self.create_loop()
+        network = AsyncSimpleNetwork("127.0.0.1", 0, loop=loop)
+
+        tick_times = []
+        update_rate = 0.01
+
+        def on_update():
+            tick_times.append(loop.time())
+            return True
+
+        network.on_update = on_update
+
+        # Other callbacks are not blocked by ticks
+        callback_times = []
+        for i in range(10):
+            loop.call_later(i * update_rate / 2, lambda: callback_times.append(loop.time()))
+
+        network.start(timeout=0.1, update_rate=update_rate)
+
+        self.assertGreaterEqual(len(tick_times), 8)
+        self.assertEqual(len(callback_times), 10)
+
+        # Ticks follow a fixed timeline
+        started = tick_times[0]
+        for index, tick_time in enumerate(tick_times):
+            self.assertGreaterEqual(tick_time, started + index * update_rate - 1e-3)
+
+
 def run_tests():
     unittest.main(module="network.testing", exit=False)
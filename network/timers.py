@@ -0,0 +1,110 @@
+from math import ceil, floor
+from time import clock
+
+__all__ = ['TimerWheel']
+
+
+class TimerWheel:
+    """Hashed timer wheel, for many long-lived timers which are frequently re-armed.
+
+    Timers are stored in the slot of their expiry tick, and slots are visited as time advances. Re-arming a timer with
+    a later deadline only records the deadline; the timer is moved when its current slot is visited. Timers may expire
+    up to one tick late, but never early
+    """
+
+    def __init__(self, resolution=0.1, slot_count=256, current_time=None):
+        if current_time is None:
+            current_time = clock()
+
+        self.resolution = resolution
+        self.slots = [[] for _ in range(slot_count)]
+
+        # Deadline tick of each timer, and tick of its current slot entry
+        self._deadlines = {}
+        self._entry_ticks = {}
+
+        self._tick = floor(current_time / resolution)
+
+    def __contains__(self, key):
+        return key in self._deadlines
+
+    def __len__(self):
+        return len(self._deadlines)
+
+    def _insert(self, key, tick):
+        # Timers which are already due expire on the next advance
+        tick = max(tick, self._tick + 1)
+
+        self._entry_ticks[key] = tick
+        self.slots[tick % len(self.slots)].append((key, tick))
+
+    def schedule(self, key, deadline):
+        """Arm or re-arm timer to expire at deadline
+
+        :param key: timer key
+        :param deadline: time of expiry
+        """
+        deadline_tick = ceil(deadline / self.resolution)
+        entry_tick = self._entry_ticks.get(key)
+
+        self._deadlines[key] = deadline_tick
+
+        # Existing entry is visited before the deadline
+        if entry_tick is not None and entry_tick <= deadline_tick:
+            return
+
+        self._insert(key, deadline_tick)
+
+    def cancel(self, key):
+        """Disarm timer, if armed
+
+        :param key: timer key
+        """
+        self._deadlines.pop(key, None)
+        self._entry_ticks.pop(key, None)
+
+    def advance(self, current_time):
+        """Visit slots up to current time, and return keys of expired timers
+
+        :param current_time: current time
+        """
+        target_tick = floor(current_time / self.resolution)
+        slots = self.slots
+        slot_count = len(slots)
+
+        deadlines = self._deadlines
+        entry_ticks = self._entry_ticks
+        expired = []
+
+        # Each slot is visited at most once, at the latest of its ticks
+        for tick in range(max(self._tick + 1, target_tick - slot_count + 1), target_tick + 1):
+            index = tick % slot_count
+            slot = slots[index]
+
+            if not slot:
+                continue
+
+            slots[index] = []
+            self._tick = tick
+
+            for key, entry_tick in slot:
+                # Entries for later rotations of the wheel
+                if entry_tick > tick:
+                    slots[index].append((key, entry_tick))
+                    continue
+
+                # Entries replaced by an earlier deadline, or for cancelled timers
+                if entry_ticks.get(key) != entry_tick:
+                    continue
+
+                deadline_tick = deadlines[key]
+                if deadline_tick <= tick:
+                    del deadlines[key]
+                    del entry_ticks[key]
+                    expired.append(key)
+
+                else:
+                    self._insert(key, deadline_tick)
+
+        self._tick = max(self._tick, target_tick)
+        return expired